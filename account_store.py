@@ -0,0 +1,254 @@
+"""
+多账号存储：以 SQLite（WAL 模式）保存账号 Cookie、各面板的同步结果和面板配置
+单条查询和写入都走主键索引，账号再多也无需整文件重写；首次打开时自动从 config.json 迁移面板配置
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from qinglong import _get_app_dir, _get_config_path, _get_panels, TokenCache
+
+
+class AccountStore:
+    """
+    账号存储
+    accounts:       pin → cookie、获取时间
+    account_panels: (pin, 面板) → 环境变量 id、上次同步的操作、结果、错误、耗时
+    panels:         面板配置（名称、地址、Client ID/Secret、顺序）
+    所有 SQL 都是固定文本，sqlite3 会缓存其预编译语句；连接跨线程共享并由锁串行化
+    """
+    SCHEMA_VERSION = 2
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS accounts (
+            pin TEXT PRIMARY KEY,
+            cookie TEXT NOT NULL,
+            harvested_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS account_panels (
+            pin TEXT NOT NULL,
+            panel_key TEXT NOT NULL,
+            env_id TEXT,
+            operation TEXT,
+            ok INTEGER,
+            error TEXT,
+            duration_ms REAL,
+            synced_at REAL NOT NULL,
+            PRIMARY KEY (pin, panel_key)
+        );
+        CREATE INDEX IF NOT EXISTS account_panels_by_panel ON account_panels (panel_key);
+        CREATE TABLE IF NOT EXISTS panels (
+            panel_key TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            url TEXT NOT NULL,
+            client_id TEXT NOT NULL,
+            client_secret TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            weight REAL NOT NULL DEFAULT 1
+        );
+    """
+
+    GET_ACCOUNT = "SELECT pin, cookie, harvested_at, updated_at FROM accounts WHERE pin = ?"
+    UPSERT_ACCOUNT = """
+        INSERT INTO accounts (pin, cookie, harvested_at, updated_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT (pin) DO UPDATE SET cookie = excluded.cookie, harvested_at = excluded.harvested_at,
+                                        updated_at = excluded.updated_at
+        WHERE accounts.cookie != excluded.cookie
+    """
+    RECORD_SYNC = """
+        INSERT INTO account_panels (pin, panel_key, env_id, operation, ok, error, duration_ms, synced_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (pin, panel_key) DO UPDATE SET
+            env_id = COALESCE(excluded.env_id, account_panels.env_id), operation = excluded.operation,
+            ok = excluded.ok, error = excluded.error, duration_ms = excluded.duration_ms,
+            synced_at = excluded.synced_at
+    """
+    GET_SYNCS = """
+        SELECT panel_key, env_id, operation, ok, error, duration_ms, synced_at
+        FROM account_panels WHERE pin = ?
+    """
+
+    def __init__(self, path=None, config_path=None):
+        self.path = path or os.path.join(_get_app_dir(), "accounts.db")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None,
+                                     cached_statements=64)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+            self._upgrade_schema()
+        self.migrate_config(config_path or _get_config_path())
+
+    @contextmanager
+    def _transaction(self):
+        """持锁执行一个写事务，出错时回滚"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _upgrade_schema(self):
+        """升级旧版本数据库的表结构"""
+        version = self._get_meta("schema_version") or self.SCHEMA_VERSION
+        if version < 2:
+            columns = [row["name"] for row in self._conn.execute("PRAGMA table_info(panels)")]
+            if "weight" not in columns:
+                self._conn.execute("ALTER TABLE panels ADD COLUMN weight REAL NOT NULL DEFAULT 1")
+        self._set_meta("schema_version", self.SCHEMA_VERSION)
+
+    def _get_meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["value"]) if row else None
+
+    def _set_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def migrate_config(self, config_path):
+        """首次打开时把 config.json 中的主面板和 panels 列表导入面板表，之后不再重复导入"""
+        with self._lock:
+            if self._get_meta("config_migrated"):
+                return
+        try:
+            with open(config_path, "r") as f:
+                config = json.load(f)
+        except Exception:
+            config = {}
+        panels = _get_panels(config)
+        with self._transaction():
+            if panels:
+                self._replace_panels(panels)
+            self._set_meta("config_migrated", time.time())
+
+    def save_account(self, pin, cookie, harvested_at=None):
+        """保存（或覆盖）账号的当前 Cookie；Cookie 未变化时保留原来的获取时间"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(self.UPSERT_ACCOUNT, (pin, cookie, harvested_at or now, now))
+
+    def save_accounts(self, cookies, harvested_at=None):
+        """在一个事务中保存多个账号，cookies 为 (pin, cookie) 序列，返回保存的数量"""
+        now = time.time()
+        rows = [(pin, cookie, harvested_at or now, now) for pin, cookie in cookies]
+        with self._transaction():
+            self._conn.executemany(self.UPSERT_ACCOUNT, rows)
+        return len(rows)
+
+    def get_account(self, pin):
+        """返回账号字典（含 syncs：面板 → 上次同步结果），不存在时返回 None"""
+        with self._lock:
+            row = self._conn.execute(self.GET_ACCOUNT, (pin,)).fetchone()
+            if row is None:
+                return None
+            account = dict(row)
+            account["syncs"] = {sync["panel_key"]: self._sync_dict(sync)
+                                for sync in self._conn.execute(self.GET_SYNCS, (pin,))}
+        return account
+
+    def accounts(self):
+        """按 pin 顺序返回全部账号（不含同步结果）"""
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(
+                "SELECT pin, cookie, harvested_at, updated_at FROM accounts ORDER BY pin")]
+
+    def cookies(self):
+        """逐个返回全部账号的 (pin, cookie)"""
+        for account in self.accounts():
+            yield account["pin"], account["cookie"]
+
+    def delete_account(self, pin):
+        with self._transaction():
+            self._conn.execute("DELETE FROM account_panels WHERE pin = ?", (pin,))
+            deleted = self._conn.execute("DELETE FROM accounts WHERE pin = ?", (pin,)).rowcount
+        return deleted > 0
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM accounts").fetchone()[0]
+
+    def record_sync(self, pin, panel_key, env_id=None, operation=None, ok=False, error=None, duration_ms=None):
+        """记录账号在某个面板上的同步结果；env_id 为空时保留上次记录的 id"""
+        with self._lock:
+            self._conn.execute(self.RECORD_SYNC, (pin, panel_key, None if env_id is None else str(env_id),
+                                                  operation, int(bool(ok)), error, duration_ms, time.time()))
+
+    def record_syncs(self, panel_key, results, duration_ms=None):
+        """在一个事务中记录 sync_cookies 返回的结果列表"""
+        now = time.time()
+        rows = [(r["pin"], panel_key, None if r.get("id") is None else str(r["id"]), r.get("operation"),
+                 int(bool(r.get("ok"))), r.get("error"), duration_ms, now) for r in results]
+        with self._transaction():
+            self._conn.executemany(self.RECORD_SYNC, rows)
+
+    def sync_results(self, panel_key):
+        """返回某个面板上全部账号的上次同步结果：pin → 结果字典"""
+        with self._lock:
+            return {row["pin"]: self._sync_dict(row) for row in self._conn.execute(
+                "SELECT pin, panel_key, env_id, operation, ok, error, duration_ms, synced_at "
+                "FROM account_panels WHERE panel_key = ?", (panel_key,))}
+
+    def all_syncs(self):
+        """一次查询返回全部同步结果：pin → {面板 → 结果字典}"""
+        syncs = {}
+        with self._lock:
+            for row in self._conn.execute(
+                    "SELECT pin, panel_key, env_id, operation, ok, error, duration_ms, synced_at FROM account_panels"):
+                syncs.setdefault(row["pin"], {})[row["panel_key"]] = self._sync_dict(row)
+        return syncs
+
+    @staticmethod
+    def _sync_dict(row):
+        sync = dict(row)
+        sync.pop("pin", None)
+        sync.pop("panel_key", None)
+        sync["ok"] = bool(sync["ok"])
+        return sync
+
+    def panels(self):
+        """按配置顺序返回面板列表，每项为 {'name', 'url', 'client_id', 'client_secret', 'weight'}"""
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(
+                "SELECT name, url, client_id, client_secret, weight FROM panels ORDER BY position")]
+
+    def save_panels(self, panels):
+        """用 _get_panels() 格式的面板列表替换面板表"""
+        with self._transaction():
+            self._replace_panels(panels)
+
+    def _replace_panels(self, panels):
+        self._conn.execute("DELETE FROM panels")
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO panels (panel_key, name, url, client_id, client_secret, position, weight) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(TokenCache.make_key(p["url"], p["client_id"]), p["name"], p["url"], p["client_id"],
+              p["client_secret"], position, p.get("weight") or 1) for position, p in enumerate(panels)])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_account_store = None
+_account_store_lock = threading.Lock()
+
+
+def _get_account_store():
+    """获取进程内共享的账号存储"""
+    global _account_store
+    with _account_store_lock:
+        if _account_store is None:
+            _account_store = AccountStore()
+        return _account_store
@@ -0,0 +1,291 @@
+"""
+多账号面板：虚拟化的 ttk.Treeview 账号表格
+表格中只有可见的几行，滚动时复用这些行改写内容；后台线程提交的变更先暂存，
+由主线程定时合并并只重绘可见且有变化的行，账号再多界面也不会卡顿
+"""
+import bisect
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk
+
+
+def _format_age(harvested_at, now):
+    if not harvested_at:
+        return "—"
+    minutes = max(0, now - harvested_at) / 60
+    if minutes < 1:
+        return "刚刚"
+    if minutes < 60:
+        return f"{minutes:.0f} 分钟"
+    if minutes < 48 * 60:
+        return f"{minutes / 60:.0f} 小时"
+    return f"{minutes / 1440:.0f} 天"
+
+
+class AccountTable:
+    """
+    账号表格
+    模型为 pin → {harvested_at, syncs: {面板键 → 同步结果}, health}，按 pin 排序；
+    set_account / set_sync / set_health / load 可在任意线程调用，flush() 必须在主线程中调用；
+    on_select(pin) 在选中行时调用，on_activate(pin) 在双击或回车时调用
+    """
+    COLUMNS = (
+        ("pin", "账号", 170),
+        ("age", "Cookie 年龄", 90),
+        ("sync", "面板同步", 250),
+        ("latency", "最近耗时", 80),
+        ("health", "健康", 80)
+    )
+    HEALTH_TEXT = {True: "✅ 有效", False: "❌ 失效", None: "❔ 未知"}
+    # Cookie 年龄等随时间变化的列的刷新间隔（秒）
+    AGE_REFRESH = 60
+
+    def __init__(self, parent, rows=8, on_select=None, on_activate=None):
+        self.on_select = on_select
+        self.on_activate = on_activate
+        self.rows = rows
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._model = {}
+        self._pins = []       # 全部 pin（有序）
+        self._view = []       # 过滤后的 pin（有序）
+        self._filter = ""
+        self._offset = 0
+        self._slots = []      # 可见行的 (pin, values, tags)
+        self._panel_names = {}
+        self._rendered_at = 0
+        self._selected = None
+
+        self.frame = tk.Frame(parent, bg='#2d2d2d')
+        header = tk.Frame(self.frame, bg='#2d2d2d')
+        header.pack(fill=tk.X, pady=(0, 6))
+        self.count_label = tk.Label(header, text="账号: 0", font=('SF Pro Display', 10),
+                                    fg='#aaa', bg='#2d2d2d')
+        self.count_label.pack(side=tk.LEFT)
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add("write", lambda *args: self.set_filter(self.filter_var.get()))
+        filter_entry = tk.Entry(header, textvariable=self.filter_var, font=('SF Pro Display', 10), width=20,
+                                bg='#3a3a3a', fg='#e0e0e0', insertbackground='#e0e0e0', relief='flat', bd=4)
+        filter_entry.pack(side=tk.RIGHT)
+        tk.Label(header, text="搜索:", font=('SF Pro Display', 10), fg='#666', bg='#2d2d2d').pack(side=tk.RIGHT)
+
+        style = ttk.Style(self.frame)
+        style.configure("Accounts.Treeview", background='#1a1a1a', fieldbackground='#1a1a1a',
+                        foreground='#e0e0e0', rowheight=22, borderwidth=0, font=('SF Pro Display', 10))
+        style.configure("Accounts.Treeview.Heading", background='#3a3a3a', foreground='#aaa',
+                        font=('SF Pro Display', 10, 'bold'), relief='flat')
+        style.map("Accounts.Treeview", background=[('selected', '#4facfe')])
+
+        body = tk.Frame(self.frame, bg='#2d2d2d')
+        body.pack(fill=tk.BOTH, expand=True)
+        self.tree = ttk.Treeview(body, columns=[name for name, _, _ in self.COLUMNS], show="headings",
+                                 height=rows, selectmode="browse", style="Accounts.Treeview")
+        for name, title, width in self.COLUMNS:
+            self.tree.heading(name, text=title, anchor='w')
+            self.tree.column(name, width=width, minwidth=60, anchor='w', stretch=name == "sync")
+        self.tree.tag_configure("invalid", foreground='#ff4444')
+        self.tree.tag_configure("failed", foreground='#ffc107')
+        self.scrollbar = ttk.Scrollbar(body, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        # Treeview 只有可见的几行，滚轮由表格自己换算成偏移量
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1))
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-1))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(1))
+        self.tree.bind("<Up>", lambda e: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self._move_selection(1))
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<Double-1>", self._on_activate)
+        self.tree.bind("<Return>", self._on_activate)
+        self._update_scrollbar()
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    # ---- 后台线程提交变更 ----
+
+    def _submit(self, pin, **fields):
+        if not pin:
+            return
+        with self._lock:
+            pending = self._pending.setdefault(pin, {})
+            syncs = fields.pop("syncs", None)
+            if syncs:
+                pending.setdefault("syncs", {}).update(syncs)
+            pending.update(fields)
+
+    def set_account(self, pin, harvested_at):
+        self._submit(pin, harvested_at=harvested_at)
+
+    def set_sync(self, pin, panel_key, sync):
+        """sync 为 {'ok', 'operation', 'error', 'duration_ms', 'synced_at'}"""
+        self._submit(pin, syncs={panel_key: sync})
+
+    def set_health(self, pin, valid, error=None, checked_at=None):
+        self._submit(pin, health={"valid": valid, "error": error, "checked_at": checked_at or time.time()})
+
+    def load(self, accounts=(), syncs=None, health=None):
+        """批量提交账号存储和检查结果（accounts 为 AccountStore.accounts() 格式）"""
+        syncs = syncs or {}
+        health = health or {}
+        with self._lock:
+            for account in accounts:
+                self._pending.setdefault(account["pin"], {})["harvested_at"] = account["harvested_at"]
+            for pin, panels in syncs.items():
+                self._pending.setdefault(pin, {}).setdefault("syncs", {}).update(panels)
+            for pin, entry in health.items():
+                self._pending.setdefault(pin, {})["health"] = entry
+
+    # ---- 主线程 ----
+
+    def set_panels(self, panel_names):
+        """面板键 → 面板名称，用于显示同步列"""
+        self._panel_names = dict(panel_names)
+        self._render()
+
+    def set_filter(self, text):
+        self._filter = text.strip()
+        self._view = [pin for pin in self._pins if self._filter in pin] if self._filter else self._pins
+        self._offset = 0
+        self._render()
+
+    def flush(self):
+        """合并后台提交的变更：新增账号插入有序列表，只重绘可见且有变化的行"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            if time.time() - self._rendered_at >= self.AGE_REFRESH:
+                self._render()
+            return
+
+        new_pins = []
+        for pin, fields in pending.items():
+            row = self._model.get(pin)
+            if row is None:
+                row = self._model[pin] = {"harvested_at": None, "syncs": {}, "health": None}
+                new_pins.append(pin)
+            syncs = fields.pop("syncs", None)
+            if syncs:
+                row["syncs"].update(syncs)
+            row.update(fields)
+
+        if new_pins:
+            if len(new_pins) > 64:
+                self._pins = sorted(self._pins + new_pins)
+            else:
+                for pin in new_pins:
+                    bisect.insort(self._pins, pin)
+            self._view = [pin for pin in self._pins if self._filter in pin] if self._filter else self._pins
+            self._render()
+        else:
+            visible = set(self._view[self._offset:self._offset + self.rows])
+            if visible.intersection(pending):
+                self._render()
+
+    def scroll(self, rows):
+        self._set_offset(self._offset + rows)
+        return "break"
+
+    def _set_offset(self, offset):
+        offset = max(0, min(offset, len(self._view) - self.rows))
+        if offset != self._offset:
+            self._offset = offset
+            self._render()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self._set_offset(int(round(float(amount) * len(self._view))))
+        elif action == "scroll":
+            step = self.rows if unit == "pages" else 1
+            self._set_offset(self._offset + int(amount) * step)
+
+    def _update_scrollbar(self):
+        total = len(self._view)
+        if total <= self.rows:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self._offset / total, (self._offset + self.rows) / total)
+
+    def _row_values(self, pin, now):
+        row = self._model[pin]
+        names = []
+        latest = None
+        failed = False
+        for panel_key, sync in row["syncs"].items():
+            name = self._panel_names.get(panel_key, panel_key.split("|")[0])
+            names.append(f"{name} {'✅' if sync.get('ok') else '❌'}")
+            failed = failed or not sync.get("ok")
+            if latest is None or (sync.get("synced_at") or 0) > (latest.get("synced_at") or 0):
+                latest = sync
+        latency = latest.get("duration_ms") if latest else None
+        health = row["health"]
+        values = (
+            pin,
+            _format_age(row["harvested_at"], now),
+            " · ".join(names) or "—",
+            f"{latency:.0f} ms" if latency is not None else "—",
+            self.HEALTH_TEXT.get(health.get("valid"), "—") if health else "—"
+        )
+        tags = ("invalid",) if health and health.get("valid") is False else (("failed",) if failed else ())
+        return values, tags
+
+    def _render(self):
+        """把 view[offset:offset + rows] 写入可见行，内容未变化的行不触碰"""
+        now = time.time()
+        pins = self._view[self._offset:self._offset + self.rows]
+        selected = self.selected_pin()
+        while len(self._slots) > len(pins):
+            self._slots.pop()
+            self.tree.delete(str(len(self._slots)))
+        for index, pin in enumerate(pins):
+            values, tags = self._row_values(pin, now)
+            if index == len(self._slots):
+                self.tree.insert("", tk.END, iid=str(index), values=values, tags=tags)
+                self._slots.append((pin, values, tags))
+            elif self._slots[index] != (pin, values, tags):
+                self.tree.item(str(index), values=values, tags=tags)
+                self._slots[index] = (pin, values, tags)
+        # 选中状态跟随账号而不是行号
+        slot = next((str(i) for i, (pin, _, _) in enumerate(self._slots) if pin == selected), None)
+        if slot is None:
+            if self.tree.selection():
+                self.tree.selection_remove(self.tree.selection())
+        elif self.tree.selection() != (slot,):
+            self.tree.selection_set(slot)
+        self._rendered_at = now
+        self.count_label.config(text=f"账号: {len(self._view)}" + (f" / {len(self._pins)}" if self._filter else ""))
+        self._update_scrollbar()
+
+    def selected_pin(self):
+        return self._selected
+
+    def _move_selection(self, step):
+        pin = self.selected_pin()
+        index = self._view.index(pin) + step if pin in self._view else 0
+        if 0 <= index < len(self._view):
+            self._select(self._view[index])
+            if index < self._offset:
+                self._set_offset(index)
+            elif index >= self._offset + self.rows:
+                self._set_offset(index - self.rows + 1)
+            self._render()
+        return "break"
+
+    def _select(self, pin):
+        if pin != self.selected_pin():
+            self._selected = pin
+            if self.on_select:
+                self.on_select(pin)
+
+    def _on_select(self, event):
+        selection = self.tree.selection()
+        if selection and int(selection[0]) < len(self._slots):
+            self._select(self._slots[int(selection[0])][0])
+
+    def _on_activate(self, event):
+        pin = self.selected_pin()
+        if pin and self.on_activate:
+            self.on_activate(pin)
+        return "break"
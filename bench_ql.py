@@ -0,0 +1,226 @@
+"""
+QLHelper 同步性能基准（离线，基于 fake_qinglong 替身面板）
+
+    python3 bench_ql.py                                  # 默认 20ms 延迟、50 个账号
+    python3 bench_ql.py --latency 50 --accounts 200 --json
+    python3 bench_ql.py --save baseline.json             # 保存结果作为基线
+    python3 bench_ql.py --compare baseline.json          # 与基线比较，请求数增加或耗时超出容差时退出码为 1
+
+运行期间 HOME（Windows 上为 APPDATA）指向临时目录，结构化日志、阶段耗时和索引都写在那里，结束后删除，
+不会混入本机应用的 logs/app.jsonl 和 metrics 输出。
+
+比较的同步策略：
+    legacy  改造前的流程：每个账号重新获取令牌、探测 id 字段并按 searchValue 查找，每次请求新建连接
+    single  当前界面的发送流程：每个账号一次 QLHelper 登录（令牌缓存）+ sync_cookies
+    batch   QLHelper.sync_cookies 一次同步全部账号
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from fake_qinglong import FakeQinglong
+from qinglong import QLHelper, TokenCache, EnvIndex, _make_remarks
+
+
+def strategy_legacy(panel, accounts, workdir):
+    """按改造前 send_to_ql 的请求序列逐个同步（直接调用 requests，不复用连接和令牌）"""
+    import requests
+
+    for pin, cookie in accounts:
+        data = requests.get(f"{panel.url}/open/auth/token?client_id={panel.client_id}"
+                            f"&client_secret={panel.client_secret}", timeout=10).json()
+        headers = {'Authorization': f"{data['data']['token_type']} {data['data']['token']}"}
+        requests.get(f"{panel.url}/open/envs?searchValue=___check___", headers=headers, timeout=10)
+        data = requests.get(f"{panel.url}/open/envs?searchValue=pt_pin={pin}", headers=headers, timeout=10).json()
+        env_id = data["data"][0].get("id") if data.get("data") else None
+        headers['Content-Type'] = 'application/json'
+        if env_id:
+            requests.put(f"{panel.url}/open/envs", headers=headers, timeout=10, json={
+                'name': "JD_COOKIE", 'value': cookie, 'remarks': _make_remarks(pin), 'id': env_id})
+            requests.put(f"{panel.url}/open/envs/enable", headers=headers, json=[env_id], timeout=10)
+        else:
+            requests.post(f"{panel.url}/open/envs", headers=headers, timeout=10, json=[
+                {'name': "JD_COOKIE", 'value': cookie, 'remarks': _make_remarks(pin)}])
+
+
+def _helper(panel, workdir):
+    return QLHelper(panel.url, panel.client_id, panel.client_secret,
+                    token_cache=TokenCache(os.path.join(workdir, "token_cache.json")),
+                    env_index=EnvIndex(os.path.join(workdir, "env_index.json")))
+
+
+def strategy_single(panel, accounts, workdir):
+    """每个账号单独走一遍当前的发送流程"""
+    for pin, cookie in accounts:
+        ql = _helper(panel, workdir)
+        ql.login()
+        result = ql.sync_cookies([(pin, cookie)])[0]
+        if not result["ok"]:
+            raise Exception(result["error"])
+
+
+def strategy_batch(panel, accounts, workdir):
+    """一次同步全部账号"""
+    ql = _helper(panel, workdir)
+    ql.login()
+    failed = [r for r in ql.sync_cookies(accounts) if not r["ok"]]
+    if failed:
+        raise Exception(failed[0]["error"])
+
+
+STRATEGIES = {
+    "legacy": strategy_legacy,
+    "single": strategy_single,
+    "batch": strategy_batch,
+}
+
+
+def _accounts(prefix, count, version):
+    return [(f"{prefix}{i}", f"pt_key=AAJ{version}x{i:08d};pt_pin={prefix}{i};") for i in range(count)]
+
+
+def _seed(panel, existing):
+    for pin, cookie in existing:
+        panel.add_env("JD_COOKIE", cookie, _make_remarks(pin))
+
+
+def bench_single_latency(name, latency, repeat, preload, error_rate):
+    """单账号更新延迟：面板已有 preload 个账号，重复同步同一个已存在账号 repeat 次"""
+    workdir = tempfile.mkdtemp(prefix="qlbench_")
+    try:
+        with FakeQinglong(latency=latency, error_rate=error_rate, seed=1) as panel:
+            existing = _accounts("user", preload, 0)
+            _seed(panel, existing)
+            timings = []
+            for round_no in range(repeat):
+                pin, _ = existing[round_no % len(existing)]
+                account = [(pin, f"pt_key=AAJ{round_no + 1}x;pt_pin={pin};")]
+                start = time.perf_counter()
+                STRATEGIES[name](panel, account, workdir)
+                timings.append((time.perf_counter() - start) * 1000)
+            return {
+                "median_ms": round(statistics.median(timings), 1),
+                "first_ms": round(timings[0], 1),
+                "requests": round(sum(panel.counts.values()) / repeat, 2),
+                "counts": dict(panel.counts)
+            }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_throughput(name, latency, accounts, error_rate):
+    """N 账号吞吐：一半账号已存在（更新），一半为新账号（新增）"""
+    workdir = tempfile.mkdtemp(prefix="qlbench_")
+    try:
+        with FakeQinglong(latency=latency, error_rate=error_rate, seed=2) as panel:
+            existing = _accounts("user", accounts // 2, 0)
+            _seed(panel, existing)
+            batch = _accounts("user", accounts // 2, 1) + _accounts("new", accounts - accounts // 2, 1)
+            start = time.perf_counter()
+            STRATEGIES[name](panel, batch, workdir)
+            elapsed = time.perf_counter() - start
+            return {
+                "total_ms": round(elapsed * 1000, 1),
+                "accounts_per_s": round(len(batch) / elapsed, 1),
+                "requests": sum(panel.counts.values()),
+                "counts": dict(panel.counts)
+            }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_benchmarks(args):
+    results = {"params": {"latency_ms": args.latency, "accounts": args.accounts, "repeat": args.repeat,
+                          "error_rate": args.error_rate}}
+    for name in args.strategy or STRATEGIES:
+        results[name] = {
+            "single": bench_single_latency(name, args.latency / 1000, args.repeat, args.preload, args.error_rate),
+            "throughput": bench_throughput(name, args.latency / 1000, args.accounts, args.error_rate)
+        }
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """与基线比较，返回回归描述列表：请求数不得增加，耗时不得超过基线 ×(1+tolerance)"""
+    regressions = []
+    for name, scenarios in results.items():
+        if name == "params" or name not in baseline:
+            continue
+        for scenario, metrics in scenarios.items():
+            base = baseline[name].get(scenario, {})
+            if "requests" in base and metrics["requests"] > base["requests"]:
+                regressions.append(f"{name}/{scenario}: 请求数 {base['requests']} → {metrics['requests']}")
+            for key in ("median_ms", "total_ms"):
+                if key in base and metrics[key] > base[key] * (1 + tolerance):
+                    regressions.append(f"{name}/{scenario}: {key} {base[key]} → {metrics[key]}")
+    return regressions
+
+
+def print_table(results):
+    params = results["params"]
+    print(f"延迟 {params['latency_ms']} ms/请求，吞吐测试 {params['accounts']} 个账号，"
+          f"单账号测试重复 {params['repeat']} 次，错误率 {params['error_rate']}")
+    print(f"{'策略':<8} {'单账号中位数':>12} {'首次':>10} {'请求/次':>8} │ {'N账号总耗时':>12} {'账号/秒':>9} {'请求数':>7}")
+    for name, scenarios in results.items():
+        if name == "params":
+            continue
+        single = scenarios["single"]
+        throughput = scenarios["throughput"]
+        print(f"{name:<8} {single['median_ms']:>10.1f}ms {single['first_ms']:>8.1f}ms {single['requests']:>8} │ "
+              f"{throughput['total_ms']:>10.1f}ms {throughput['accounts_per_s']:>9} {throughput['requests']:>7}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="QLHelper 同步性能基准")
+    parser.add_argument("--latency", type=float, default=20, help="替身面板每个请求的延迟（毫秒，默认 20）")
+    parser.add_argument("--accounts", type=int, default=50, help="吞吐测试的账号数（默认 50）")
+    parser.add_argument("--repeat", type=int, default=10, help="单账号测试的重复次数（默认 10）")
+    parser.add_argument("--preload", type=int, default=50, help="单账号测试时面板上已有的账号数（默认 50）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回 503 的概率")
+    parser.add_argument("--strategy", action="append", choices=list(STRATEGIES), help="只运行指定策略，可重复")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    parser.add_argument("--save", help="把结果保存为基线文件")
+    parser.add_argument("--compare", help="与基线文件比较")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="耗时回归容差（默认 0.25，即 25%%）")
+    args = parser.parse_args(argv)
+
+    home = tempfile.mkdtemp(prefix="qlbench_home_")
+    saved = {name: os.environ.get(name) for name in ("HOME", "APPDATA")}
+    os.environ["HOME"] = os.environ["APPDATA"] = home
+    try:
+        results = run_benchmarks(args)
+    finally:
+        # 日志在后台线程中写入，先写完再删除临时目录
+        from log_sink import _get_log_sink, _get_phase_sink
+        _get_log_sink().close()
+        _get_phase_sink().close()
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        shutil.rmtree(home, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_table(results)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, "r") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"❌ 性能回归 {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
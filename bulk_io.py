@@ -0,0 +1,310 @@
+"""
+批量导入导出：从 CSV / JSONL / 纯文本文件（或标准输入）流式读取 Cookie 同步到青龙，把面板上的 JD_COOKIE 导出为文件
+导入是一条生成器流水线：逐行解析 → 校验格式 → 标记重复 → 分批（批内按 pin 去重）→ 有界队列 → 发送，
+内存占用只与批大小和队列长度有关，与文件行数无关（标记重复只记住最近出现的 pin 及其行号，不保存 Cookie）。
+同一 pin 以最后一次出现的行为准：批内直接覆盖，跨批时后一批按输入顺序发送，覆盖面板上先写入的值
+"""
+import csv
+import json
+import queue
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from qinglong import QLHelper, TokenCache
+
+FORMATS = ("txt", "csv", "jsonl")
+
+# pt_key / pt_pin 的值不能含空白、分号、逗号和引号
+_VALUE = r'[^\s;,"\']+'
+_PT_KEY = re.compile(r'(?:^|;)\s*pt_key=(' + _VALUE + r')\s*(?=;|$)')
+_PT_PIN = re.compile(r'(?:^|;)\s*pt_pin=(' + _VALUE + r')\s*(?=;|$)')
+
+# 标记重复时最多记住的 pin 数，超出后忘记最早出现的
+SEEN_LIMIT = 100000
+
+# CSV 表头中可识别的列名
+_COOKIE_COLUMNS = ("cookie", "value", "jd_cookie")
+
+
+def detect_format(path):
+    """按扩展名判断文件格式，标准输入和未知扩展名按纯文本（每行一个 Cookie）处理"""
+    lower = (path or "").lower()
+    if lower.endswith(".csv"):
+        return "csv"
+    if lower.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    return "txt"
+
+
+def read_lines(path):
+    """逐行读取文件，- 表示标准输入"""
+    if path == "-":
+        yield from sys.stdin
+        return
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        yield from f
+
+
+def normalize_cookie(text):
+    """
+    校验并规范化 Cookie，返回 (pin, 'pt_key=...;pt_pin=...;')
+    缺少 pt_key / pt_pin 或值中含非法字符时抛出 ValueError
+    """
+    text = (text or "").strip()
+    pt_key = _PT_KEY.search(text)
+    pt_pin = _PT_PIN.search(text)
+    if not pt_key:
+        raise ValueError("缺少 pt_key 或格式不正确")
+    if not pt_pin:
+        raise ValueError("缺少 pt_pin 或格式不正确")
+    return pt_pin.group(1), f"pt_key={pt_key.group(1)};pt_pin={pt_pin.group(1)};"
+
+
+def _record_cookie(record):
+    """从 JSONL / CSV 的一条记录中取出 Cookie 文本"""
+    if isinstance(record, str):
+        return record
+    if not isinstance(record, dict):
+        raise ValueError("记录既不是字符串也不是对象")
+    for column in _COOKIE_COLUMNS:
+        if record.get(column):
+            return str(record[column])
+    if record.get("pt_key") and record.get("pt_pin"):
+        return f"pt_key={record['pt_key']};pt_pin={record['pt_pin']};"
+    raise ValueError("记录中没有 cookie / value 或 pt_key + pt_pin 字段")
+
+
+def parse_records(lines, fmt="txt"):
+    """
+    把文本行解析为 (行号, Cookie 文本, 错误) 序列，解析失败的行 Cookie 为 None
+    空行和 # 开头的注释行被忽略；CSV 第一个有内容的行含 cookie / pt_pin 等列名时按表头取列，否则取第一列
+    """
+    if fmt == "csv":
+        header = None
+        first = True
+        for line_no, row in enumerate(csv.reader(lines), 1):
+            if not row or not any(cell.strip() for cell in row) or row[0].startswith("#"):
+                continue
+            is_first, first = first, False
+            if is_first and "pt_key=" not in ",".join(row):
+                names = [cell.strip().lower() for cell in row]
+                if any(name in names for name in _COOKIE_COLUMNS + ("pt_pin",)):
+                    header = names
+                    continue
+            try:
+                record = dict(zip(header, row)) if header else row[0]
+                yield line_no, _record_cookie(record), None
+            except ValueError as e:
+                yield line_no, None, str(e)
+        return
+
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if fmt == "jsonl":
+            try:
+                yield line_no, _record_cookie(json.loads(line)), None
+            except ValueError as e:
+                # json.JSONDecodeError 也是 ValueError
+                yield line_no, None, str(e)
+        else:
+            yield line_no, line, None
+
+
+def validate(records, on_invalid=None):
+    """校验并规范化 Cookie，产出 (行号, pin, cookie)；不合格的行交给 on_invalid(行号, 原因) 后跳过"""
+    for line_no, text, error in records:
+        if error is None:
+            try:
+                pin, cookie = normalize_cookie(text)
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            if on_invalid:
+                on_invalid(line_no, error)
+            continue
+        yield line_no, pin, cookie
+
+
+def dedupe(records, on_duplicate=None, limit=SEEN_LIMIT):
+    """
+    标记重复的 pin 并原样流式产出 (pin, cookie)，同一 pin 以最后一次出现的为准（与 sync_cookies 一致，
+    文件后面的 Cookie 通常更新），实际合并由 batched() 在批内完成；
+    被覆盖的行交给 on_duplicate(被覆盖的行号, pin, 覆盖它的行号)。只记住最近 limit 个 pin 的行号
+    """
+    seen = OrderedDict()
+    for line_no, pin, cookie in records:
+        earlier = seen.pop(pin, None)
+        if earlier is not None and on_duplicate:
+            on_duplicate(earlier, pin, line_no)
+        seen[pin] = line_no
+        if len(seen) > limit:
+            seen.popitem(last=False)
+        yield pin, cookie
+
+
+def batched(accounts, size):
+    """把 (pin, cookie) 序列切成最多 size 个账号的列表，批内同一 pin 以最后一次出现的为准"""
+    batch = {}
+    for pin, cookie in accounts:
+        batch[pin] = cookie
+        if len(batch) >= size:
+            yield list(batch.items())
+            batch = {}
+    if batch:
+        yield list(batch.items())
+
+
+def read_cookie_files(paths, fmt=None, stats=None, on_invalid=None):
+    """
+    逐个文件流式读取，按输入顺序产出 (pin, cookie)，重复的 pin 也照常产出（由 batched() 批内合并，跨批时后写覆盖先写）
+    fmt 为空时按扩展名判断；stats 字典会累计 read / invalid / duplicates 计数；
+    on_invalid(来源, 行号, 说明) 在遇到不合格（已跳过）或被后面的行覆盖的重复行时调用
+    """
+    stats = stats if stats is not None else {}
+    for key in ("read", "invalid", "duplicates"):
+        stats.setdefault(key, 0)
+
+    def records():
+        for path in paths:
+            source = "<stdin>" if path == "-" else path
+
+            def invalid(line_no, reason, source=source):
+                stats["invalid"] += 1
+                if on_invalid:
+                    on_invalid(source, line_no, f"已跳过: {reason}")
+
+            for line_no, pin, cookie in validate(parse_records(read_lines(path), fmt or detect_format(path)),
+                                                 invalid):
+                stats["read"] += 1
+                yield (source, line_no), pin, cookie
+
+    def duplicate(location, pin, kept):
+        stats["duplicates"] += 1
+        if on_invalid:
+            on_invalid(*location, f"账号 {pin} 重复，被 {kept[0]}:{kept[1]} 覆盖")
+
+    yield from dedupe(records(), duplicate)
+
+
+def _prefetch(batches, max_pending):
+    """
+    在后台线程中预先生成批次，放入长度为 max_pending 的队列
+    发送慢时队列被填满，读取线程随之阻塞（背压），内存中最多只有 max_pending + 1 批
+    """
+    pending = queue.Queue(maxsize=max(1, max_pending))
+    done = object()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for batch in batches:
+                while not stop.is_set():
+                    try:
+                        pending.put(batch, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            pending.put(done)
+        except BaseException as e:
+            pending.put(e)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = pending.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # 发送方提前退出时让读取线程结束
+        stop.set()
+
+
+def import_cookies(accounts, panels, ring=None, batch_size=100, max_pending=2, force=False, on_batch=None):
+    """
+    把 (pin, cookie) 流分批同步到各面板
+    每批在全部面板上并发调用一次 sync_cookies（开启分片时每个面板只收到归属于它的账号），
+    一批全部完成后才发送下一批，读取最多领先 max_pending 批。
+    on_batch(批次, 结果列表, 耗时秒) 在每批完成后调用，结果列表每项包含 name、key、ok、error、accounts。
+    返回 {'batches', 'accounts', 'synced', 'failed', 'errors'}，synced / failed 按 账号×面板 计数
+    """
+    helpers = {}
+    summary = {"batches": 0, "accounts": 0, "synced": 0, "failed": 0, "errors": []}
+    for panel in panels:
+        ql = QLHelper(panel["url"], panel["client_id"], panel["client_secret"])
+        try:
+            ql.login()
+        except Exception as e:
+            summary["errors"].append(f"[{panel['name']}] {e}")
+            continue
+        helpers[TokenCache.make_key(panel["url"], panel["client_id"])] = (panel, ql)
+    if not helpers:
+        return summary
+
+    def send(key, batch):
+        panel, ql = helpers[key]
+        result = {"name": panel["name"], "key": key, "ok": True, "error": None, "accounts": []}
+        if ring is not None:
+            batch = [(pin, cookie) for pin, cookie in batch if ring.owner_key(pin) == key]
+        if not batch:
+            return result
+        try:
+            result["accounts"] = ql.sync_cookies(batch, force=force)
+            result["ok"] = all(account["ok"] for account in result["accounts"])
+        except Exception as e:
+            result["ok"] = False
+            result["error"] = str(e)
+            result["accounts"] = [{"pin": pin, "operation": None, "id": None, "ok": False, "error": str(e)}
+                                  for pin, _ in batch]
+        return result
+
+    with ThreadPoolExecutor(max_workers=min(8, len(helpers))) as pool:
+        for batch in _prefetch(batched(accounts, max(1, batch_size)), max_pending):
+            start = time.monotonic()
+            results = list(pool.map(lambda key: send(key, batch), list(helpers)))
+            summary["batches"] += 1
+            summary["accounts"] += len(batch)
+            for result in results:
+                ok = sum(1 for account in result["accounts"] if account["ok"])
+                summary["synced"] += ok
+                summary["failed"] += len(result["accounts"]) - ok
+                if result["error"]:
+                    summary["errors"].append(f"[{result['name']}] {result['error']}")
+            if on_batch:
+                on_batch(batch, results, time.monotonic() - start)
+    return summary
+
+
+def export_envs(envs, out, fmt="jsonl", panel_name=None, header=True):
+    """
+    把环境变量记录逐条写到 out，返回写出的条数
+    envs 为 cookie_envs() 格式的条目（含 pin、value、id、status、updatedAt、remarks）；
+    jsonl 每行一个对象，csv 列为 pin,cookie,status,id,updatedAt,remarks,panel，txt 每行一个 Cookie
+    """
+    writer = csv.writer(out) if fmt == "csv" else None
+    if writer and header:
+        writer.writerow(["pin", "cookie", "status", "id", "updatedAt", "remarks", "panel"])
+    count = 0
+    for env in envs:
+        if fmt == "csv":
+            writer.writerow([env.get("pin"), env.get("value"), env.get("status"), env.get("id"),
+                             env.get("updatedAt") or "", env.get("remarks") or "", panel_name or ""])
+        elif fmt == "jsonl":
+            out.write(json.dumps({"pin": env.get("pin"), "cookie": env.get("value"), "status": env.get("status"),
+                                  "id": env.get("id"), "updatedAt": env.get("updatedAt"),
+                                  "remarks": env.get("remarks"), "panel": panel_name}, ensure_ascii=False) + "\n")
+        else:
+            out.write(f"{env.get('value')}\n")
+        count += 1
+    return count
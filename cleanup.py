@@ -0,0 +1,88 @@
+"""
+清理过期的 JD_COOKIE：按备注中的写入时间、面板的 updatedAt 或 Cookie 检查结果挑出过期条目，
+每个面板用一次 PUT /open/envs/disable 禁用或一次 DELETE /open/envs 删除
+"""
+import re
+import time
+from datetime import datetime, timezone
+
+from qinglong import run_on_panels
+
+# _make_remarks() 写入的备注：macOS助手v2.0_{pin}_%Y%m%d_%H%M
+_REMARK_TIME = re.compile(r'_(\d{8}_\d{4})$')
+
+
+def parse_remark_time(remarks):
+    """从本工具写入的备注中取出写入时间（时间戳），不是本工具写入的备注返回 None"""
+    match = _REMARK_TIME.search((remarks or "").strip())
+    if not match:
+        return None
+    try:
+        return time.mktime(time.strptime(match.group(1), "%Y%m%d_%H%M"))
+    except ValueError:
+        return None
+
+
+def parse_updated_at(value):
+    """解析面板返回的 updatedAt（ISO 8601，如 2024-05-01T08:00:00.000Z），无法解析时返回 None"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def select_stale(envs, remark_days=None, updated_days=None, health=None, now=None):
+    """
+    从 cookie_envs() 格式的条目中挑出过期条目，满足任一条件即入选：
+    remark_days —— 备注中的写入时间早于该天数；updated_days —— updatedAt 早于该天数；
+    health —— HealthStore.all() 的结果，上次检查判定为失效的账号。
+    返回 [(条目, 原因列表)]，按 pin 排序
+    """
+    now = now or time.time()
+    stale = []
+    for env in envs:
+        reasons = []
+        if remark_days is not None:
+            written_at = parse_remark_time(env.get("remarks"))
+            if written_at is not None and now - written_at > remark_days * 86400:
+                reasons.append(f"备注时间 {(now - written_at) / 86400:.0f} 天前")
+        if updated_days is not None:
+            updated_at = parse_updated_at(env.get("updatedAt"))
+            if updated_at is not None and now - updated_at > updated_days * 86400:
+                reasons.append(f"更新于 {(now - updated_at) / 86400:.0f} 天前")
+        if health is not None:
+            entry = health.get(env.get("pin"))
+            if entry and entry.get("valid") is False:
+                reasons.append("检查结果为失效")
+        if reasons:
+            stale.append((env, reasons))
+    return sorted(stale, key=lambda item: item[0].get("pin") or "")
+
+
+def cleanup(panels, action="disable", dry_run=False, on_result=None, **criteria):
+    """
+    在各面板上并发清理过期条目
+    action 为 disable（禁用，已禁用的条目不再计入）或 delete；criteria 为 select_stale 的条件。
+    先强制刷新索引再挑选，每个面板最多发出一次写请求。
+    返回 run_on_panels 的结果列表，每项另含 stale（[(条目, 原因列表)]）
+    """
+    if action not in ("disable", "delete"):
+        raise ValueError(f"未知的清理方式: {action}")
+
+    def run(ql):
+        stale = select_stale(ql.cookie_envs(force=True), **criteria)
+        if action == "disable":
+            stale = [(env, reasons) for env, reasons in stale if env.get("status") != 1]
+        if stale and not dry_run:
+            ids = [env["id"] for env, _ in stale]
+            data = ql.disable_envs(ids) if action == "disable" else ql.delete_envs(ids)
+            if data.get("code") != 200:
+                raise Exception(data.get("message", "禁用环境变量失败" if action == "disable" else "删除环境变量失败"))
+        return {"stale": stale}
+
+    return run_on_panels(panels, run, on_result=on_result)
@@ -0,0 +1,155 @@
+"""
+Cookie 有效性检查：并发校验面板上的 JD_COOKIE，按令牌桶限速
+结果按 pin 保存在应用配置目录下的 health.json（最近检查时间、最近有效时间）
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from qinglong import _get_app_dir, _get_session, _extract_pin, _update_json_file
+
+# 默认校验接口：已登录时 retcode 为 "0"，Cookie 失效时为 "1001"
+DEFAULT_HEALTH_CHECK_URL = "https://me-api.jd.com/user_info/GetJDUserInfoUnion"
+
+
+class TokenBucket:
+    """线程安全的令牌桶：平均每秒 rate 个请求，允许 capacity 个突发"""
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取一个令牌，不足时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class HealthStore:
+    """按 pin 持久化的检查结果：valid、checked_at、last_valid_at、error"""
+    def __init__(self, path=None):
+        self.path = path or os.path.join(_get_app_dir(), "health.json")
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r") as f:
+                self._entries = json.load(f)
+        except Exception:
+            self._entries = {}
+
+    def get(self, pin):
+        with self._lock:
+            entry = self._entries.get(pin)
+            return dict(entry) if entry else None
+
+    def all(self):
+        with self._lock:
+            return {pin: dict(entry) for pin, entry in self._entries.items()}
+
+    def record(self, pin, valid, error=None, checked_at=None):
+        """记录一次检查结果；valid 为 None 表示无法判断（网络错误等），不改变 last_valid_at"""
+        checked_at = checked_at or time.time()
+        with self._lock:
+            entry = self._entries.setdefault(pin, {"last_valid_at": None})
+            entry["valid"] = valid
+            entry["checked_at"] = checked_at
+            entry["error"] = error
+            if valid:
+                entry["last_valid_at"] = checked_at
+
+    def save(self):
+        """
+        在跨进程锁内与磁盘上的最新内容合并后写回：同一 pin 保留 checked_at 较新的结果，
+        last_valid_at 取两者中较晚的一个，其他进程刚检查过的账号不会被覆盖
+        """
+        def merge(stored):
+            for pin, mine in self._entries.items():
+                other = stored.get(pin) or {}
+                newer = other if (other.get("checked_at") or 0) > (mine.get("checked_at") or 0) else mine
+                last_valid = [e["last_valid_at"] for e in (mine, other) if e.get("last_valid_at")]
+                stored[pin] = dict(newer, last_valid_at=max(last_valid) if last_valid else None)
+
+        with self._lock:
+            self._entries = _update_json_file(self.path, merge, ensure_ascii=False, indent=4)
+
+
+class HealthChecker:
+    """
+    并发 Cookie 检查器
+    最多 max_workers 个并发请求，整体速率由令牌桶限制为每秒 rate 个；
+    校验接口可配置，测试时可指向本地桩服务
+    """
+    def __init__(self, endpoint=None, max_workers=16, rate=10, timeout=10, store=None):
+        self.endpoint = endpoint or DEFAULT_HEALTH_CHECK_URL
+        self.max_workers = max(1, max_workers)
+        self.bucket = TokenBucket(rate)
+        self.timeout = timeout
+        self.store = store if store is not None else HealthStore()
+
+    def check_cookie(self, cookie):
+        """
+        校验单个 Cookie，返回 (valid, error)
+        retcode 为 0 视为有效，1001 视为失效，其余情况无法判断（valid 为 None）
+        """
+        self.bucket.acquire()
+        try:
+            response = _get_session().get(self.endpoint, headers={
+                "Cookie": cookie,
+                "Referer": "https://home.m.jd.com/",
+                "User-Agent": "Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15"
+            }, timeout=self.timeout)
+            retcode = str(response.json().get("retcode"))
+        except Exception as e:
+            return None, str(e)
+        if retcode == "0":
+            return True, None
+        if retcode == "1001":
+            return False, "Cookie 已失效"
+        return None, f"无法识别的返回码: {retcode}"
+
+    def check_all(self, cookies, on_result=None):
+        """
+        并发检查多个 Cookie（'pt_key=...;pt_pin=...;' 字符串序列），结果写入 store
+        返回 {pin: {'valid', 'error', 'duration_ms'}}；on_result(pin, result) 在工作线程中调用
+        """
+        def run(cookie):
+            pin = _extract_pin(cookie)
+            start = time.monotonic()
+            valid, error = self.check_cookie(cookie)
+            result = {"valid": valid, "error": error, "duration_ms": round((time.monotonic() - start) * 1000, 1)}
+            self.store.record(pin, valid, error)
+            if on_result:
+                on_result(pin, result)
+            return pin, result
+
+        unique = {}
+        for cookie in cookies:
+            pin = _extract_pin(cookie)
+            if pin:
+                unique[pin] = cookie
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = dict(pool.map(run, unique.values()))
+        self.store.save()
+        return results
+
+    def check_panel(self, ql, on_result=None):
+        """检查面板上全部 JD_COOKIE（经本地索引读取）"""
+        return self.check_all([env["value"] for env in ql.cookie_envs()], on_result=on_result)
+
+
+def make_health_checker(config):
+    """按 config.json 中的 health_check_* 配置创建检查器"""
+    return HealthChecker(endpoint=config.get("health_check_url"),
+                         max_workers=config.get("health_check_workers", 16),
+                         rate=config.get("health_check_rate", 10))
@@ -0,0 +1,175 @@
+"""
+进程内的京东扫码登录页替身，用于在本地测试无界面扫码登录（jd_browser.QRLogin）
+/login 为登录页（含二维码、一张大图、一个字体和一个统计脚本，用来验证资源屏蔽），
+页面轮询 /status，扫码后跳转到 /home 并写入 pt_key / pt_pin；按路径统计请求次数
+
+    with FakeJDLogin() as site:
+        qr = QRLogin(driver, login_url=site.login_url, cookie_url=site.home_url)
+        png = qr.open()
+        site.scan("jd_test")
+"""
+import struct
+import threading
+import uuid
+import zlib
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<style>
+@font-face { font-family: jd; src: url("/static/jd.woff2"); }
+body { font-family: jd, sans-serif; }
+.qrcode-error { display: none; }
+</style>
+<script src="/track/wl.jd.com/log.js"></script>
+</head>
+<body>
+<img class="banner" src="/static/banner.jpg?v=3">
+<div class="qrcode-img"><img src="/qr/show?v=%(version)d"></div>
+<div class="qrcode-error">二维码已失效</div>
+<script>
+setInterval(function () {
+    fetch("/status").then(function (r) { return r.text(); }).then(function (status) {
+        if (status === "scanned") { location.href = "/home"; }
+        if (status === "expired") { document.querySelector(".qrcode-error").style.display = "block"; }
+    });
+}, 300);
+</script>
+</body>
+</html>
+"""
+
+
+def _png(width, height, seed):
+    """生成一张黑白条纹 PNG，seed 不同图案不同"""
+    rows = b"".join(b"\x00" + bytes(255 if (x + y + seed) % 4 < 2 else 0 for x in range(width))
+                    for y in range(height))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows))
+            + chunk(b"IEND", b""))
+
+
+class FakeJDLogin:
+    """
+    京东扫码登录页替身
+    scan(pin) 模拟手机扫码确认，expire() 让当前二维码失效；每次打开 /login 会生成新的二维码
+    """
+    def __init__(self):
+        self.counts = Counter()
+        self.version = 0
+        self.status = "waiting"
+        self.pin = None
+        self.pt_key = None
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    # ---- 生命周期 ----
+
+    def start(self):
+        site = self
+
+        class Handler(_Handler):
+            fake = site
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def login_url(self):
+        return self.url + "/login"
+
+    @property
+    def home_url(self):
+        return self.url + "/home"
+
+    # ---- 测试控制 ----
+
+    def scan(self, pin):
+        with self._lock:
+            self.status = "scanned"
+            self.pin = pin
+            self.pt_key = "AAJ" + uuid.uuid4().hex
+
+    def expire(self):
+        with self._lock:
+            self.status = "expired"
+
+    def _open_login(self):
+        with self._lock:
+            self.version += 1
+            self.status = "waiting"
+            return self.version
+
+
+class _Handler(BaseHTTPRequestHandler):
+    fake = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type, headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        fake = self.fake
+        path = urlparse(self.path).path
+        fake.counts[path] += 1
+
+        if path == "/login":
+            body = (LOGIN_PAGE % {"version": fake._open_login()}).encode("utf-8")
+            self._send(200, body, "text/html; charset=utf-8")
+        elif path == "/qr/show":
+            self._send(200, _png(160, 160, fake.version), "image/png")
+        elif path == "/status":
+            self._send(200, fake.status.encode(), "text/plain")
+        elif path == "/home":
+            with fake._lock:
+                cookies = [] if fake.status != "scanned" else [
+                    ("Set-Cookie", f"pt_key={fake.pt_key}; Path=/"),
+                    ("Set-Cookie", f"pt_pin={fake.pin}; Path=/")
+                ]
+            self._send(200, "<html><body>home</body></html>".encode(), "text/html; charset=utf-8", cookies)
+        elif path == "/static/banner.jpg":
+            self._send(200, b"\xff\xd8" + b"\x00" * 200_000, "image/jpeg")
+        elif path == "/static/jd.woff2":
+            self._send(200, b"\x00" * 50_000, "font/woff2")
+        elif path.startswith("/track/"):
+            self._send(200, b"", "application/javascript")
+        else:
+            self._send(404, b"", "text/plain")
@@ -0,0 +1,219 @@
+"""
+进程内的青龙开放接口替身，用于离线测试和性能基准
+支持 /open/auth/token、/open/envs 的 GET/POST/PUT/DELETE 以及 /open/envs/enable、/open/envs/disable，
+可配置每个请求的延迟和错误注入，并按接口统计请求次数；chunk_delay 让响应正文分块慢速发送，用于测试流式解析
+
+    with FakeQinglong(latency=0.02) as panel:
+        ql = QLHelper(panel.url, panel.client_id, panel.client_secret)
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+class FakeQinglong:
+    """
+    青龙面板替身
+    latency 为每个请求的固定延迟（秒），error_rate 为随机返回 503 的概率，
+    fail_next(n, status) 让接下来 n 个业务请求返回指定状态码，expire_tokens() 让已发放的令牌全部失效；
+    chunk_delay 大于 0 时响应正文每 chunk_size 字节暂停 chunk_delay 秒
+    """
+    def __init__(self, latency=0.0, error_rate=0.0, id_name="id", client_id="bench", client_secret="bench",
+                 token_ttl=3600, seed=None, chunk_size=8192, chunk_delay=0.0):
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.error_rate = error_rate
+        self.id_name = id_name
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_ttl = token_ttl
+        self.envs = []
+        self.counts = Counter()
+        self._tokens = set()
+        self._next_id = 1
+        self._fail_queue = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    # ---- 生命周期 ----
+
+    def start(self):
+        panel = self
+
+        class Handler(_Handler):
+            fake = panel
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    # ---- 控制与观察 ----
+
+    def fail_next(self, count=1, status=503):
+        with self._lock:
+            self._fail_queue.extend([status] * count)
+
+    def expire_tokens(self):
+        with self._lock:
+            self._tokens.clear()
+
+    def reset_counts(self):
+        with self._lock:
+            self.counts.clear()
+
+    def add_env(self, name, value, remarks="", status=0):
+        """直接向面板写入一个环境变量（用于准备测试数据），返回其 id"""
+        with self._lock:
+            return self._create(name, value, remarks, status)[self.id_name]
+
+    def find(self, pin):
+        """按 pt_pin 精确查找环境变量记录"""
+        with self._lock:
+            for env in self.envs:
+                if f"pt_pin={pin};" in env["value"]:
+                    return dict(env)
+        return None
+
+    # ---- 内部 ----
+
+    def _create(self, name, value, remarks, status=0):
+        env = {
+            self.id_name: self._next_id,
+            "name": name,
+            "value": value,
+            "remarks": remarks,
+            "status": status,
+            "updatedAt": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+            "timestamp": time.strftime("%a %b %d %Y %H:%M:%S GMT+0800")
+        }
+        self._next_id += 1
+        self.envs.append(env)
+        return env
+
+    def _touch(self, env):
+        env["updatedAt"] = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+
+    def handle(self, method, path, query, headers, body):
+        """处理一个请求，返回 (状态码, 响应 JSON)"""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.counts[f"{method} {path}"] += 1
+
+            if path == "/open/auth/token" and method == "GET":
+                if (query.get("client_id", [""])[0] != self.client_id
+                        or query.get("client_secret", [""])[0] != self.client_secret):
+                    return 200, {"code": 400, "message": "client_id 或 client_secret 有误"}
+                token = uuid.uuid4().hex
+                self._tokens.add(token)
+                return 200, {"code": 200, "data": {"token": token, "token_type": "Bearer",
+                                                   "expiration": int(time.time()) + self.token_ttl}}
+
+            if self._fail_queue:
+                return self._fail_queue.pop(0), {"code": 500, "message": "injected"}
+            if self.error_rate and self._random.random() < self.error_rate:
+                return 503, {"code": 503, "message": "injected"}
+
+            auth = headers.get("Authorization") or ""
+            if not auth.startswith("Bearer ") or auth[len("Bearer "):] not in self._tokens:
+                return 401, {"code": 401, "message": "UnauthorizedError"}
+
+            if path == "/open/envs":
+                if method == "GET":
+                    search = query.get("searchValue", [""])[0]
+                    data = [dict(env) for env in self.envs
+                            if not search or search in env["name"] or search in env["value"] or search in env["remarks"]]
+                    return 200, {"code": 200, "data": data}
+                if method == "POST":
+                    created = [dict(self._create(item["name"], item["value"], item.get("remarks", "")))
+                               for item in body]
+                    return 200, {"code": 200, "data": created}
+                if method == "PUT":
+                    for env in self.envs:
+                        if env[self.id_name] == body.get(self.id_name):
+                            env.update({key: body[key] for key in ("name", "value", "remarks") if key in body})
+                            self._touch(env)
+                            return 200, {"code": 200, "data": dict(env)}
+                    return 200, {"code": 400, "message": "环境变量不存在"}
+                if method == "DELETE":
+                    ids = set(body)
+                    self.envs = [env for env in self.envs if env[self.id_name] not in ids]
+                    return 200, {"code": 200}
+
+            if path in ("/open/envs/enable", "/open/envs/disable") and method == "PUT":
+                status = 0 if path.endswith("enable") else 1
+                ids = set(body)
+                for env in self.envs:
+                    if env[self.id_name] in ids:
+                        env["status"] = status
+                        self._touch(env)
+                return 200, {"code": 200}
+
+            return 404, {"code": 404, "message": "Not Found"}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 关闭 Nagle，避免头和正文分两次发送时触发延迟确认
+    disable_nagle_algorithm = True
+    fake = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _dispatch(self, method):
+        parsed = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        status, payload = self.fake.handle(method, parsed.path, parse_qs(parsed.query), self.headers, body)
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if not self.fake.chunk_delay:
+            self.wfile.write(data)
+            return
+        for start in range(0, len(data), self.fake.chunk_size):
+            self.wfile.write(data[start:start + self.fake.chunk_size])
+            self.wfile.flush()
+            time.sleep(self.fake.chunk_delay)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
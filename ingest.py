@@ -0,0 +1,226 @@
+"""
+本地 Cookie 接收端点：手机或其他工具通过 HTTP 提交 Cookie，排队后按批同步到青龙
+同一 pin 在批处理窗口内的多次提交只保留最后一次，窗口结束（或攒满一批）时一次 sync_cookies 发出；
+请求本身只做校验和入队，立即返回 202
+
+    curl -X POST http://127.0.0.1:9109/cookies -d 'pt_key=xxx;pt_pin=yyy;'
+"""
+import json
+import threading
+import time
+
+from bulk_io import import_cookies, normalize_cookie
+from placement import make_ring
+from qinglong import _get_panels
+
+
+class CookieBatcher:
+    """
+    按 pin 合并的批处理队列
+    第一条提交到达后等待 window 秒（或攒满 max_batch 个账号）再调用 forward(批次)，批次为 (pin, cookie) 列表；
+    forward 在后台线程中执行，执行期间到达的提交进入下一批
+    """
+    def __init__(self, forward, window=2.0, max_batch=200, on_error=None):
+        self.forward = forward
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self.on_error = on_error
+        self.stats = {"received": 0, "coalesced": 0, "batches": 0, "forwarded": 0, "errors": 0}
+        self._pending = {}
+        self._first_at = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="ingest-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, pin, cookie):
+        """加入队列，返回当前排队的账号数；已关闭时抛出 RuntimeError"""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Cookie 接收队列已关闭")
+            self.stats["received"] += 1
+            if pin in self._pending:
+                self.stats["coalesced"] += 1
+            self._pending[pin] = cookie
+            if self._first_at is None:
+                self._first_at = time.monotonic()
+            self._condition.notify_all()
+            return len(self._pending)
+
+    def pending(self):
+        with self._condition:
+            return len(self._pending)
+
+    def snapshot(self):
+        with self._condition:
+            return dict(self.stats, pending=len(self._pending), window=self.window)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                # 等待批处理窗口结束；攒满一批或关闭时立即发出
+                while not self._closed and len(self._pending) < self.max_batch:
+                    remaining = self._first_at + self.window - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = list(self._pending.items())[:self.max_batch]
+                for pin, _ in batch:
+                    del self._pending[pin]
+                self._first_at = time.monotonic() if self._pending else None
+            try:
+                self.forward(batch)
+                with self._condition:
+                    self.stats["batches"] += 1
+                    self.stats["forwarded"] += len(batch)
+            except Exception as e:
+                with self._condition:
+                    self.stats["errors"] += 1
+                if self.on_error:
+                    self.on_error(batch, e)
+
+    def close(self, timeout=10.0):
+        """不再接收提交，立即发出剩余的批次，最多等待 timeout 秒"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+
+
+def make_forwarder(get_config, store=None, on_batch=None):
+    """
+    返回把批次同步到青龙的 forward 函数
+    每批调用时重新读取配置（get_config() 返回 config.json 内容），按分片设置选择面板；
+    store 不为空时保存 Cookie 并记录各面板的同步结果；on_batch(批次, 结果列表, 耗时秒) 同 import_cookies
+    """
+    def forward(batch):
+        config = get_config()
+        panels = _get_panels(config) or (store.panels() if store else [])
+        if not panels:
+            raise Exception("没有可用的青龙面板配置")
+
+        def report(batch, results, elapsed):
+            if store:
+                store.save_accounts(batch)
+                for result in results:
+                    if result["accounts"]:
+                        store.record_syncs(result["key"], result["accounts"], duration_ms=round(elapsed * 1000, 1))
+            if on_batch:
+                on_batch(batch, results, elapsed)
+
+        summary = import_cookies(batch, panels, ring=make_ring(config, panels), batch_size=len(batch),
+                                 max_pending=1, on_batch=report)
+        if summary["errors"] and not summary["synced"]:
+            raise Exception("; ".join(summary["errors"]))
+        return summary
+
+    return forward
+
+
+def _parse_submission(body, content_type):
+    """从请求正文中取出 Cookie 文本列表：JSON 字符串 / 数组 / {'cookie'} / {'cookies'}，或每行一个的纯文本"""
+    if "json" in content_type:
+        data = json.loads(body)
+        if isinstance(data, dict):
+            data = data.get("cookies") or [data.get("cookie")]
+        if isinstance(data, str):
+            data = [data]
+        if not isinstance(data, list):
+            raise ValueError("JSON 应为 Cookie 字符串、数组或含 cookie / cookies 字段的对象")
+        return [str(item) for item in data if item]
+    return [line.strip() for line in body.splitlines() if line.strip()]
+
+
+class IngestServer:
+    """
+    本地 Cookie 接收端点，默认只监听 127.0.0.1
+    POST /cookies 提交一个或多个 Cookie，返回 202 及接受 / 拒绝的明细；GET /status 返回队列统计。
+    设置 token 后请求须带 Authorization: Bearer <token>
+    """
+    # 单个请求正文的上限（字节）
+    MAX_BODY = 1024 * 1024
+
+    def __init__(self, port, batcher, host="127.0.0.1", token=None, on_submit=None):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status, payload):
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _authorized(self):
+                if token and self.headers.get("Authorization") != f"Bearer {token}":
+                    self._reply(401, {"error": "未授权"})
+                    return False
+                return True
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/status":
+                    self._reply(404, {"error": "Not Found"})
+                elif self._authorized():
+                    self._reply(200, batcher.snapshot())
+
+            def do_POST(self):
+                if self.path.split("?")[0] != "/cookies":
+                    self._reply(404, {"error": "Not Found"})
+                    return
+                if not self._authorized():
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > server.MAX_BODY:
+                    self._reply(413, {"error": f"请求正文超过 {server.MAX_BODY} 字节"})
+                    return
+                try:
+                    texts = _parse_submission(self.rfile.read(length).decode("utf-8"),
+                                              self.headers.get("Content-Type") or "")
+                except (ValueError, UnicodeDecodeError) as e:
+                    self._reply(400, {"error": str(e)})
+                    return
+
+                accepted, rejected = [], []
+                for text in texts:
+                    try:
+                        pin, cookie = normalize_cookie(text)
+                    except ValueError as e:
+                        rejected.append({"cookie": text[:40], "error": str(e)})
+                        continue
+                    try:
+                        batcher.submit(pin, cookie)
+                    except RuntimeError as e:
+                        self._reply(503, {"error": str(e)})
+                        return
+                    accepted.append(pin)
+                if on_submit and accepted:
+                    on_submit(accepted, self.client_address[0])
+                self._reply(202 if accepted else 400,
+                            {"accepted": accepted, "rejected": rejected, "pending": batcher.pending()})
+
+            def log_message(self, format, *args):
+                pass
+
+        self.batcher = batcher
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        """停止接收请求，并把队列中剩余的 Cookie 发出"""
+        self._server.shutdown()
+        self._server.server_close()
+        self.batcher.close(timeout)
@@ -0,0 +1,602 @@
+"""
+浏览器相关的辅助逻辑：ChromeDriver 路径解析与缓存、按账号持久化的浏览器会话池
+selenium / webdriver_manager 均按需导入，导入本模块不会拖慢启动
+"""
+import hashlib
+import json
+import os
+import plistlib
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from qinglong import _get_app_dir
+
+# 京东个人中心（移动版），登录后会写入 pt_key / pt_pin
+JD_LOGIN_URL = "https://home.m.jd.com/myJd/home.action"
+
+# 扫码登录页及其二维码图片、二维码失效提示的选择器
+QR_LOGIN_URL = "https://passport.jd.com/new/login.aspx"
+QR_IMAGE_SELECTOR = ".qrcode-img img"
+QR_EXPIRED_SELECTOR = ".qrcode-error"
+
+# 扫码登录时通过 DevTools 屏蔽的请求：静态图片、字体、音视频和统计脚本。
+# 京东 CDN 的图片地址常带查询参数或 ! 开头的裁剪后缀（如 a.jpg!q70.dpg?v=1），每个扩展名同时匹配这两种写法
+# （setBlockedURLs 只支持 * 通配符，? 和 ! 按字面匹配）；
+# 二维码由 qr.m.jd.com/show 动态生成，地址不带扩展名，不会被这些规则屏蔽
+_BLOCKED_EXTENSIONS = (
+    "jpg", "jpeg", "png", "gif", "webp", "svg", "ico", "dpg", "avif",
+    "woff", "woff2", "ttf", "otf", "eot",
+    "mp4", "webm", "mp3"
+)
+BLOCKED_URL_PATTERNS = tuple(
+    pattern for ext in _BLOCKED_EXTENSIONS for pattern in (f"*.{ext}", f"*.{ext}?*", f"*.{ext}!*")
+) + (
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*hm.baidu.com*",
+    "*wl.jd.com*", "*mercury.jd.com*", "*sgm-static.jd.com*"
+)
+
+
+def detect_chrome_version():
+    """
+    不启动浏览器，直接读取本机 Chrome 的版本号，读取失败时返回 None
+    macOS 读取 Info.plist，Windows 读取注册表，其余系统执行 --version
+    """
+    try:
+        if sys.platform == "darwin":
+            for app_dir in ("/Applications", os.path.expanduser("~/Applications")):
+                plist_path = os.path.join(app_dir, "Google Chrome.app", "Contents", "Info.plist")
+                if os.path.exists(plist_path):
+                    with open(plist_path, "rb") as f:
+                        return plistlib.load(f).get("CFBundleShortVersionString")
+        elif os.name == "nt":
+            import winreg
+            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Software\Google\Chrome\BLBeacon") as key:
+                return winreg.QueryValueEx(key, "version")[0]
+        else:
+            for name in ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser"):
+                binary = shutil.which(name)
+                if not binary:
+                    continue
+                output = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=5).stdout
+                match = re.search(r"\d+(?:\.\d+)+", output)
+                if match:
+                    return match.group(0)
+    except Exception:
+        pass
+    return None
+
+
+class ChromeDriverResolver:
+    """
+    ChromeDriver 路径解析器
+    以本机 Chrome 版本号为键缓存 webdriver-manager 解析出的驱动路径（chromedriver_cache.json），
+    Chrome 版本不变且驱动文件仍在时直接复用，无需联网；版本变化后才重新解析。
+    读不到 Chrome 版本时沿用最近一次缓存且仍存在的驱动，没有缓存才联网解析。
+    prewarm() 在后台线程提前解析，resolve() 会等待进行中的预热而不会重复下载
+    """
+    # 读不到 Chrome 版本时缓存条目使用的键
+    UNKNOWN_VERSION = "unknown"
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(_get_app_dir(), "chromedriver_cache.json")
+        self._lock = threading.Lock()
+        self._prewarm_thread = None
+        # 本进程内只探测一次 Chrome 版本（Linux 上需要启动一次 chrome --version）
+        self._chrome_version = None
+        self._version_detected = False
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _save(self, entries):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f, indent=4)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _usable(driver_path):
+        return bool(driver_path) and os.path.isfile(driver_path) and os.access(driver_path, os.X_OK)
+
+    def cached_path(self, chrome_version):
+        """
+        返回该 Chrome 版本对应且仍然存在的驱动路径，没有则返回 None
+        chrome_version 为空（读不到版本）时返回最近一次缓存且仍然存在的驱动路径
+        """
+        entries = self._load()
+        if chrome_version:
+            driver_path = entries.get(chrome_version)
+            return driver_path if self._usable(driver_path) else None
+        for driver_path in reversed(list(entries.values())):
+            if self._usable(driver_path):
+                return driver_path
+        return None
+
+    def chrome_version(self):
+        """本机 Chrome 版本号，本进程内只探测一次"""
+        if not self._version_detected:
+            self._chrome_version = detect_chrome_version()
+            self._version_detected = True
+        return self._chrome_version
+
+    def resolve(self):
+        """返回 (驱动路径, 是否命中缓存)；未命中时通过 webdriver-manager 解析并写入缓存"""
+        with self._lock:
+            chrome_version = self.chrome_version()
+            driver_path = self.cached_path(chrome_version)
+            if driver_path:
+                return driver_path, True
+
+            from webdriver_manager.chrome import ChromeDriverManager
+            driver_path = ChromeDriverManager().install()
+            # 只保留最近一次解析的结果，旧版本的条目随 Chrome 升级失效
+            try:
+                self._save({chrome_version or self.UNKNOWN_VERSION: driver_path})
+            except Exception:
+                pass
+            return driver_path, False
+
+    def prewarm(self):
+        """在后台线程中提前解析驱动路径，失败时静默（点击登录时会重新尝试并报告错误）"""
+        def run():
+            try:
+                self.resolve()
+            except Exception:
+                pass
+
+        if self._prewarm_thread is None or not self._prewarm_thread.is_alive():
+            self._prewarm_thread = threading.Thread(target=run, daemon=True)
+            self._prewarm_thread.start()
+
+
+_driver_resolver = None
+_driver_resolver_lock = threading.Lock()
+
+
+def _get_driver_resolver():
+    """获取进程内共享的 ChromeDriver 解析器"""
+    global _driver_resolver
+    with _driver_resolver_lock:
+        if _driver_resolver is None:
+            _driver_resolver = ChromeDriverResolver()
+        return _driver_resolver
+
+
+def extract_jd_cookie(cookies):
+    """从 selenium 返回的 Cookie 列表中取出 (pt_key, pt_pin)，缺失的项为空字符串"""
+    pt_key = ""
+    pt_pin = ""
+    for cookie in cookies:
+        if cookie['name'] == 'pt_key':
+            pt_key = cookie['value']
+        elif cookie['name'] == 'pt_pin':
+            pt_pin = cookie['value']
+    return pt_key, pt_pin
+
+
+def read_jd_cookie(driver, url=JD_LOGIN_URL):
+    """
+    只读取京东域名（或 url 对应域名）下的 (pt_key, pt_pin)
+    优先通过 DevTools 的 Network.getCookies 按 URL 过滤，避免取回整个 Cookie 罐；不支持时退回 get_cookies
+    """
+    try:
+        cookies = driver.execute_cdp_cmd("Network.getCookies", {"urls": [url]})["cookies"]
+    except Exception:
+        cookies = driver.get_cookies()
+    return extract_jd_cookie(cookies)
+
+
+class LoginWatcher:
+    """
+    等待京东登录完成并自动取回 Cookie
+    在后台线程中按域名过滤轮询 pt_key/pt_pin，间隔从 min_interval 按 1.5 倍递增到 max_interval；
+    检测到后调用 on_login(pt_key, pt_pin)，超时调用 on_timeout()，浏览器被关闭等错误调用 on_error(e)。
+    回调都在后台线程中执行
+    """
+    def __init__(self, driver, on_login, on_timeout=None, on_error=None,
+                 timeout=300, min_interval=0.5, max_interval=3.0):
+        self.driver = driver
+        self.on_login = on_login
+        self.on_timeout = on_timeout
+        self.on_error = on_error
+        self.timeout = timeout
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        deadline = time.monotonic() + self.timeout
+        interval = self.min_interval
+        while not self._stop.is_set():
+            try:
+                pt_key, pt_pin = read_jd_cookie(self.driver)
+            except Exception as e:
+                if not self._stop.is_set() and self.on_error:
+                    self.on_error(e)
+                return
+            if pt_key and pt_pin:
+                if not self._stop.is_set():
+                    self.on_login(pt_key, pt_pin)
+                return
+            if time.monotonic() >= deadline:
+                if self.on_timeout:
+                    self.on_timeout()
+                return
+            self._stop.wait(interval)
+            interval = min(self.max_interval, interval * 1.5)
+
+
+def block_requests(driver, patterns=BLOCKED_URL_PATTERNS):
+    """通过 DevTools 屏蔽匹配 patterns（* 为通配符）的请求，对之后的页面加载生效"""
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(patterns)})
+
+
+class QRLogin:
+    """
+    无界面扫码登录
+    在（通常为无头的）浏览器中打开扫码登录页，截取二维码图片交给界面显示，
+    后台轮询 Cookie 直到出现 pt_key；二维码失效时重新加载页面并回调新的二维码。
+    登录页、选择器和 Cookie 地址都可以替换，便于用本地页面（fake_jd_login.py）测试
+    """
+    def __init__(self, driver, login_url=QR_LOGIN_URL, cookie_url=JD_LOGIN_URL,
+                 image_selector=QR_IMAGE_SELECTOR, expired_selector=QR_EXPIRED_SELECTOR,
+                 blocked=BLOCKED_URL_PATTERNS, poll_interval=1.0):
+        self.driver = driver
+        self.login_url = login_url
+        self.cookie_url = cookie_url
+        self.image_selector = image_selector
+        self.expired_selector = expired_selector
+        self.blocked = blocked
+        self.poll_interval = poll_interval
+        self._qr_src = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def open(self, timeout=20):
+        """屏蔽无关资源后打开登录页，等待二维码加载完成，返回二维码的 PNG 数据"""
+        if self.blocked:
+            block_requests(self.driver, self.blocked)
+        self.driver.get(self.login_url)
+        return self.capture(timeout)
+
+    def capture(self, timeout=20):
+        """等待二维码图片加载完成并截图，返回 PNG 数据"""
+        from selenium.webdriver.common.by import By
+
+        deadline = time.monotonic() + timeout
+        while True:
+            images = self.driver.find_elements(By.CSS_SELECTOR, self.image_selector)
+            if images and self.driver.execute_script(
+                    "return arguments[0].complete && arguments[0].naturalWidth > 0", images[0]):
+                self._qr_src = images[0].get_attribute("src")
+                return images[0].screenshot_as_png
+            if time.monotonic() >= deadline:
+                raise TimeoutError("登录二维码加载超时")
+            time.sleep(0.2)
+
+    def _expired(self):
+        from selenium.webdriver.common.by import By
+
+        if self.expired_selector:
+            for element in self.driver.find_elements(By.CSS_SELECTOR, self.expired_selector):
+                if element.is_displayed():
+                    return True
+        images = self.driver.find_elements(By.CSS_SELECTOR, self.image_selector)
+        # 页面自行刷新了二维码
+        return bool(images) and images[0].get_attribute("src") != self._qr_src
+
+    def watch(self, on_login, on_qr=None, on_timeout=None, on_error=None, timeout=300):
+        """
+        在后台线程中等待扫码完成
+        检测到 pt_key 时调用 on_login(pt_key, pt_pin)；二维码更新时调用 on_qr(png)；
+        超时调用 on_timeout()，浏览器出错调用 on_error(e)。回调都在后台线程中执行
+        """
+        def run():
+            deadline = time.monotonic() + timeout
+            left_login_page = False
+            while not self._stop.wait(self.poll_interval):
+                try:
+                    pt_key, pt_pin = read_jd_cookie(self.driver, self.cookie_url)
+                    if pt_key and pt_pin:
+                        if not self._stop.is_set():
+                            on_login(pt_key, pt_pin)
+                        return
+                    if not self.driver.current_url.startswith(self.login_url):
+                        # 扫码后跳转到了其他页面，打开移动版页面让京东写入 pt_key（只跳转一次）
+                        if not left_login_page:
+                            left_login_page = True
+                            self.driver.get(self.cookie_url)
+                    elif self._expired():
+                        self.driver.get(self.login_url)
+                        png = self.capture()
+                        if on_qr:
+                            on_qr(png)
+                except Exception as e:
+                    if not self._stop.is_set() and on_error:
+                        on_error(e)
+                    return
+                if time.monotonic() >= deadline:
+                    if on_timeout and not self._stop.is_set():
+                        on_timeout()
+                    return
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+def launch_chrome(profile_dir=None, headless=False, resolver=None):
+    """启动 Chrome 并返回 selenium driver；指定 profile_dir 时使用该目录作为持久化用户数据目录"""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service as ChromeService
+
+    driver_path, _ = (resolver or _get_driver_resolver()).resolve()
+    chrome_options = webdriver.ChromeOptions()
+    # 设置窗口大小和位置
+    # chrome_options.add_argument("--window-size=500,1000")  # 宽度500px，高度1000px
+    chrome_options.add_argument("--window-position=200,100")  # 距离屏幕左边200px，顶部100px
+    if profile_dir:
+        chrome_options.add_argument(f"--user-data-dir={profile_dir}")
+    if headless:
+        chrome_options.add_argument("--headless=new")
+        # 无界面时关闭用不到的后台功能，减少内存占用
+        for argument in ("--disable-extensions", "--disable-background-networking", "--disable-sync",
+                         "--disable-default-apps", "--mute-audio", "--no-first-run", "--window-size=1000,800"):
+            chrome_options.add_argument(argument)
+
+    # 可选的其他设置（你可以根据需要启用）
+    # chrome_options.add_argument("--start-maximized")  # 最大化启动
+    # chrome_options.add_argument("--force-device-scale-factor=1.1")  # 缩放110%
+    return webdriver.Chrome(service=ChromeService(executable_path=driver_path), options=chrome_options)
+
+
+class BrowserSession:
+    """会话池中的一个浏览器会话，对应一个持久化的 Chrome 用户数据目录"""
+    def __init__(self, key, profile_dir, driver):
+        self.key = key            # 账号 pin，新登录尚未识别账号时为临时名
+        self.profile_dir = profile_dir
+        self.driver = driver
+        self.last_used = time.monotonic()
+        self.in_use = 0
+
+    def read_cookie(self):
+        """读取当前会话的 (pt_key, pt_pin)"""
+        return read_jd_cookie(self.driver)
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+
+
+class BrowserPool:
+    """
+    浏览器会话池
+    每个账号使用独立且持久化的 --user-data-dir（profiles/ 目录下，pin → 目录的映射保存在 profiles.json），
+    仍处于登录状态的账号重新打开即可拿到新 Cookie，无需再次登录。
+    同时打开的会话数不超过 max_sessions，超出时关闭最久未使用的空闲会话（LRU）；
+    全部会话都在使用中时 acquire 会等待。
+    新登录的临时资料目录（_new_ 开头）在绑定账号前被关闭时随之删除，启动时清理遗留的临时目录
+    """
+    # 临时资料目录的前缀
+    NEW_PREFIX = "_new_"
+    # 启动时清理超过该秒数未改动、也未绑定账号的临时资料目录（更新的可能属于另一个进程中正在进行的登录）
+    STALE_PROFILE_AGE = 24 * 3600
+
+    def __init__(self, max_sessions=3, profiles_dir=None, resolver=None, headless=False):
+        self.max_sessions = max(1, max_sessions)
+        self.profiles_dir = profiles_dir or os.path.join(_get_app_dir(), "profiles")
+        self.resolver = resolver
+        self.headless = headless
+        self.sessions = {}
+        self._condition = threading.Condition()
+        self._launching = set()
+        os.makedirs(self.profiles_dir, exist_ok=True)
+        self._index_path = os.path.join(self.profiles_dir, "profiles.json")
+        self._sweep_stale_profiles()
+
+    def _load_index(self):
+        try:
+            with open(self._index_path, "r") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _save_index(self, index):
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, self._index_path)
+
+    def known_pins(self):
+        """已保存浏览器资料（曾经登录过）的账号列表"""
+        return list(self._load_index())
+
+    def profile_dir_for(self, pin):
+        """返回账号对应的资料目录，未知账号返回 None"""
+        name = self._load_index().get(pin)
+        return os.path.join(self.profiles_dir, name) if name else None
+
+    def _sweep_stale_profiles(self):
+        """删除遗留的、未绑定账号的临时资料目录（登录被取消、超时或进程退出时留下的）"""
+        assigned = set(self._load_index().values())
+        now = time.time()
+        for name in os.listdir(self.profiles_dir):
+            path = os.path.join(self.profiles_dir, name)
+            if not name.startswith(self.NEW_PREFIX) or name in assigned or not os.path.isdir(path):
+                continue
+            try:
+                if now - os.path.getmtime(path) > self.STALE_PROFILE_AGE:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                pass
+
+    def _discard(self, session):
+        """关闭会话；尚未绑定账号的临时资料目录一并删除（不能在持有锁时调用，Chrome 退出需要数秒）"""
+        session.quit()
+        if session.key.startswith(self.NEW_PREFIX):
+            shutil.rmtree(session.profile_dir, ignore_errors=True)
+
+    def _pop_idle(self):
+        """从池中取出最久未使用的空闲会话，没有空闲会话时返回 None（调用方需持有锁，取出后在锁外关闭）"""
+        idle = [session for session in self.sessions.values() if not session.in_use]
+        if not idle:
+            return None
+        victim = min(idle, key=lambda session: session.last_used)
+        del self.sessions[victim.key]
+        return victim
+
+    def acquire(self, pin=None, timeout=None, headless=None):
+        """
+        获取一个会话并标记为使用中，用完后调用 release
+        pin 为空时为新账号登录创建一个临时资料目录，登录后用 assign 绑定账号；
+        headless 为 None 时使用会话池的设置
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        victim = None
+        with self._condition:
+            while True:
+                if pin and pin in self.sessions:
+                    session = self.sessions[pin]
+                    session.in_use += 1
+                    session.last_used = time.monotonic()
+                    return session
+                # 同一账号的资料目录同一时间只能被一个 Chrome 使用，等待正在进行的启动
+                if not (pin and pin in self._launching):
+                    if len(self.sessions) + len(self._launching) < self.max_sessions:
+                        break
+                    victim = self._pop_idle()
+                    if victim is not None:
+                        break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"浏览器会话已满（{self.max_sessions} 个都在使用中）")
+                self._condition.wait(remaining)
+            key = pin or f"{self.NEW_PREFIX}{uuid.uuid4().hex[:12]}"
+            self._launching.add(key)
+
+        # 在锁外关闭被淘汰的会话，不阻塞其他线程的 acquire / release
+        if victim is not None:
+            self._discard(victim)
+
+        try:
+            profile_dir = (pin and self.profile_dir_for(pin)) or os.path.join(self.profiles_dir, self._dir_name(key))
+            driver = launch_chrome(profile_dir, headless=self.headless if headless is None else headless,
+                                   resolver=self.resolver)
+        except Exception:
+            with self._condition:
+                self._launching.discard(key)
+                self._condition.notify_all()
+            if key.startswith(self.NEW_PREFIX):
+                shutil.rmtree(profile_dir, ignore_errors=True)
+            raise
+
+        session = BrowserSession(key, profile_dir, driver)
+        session.in_use = 1
+        with self._condition:
+            self._launching.discard(key)
+            self.sessions[key] = session
+            self._condition.notify_all()
+        return session
+
+    def release(self, session):
+        with self._condition:
+            session.in_use = max(0, session.in_use - 1)
+            session.last_used = time.monotonic()
+            self._condition.notify_all()
+
+    def assign(self, session, pin):
+        """登录完成后把会话及其资料目录绑定到账号，之后可直接用 pin 重新打开"""
+        old = None
+        with self._condition:
+            if session.key != pin:
+                self.sessions.pop(session.key, None)
+                old = self.sessions.pop(pin, None)
+                session.key = pin
+                self.sessions[pin] = session
+            index = self._load_index()
+            name = os.path.basename(session.profile_dir)
+            # 一个资料目录同一时间只保存一个账号的登录状态，在别的账号的资料中重新登录后原账号不再指向它
+            for other in [other for other, other_name in index.items() if other_name == name and other != pin]:
+                del index[other]
+            index[pin] = name
+            self._save_index(index)
+        if old is not None and old is not session:
+            old.quit()
+
+    def close(self, pin):
+        with self._condition:
+            session = self.sessions.pop(pin, None)
+            self._condition.notify_all()
+        if session:
+            self._discard(session)
+
+    def close_all(self):
+        with self._condition:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+            self._condition.notify_all()
+        for session in sessions:
+            self._discard(session)
+
+    def harvest(self, pin):
+        """
+        用账号已保存的浏览器资料打开京东并读取 Cookie
+        仍处于登录状态时返回 'pt_key=...;pt_pin=...;'，需要重新登录时返回 None
+        """
+        session = self.acquire(pin)
+        try:
+            session.driver.get(JD_LOGIN_URL)
+            pt_key, pt_pin = session.read_cookie()
+            if pt_key and pt_pin:
+                return f"pt_key={pt_key};pt_pin={pt_pin};"
+            return None
+        finally:
+            self.release(session)
+
+    def harvest_many(self, pins, on_result=None):
+        """
+        并发读取多个账号的 Cookie，并发数不超过 max_sessions
+        返回 {pin: cookie 或 None}，出错的账号值为异常对象
+        """
+        def run(pin):
+            try:
+                result = self.harvest(pin)
+            except Exception as e:
+                result = e
+            if on_result:
+                on_result(pin, result)
+            return pin, result
+
+        with ThreadPoolExecutor(max_workers=self.max_sessions) as pool:
+            return dict(pool.map(run, pins))
+
+    @staticmethod
+    def _dir_name(key):
+        """把账号名转换为安全的目录名，附加短哈希避免不同 pin 清洗后重名"""
+        safe = re.sub(r'[^\w.-]', '_', key)[:40]
+        return f"{safe}_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]}"
@@ -0,0 +1,702 @@
+"""
+青龙京东助手命令行入口
+不导入 tkinter / selenium，可在无图形界面的服务器上由 cron 调用
+
+    python3 jd_cookie_cli.py status [--check]
+    python3 jd_cookie_cli.py list [--refresh] [--json]
+    python3 jd_cookie_cli.py sync --cookie "pt_key=xxx;pt_pin=yyy;"
+    python3 jd_cookie_cli.py sync --file cookies.txt     # 每行一个 Cookie，- 表示标准输入
+    python3 jd_cookie_cli.py sync --stored               # 同步账号存储中的全部账号
+    python3 jd_cookie_cli.py import cookies.csv          # 流式批量导入 CSV / JSONL / 纯文本文件
+    python3 jd_cookie_cli.py export -o cookies.jsonl     # 导出面板上的 JD_COOKIE
+    python3 jd_cookie_cli.py ingest --port 9109          # 在本地端口接收其他设备提交的 Cookie 并按批同步
+    python3 jd_cookie_cli.py cleanup --invalid --dry-run # 列出（或禁用/删除）过期的 JD_COOKIE
+    python3 jd_cookie_cli.py rebalance [--dry-run]       # 开启分片后把账号迁移到归属面板
+    python3 jd_cookie_cli.py accounts [--json]           # 列出账号存储中的账号和各面板的上次同步结果
+    python3 jd_cookie_cli.py harvest --sync              # 用已保存的浏览器资料重新获取 Cookie 并同步
+    python3 jd_cookie_cli.py logs --summary --hours 24   # 汇总最近一天的同步耗时和失败率
+    python3 jd_cookie_cli.py health [--interval 60]      # 并发检查面板上全部 Cookie 是否有效
+    python3 jd_cookie_cli.py metrics [--serve 9108]      # 以 Prometheus 文本格式导出各阶段耗时
+"""
+import argparse
+import collections
+import json
+import sys
+import time
+
+from qinglong import (_get_config_path, load_config, _get_panels, _extract_pin, run_on_panels,
+                      HTTP_STATS, _get_token_cache, _get_env_index, QLHelper, TokenCache)
+from account_store import _get_account_store
+from bulk_io import FORMATS, detect_format, export_envs, import_cookies, read_cookie_files
+from placement import HashRing, make_ring, rebalance
+from log_sink import PHASE_LOG, _get_log_sink, log_path, read_logs, summarize_logs
+from metrics import LOG_PREFIX, MetricsServer, metrics_from_logs, render_prometheus
+
+
+def _load_config(args):
+    """读取 --config 指定（或默认）的配置文件，读取失败时退出"""
+    try:
+        return load_config(args.config)
+    except Exception as e:
+        print(f"❌ 读取配置失败: {e}", file=sys.stderr)
+        sys.exit(2)
+
+
+def _all_panels(args):
+    """返回配置中的全部面板；config.json 中没有面板时使用账号存储中保存的面板配置"""
+    return _get_panels(_load_config(args)) or _get_account_store().panels()
+
+
+def _select_panels(args):
+    """按 --config / --panel 选出要操作的面板，没有可用面板时退出"""
+    panels = _all_panels(args)
+    if args.panel:
+        panels = [p for p in panels if p["name"] in args.panel or p["url"] in args.panel]
+    if not panels:
+        print(f"❌ 没有可用的青龙面板配置: {args.config or _get_config_path()}", file=sys.stderr)
+        sys.exit(2)
+    return panels
+
+
+def _shard(args, panels, accounts):
+    """
+    开启分片时每个账号只同步到其归属面板（归属按全部面板计算，不受 --panel 影响）
+    返回 (有归属账号的面板, 面板键 → (pin, cookie) 列表)；未开启分片时返回 (panels, None)
+    """
+    ring = make_ring(_load_config(args), _all_panels(args))
+    if not ring:
+        return panels, None
+    owned = {}
+    for pin, cookie in accounts:
+        owned.setdefault(ring.owner_key(pin), []).append((pin, cookie))
+    return [p for p in panels if TokenCache.make_key(p["url"], p["client_id"]) in owned], owned
+
+
+def _read_cookies(args):
+    """从 --cookie、--file 和 --stored（账号存储）读取 Cookie，返回 (pin, cookie) 列表"""
+    lines = list(args.cookie or [])
+    if args.stored:
+        lines.extend(cookie for _, cookie in _get_account_store().cookies())
+    for path in args.file or []:
+        if path == "-":
+            lines.extend(sys.stdin)
+        else:
+            with open(path, "r") as f:
+                lines.extend(f)
+
+    accounts = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        pin = _extract_pin(line)
+        if not pin or "pt_key=" not in line:
+            print(f"⚠️ 跳过格式不正确的 Cookie: {line[:40]}", file=sys.stderr)
+            continue
+        accounts.append((pin, line))
+    return accounts
+
+
+def cmd_sync(args):
+    accounts = _read_cookies(args)
+    if not accounts:
+        print("❌ 没有可同步的 Cookie", file=sys.stderr)
+        return 2
+    panels = _select_panels(args)
+    store = _get_account_store()
+    store.save_accounts(accounts)
+    panels, owned = _shard(args, panels, accounts)
+    panel_keys = {panel["name"]: TokenCache.make_key(panel["url"], panel["client_id"]) for panel in panels}
+
+    def report(result):
+        sink = _get_log_sink()
+        duration_ms = round(result["elapsed"] * 1000, 1)
+        store.record_syncs(panel_keys[result["name"]], result.get("accounts", []), duration_ms=duration_ms)
+        for account in result.get("accounts", []):
+            sink.emit("INFO" if account["ok"] else "ERROR", "cli sync", pin=account["pin"], panel=result["name"],
+                      operation="sync", ok=account["ok"], error=account["error"], duration_ms=duration_ms)
+        if not result.get("accounts"):
+            sink.emit("ERROR", "cli sync", panel=result["name"], operation="sync", ok=False,
+                      error=result["error"], duration_ms=duration_ms)
+        if args.json:
+            return
+        if not result["ok"] and not result.get("accounts"):
+            print(f"❌ [{result['name']}] {result['error']} ({result['elapsed'] * 1000:.0f} ms)")
+            return
+        unchanged = 0
+        for account in result.get("accounts", []):
+            if account["ok"] and account["operation"] == "未变化":
+                unchanged += 1
+            elif account["ok"]:
+                print(f"✅ [{result['name']}] {account['pin']}: {account['operation']} (ID: {account['id']})")
+            else:
+                print(f"❌ [{result['name']}] {account['pin']}: {account['error']}")
+        if unchanged:
+            print(f"   [{result['name']}] {unchanged} 个账号的 Cookie 未变化，已跳过")
+        print(f"   [{result['name']}] 完成，耗时 {result['elapsed'] * 1000:.0f} ms")
+
+    def sync(ql):
+        synced = ql.sync_cookies(owned[ql.panel_key] if owned else accounts, force=args.force)
+        return {"ok": all(a["ok"] for a in synced), "accounts": synced}
+
+    results = run_on_panels(panels, sync, on_result=report)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+def cmd_harvest(args):
+    # 只有这个子命令需要浏览器，按需导入
+    from jd_browser import BrowserPool
+
+    try:
+        config = load_config(args.config)
+    except Exception:
+        config = {}
+    max_sessions = args.max_sessions or config.get("browser_max_sessions", 3)
+    pool = BrowserPool(max_sessions=max_sessions, headless=args.headless)
+    pins = args.pin or pool.known_pins()
+    if not pins:
+        print("❌ 没有已保存浏览器资料的账号，请先在图形界面中登录一次", file=sys.stderr)
+        return 2
+
+    def report(pin, result):
+        if isinstance(result, Exception):
+            print(f"❌ {pin}: {result}")
+        elif result is None:
+            print(f"⚠️ {pin}: 登录已失效，需要重新登录")
+        else:
+            print(f"✅ {pin}: 已获取 Cookie")
+
+    try:
+        harvested = pool.harvest_many(pins, on_result=report)
+    finally:
+        pool.close_all()
+
+    accounts = [(pin, cookie) for pin, cookie in harvested.items() if isinstance(cookie, str)]
+    _get_account_store().save_accounts(accounts)
+    print(f"🍪 共获取 {len(accounts)}/{len(pins)} 个账号的 Cookie")
+    if args.sync and accounts:
+        panels, owned = _shard(args, _select_panels(args), accounts)
+        results = run_on_panels(
+            panels, lambda ql: {"accounts": ql.sync_cookies(owned[ql.panel_key] if owned else accounts)})
+        for result in results:
+            if not result["ok"]:
+                print(f"❌ [{result['name']}] {result['error']}")
+                continue
+            failed = [a for a in result["accounts"] if not a["ok"]]
+            print(f"🚀 [{result['name']}] 同步 {len(result['accounts']) - len(failed)}/{len(result['accounts'])} 个账号")
+            for account in failed:
+                print(f"   ❌ {account['pin']}: {account['error']}")
+        if not all(r["ok"] and all(a["ok"] for a in r["accounts"]) for r in results):
+            return 1
+    return 0 if len(accounts) == len(pins) else 1
+
+
+def cmd_import(args):
+    stats = {}
+
+    def invalid(source, line_no, reason):
+        if not args.quiet:
+            print(f"⚠️ {source}:{line_no} {reason}", file=sys.stderr)
+
+    accounts = read_cookie_files(args.files, fmt=args.format, stats=stats, on_invalid=invalid)
+    if args.dry_run:
+        for _ in accounts:
+            pass
+        unique = stats["read"] - stats["duplicates"]
+        print(f"🔍 有效 {stats['read']} 行（去重后 {unique} 个账号），格式错误 {stats['invalid']} 行，"
+              f"重复 {stats['duplicates']} 行（未做任何修改）")
+        return 0 if unique else 2
+
+    panels = _select_panels(args)
+    ring = make_ring(_load_config(args), _all_panels(args))
+    store = _get_account_store()
+    sink = _get_log_sink()
+    batches = [0]
+
+    def report(batch, results, elapsed):
+        batches[0] += 1
+        duration_ms = round(elapsed * 1000, 1)
+        store.save_accounts(batch)
+        synced = failed = 0
+        for result in results:
+            if result["accounts"]:
+                store.record_syncs(result["key"], result["accounts"], duration_ms=duration_ms)
+            for account in result["accounts"]:
+                if account["ok"]:
+                    synced += 1
+                    continue
+                failed += 1
+                sink.emit("ERROR", "cli import", pin=account["pin"], panel=result["name"], operation="import",
+                          ok=False, error=account["error"], duration_ms=duration_ms)
+                if not args.quiet:
+                    print(f"❌ [{result['name']}] {account['pin']}: {account['error']}")
+        sink.emit("INFO" if not failed else "WARN", "cli import", operation="import", ok=not failed,
+                  accounts=len(batch), synced=synced, failed=failed, duration_ms=duration_ms)
+        print(f"📦 第 {batches[0]} 批 {len(batch)} 个账号: 成功 {synced}" + (f"，失败 {failed}" if failed else "")
+              + f" ({duration_ms:.0f} ms)")
+
+    try:
+        summary = import_cookies(accounts, panels, ring=ring, batch_size=args.batch_size,
+                                 max_pending=args.max_pending, force=args.force, on_batch=report)
+    except OSError as e:
+        print(f"❌ 读取文件失败: {e}", file=sys.stderr)
+        return 2
+    for error in summary["errors"]:
+        print(f"❌ {error}")
+    print(f"📥 导入完成: 读取 {stats.get('read', 0)} 个有效 Cookie（格式错误 {stats.get('invalid', 0)} 行，"
+          f"重复 {stats.get('duplicates', 0)} 行），{summary['batches']} 批共 {summary['accounts']} 个账号，"
+          f"同步成功 {summary['synced']}，失败 {summary['failed']}")
+    if not summary["accounts"] and not summary["errors"]:
+        return 2
+    return 0 if not summary["errors"] and not summary["failed"] else 1
+
+
+def cmd_export(args):
+    panels = _select_panels(args)
+    to_stdout = not args.output or args.output == "-"
+    fmt = args.format or ("jsonl" if to_stdout else detect_format(args.output))
+    out = sys.stdout if to_stdout else open(args.output, "w", encoding="utf-8", newline="")
+    total = 0
+    failed = False
+    try:
+        for panel in panels:
+            ql = QLHelper(panel["url"], panel["client_id"], panel["client_secret"])
+            try:
+                ql.login()
+                envs = ql.cookie_envs(force=args.refresh)
+            except Exception as e:
+                print(f"❌ [{panel['name']}] {e}", file=sys.stderr)
+                failed = True
+                continue
+            if args.enabled_only:
+                envs = [env for env in envs if env.get("status") == 0]
+            count = export_envs(envs, out, fmt, panel_name=panel["name"], header=total == 0)
+            total += count
+            print(f"📤 [{panel['name']}] 导出 {count} 个 JD_COOKIE", file=sys.stderr)
+    finally:
+        if not to_stdout:
+            out.close()
+    if not to_stdout:
+        print(f"📤 共导出 {total} 条到 {args.output}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def cmd_ingest(args):
+    from ingest import CookieBatcher, IngestServer, make_forwarder
+
+    config = _load_config(args)
+    port = args.port or config.get("ingest_port")
+    if not port:
+        print("❌ 请用 --port 或 config.json 的 ingest_port 指定监听端口", file=sys.stderr)
+        return 2
+    _select_panels(args)
+    sink = _get_log_sink()
+
+    def report(batch, results, elapsed):
+        for result in results:
+            failed = [a for a in result["accounts"] if not a["ok"]]
+            changed = [a for a in result["accounts"] if a["ok"] and a["operation"] != "未变化"]
+            if result["accounts"]:
+                print(f"🚀 [{result['name']}] {len(result['accounts'])} 个账号: 写入 {len(changed)}，"
+                      f"未变化 {len(result['accounts']) - len(changed) - len(failed)}"
+                      + (f"，失败 {len(failed)}" if failed else "") + f" ({elapsed * 1000:.0f} ms)")
+            for account in failed:
+                print(f"   ❌ {account['pin']}: {account['error']}")
+                sink.emit("ERROR", "cli ingest", pin=account["pin"], panel=result["name"], operation="ingest",
+                          ok=False, error=account["error"])
+        sink.emit("INFO", "cli ingest", operation="ingest", ok=True, accounts=len(batch),
+                  duration_ms=round(elapsed * 1000, 1))
+
+    def on_error(batch, e):
+        print(f"❌ {len(batch)} 个账号同步失败: {e}")
+
+    def on_submit(pins, client):
+        print(f"📨 {client} 提交 {len(pins)} 个: {', '.join(pins[:5])}{' …' if len(pins) > 5 else ''}")
+
+    window = args.window if args.window is not None else config.get("ingest_window", 2.0)
+    batcher = CookieBatcher(make_forwarder(lambda: _load_config(args), store=_get_account_store(), on_batch=report),
+                            window=window, max_batch=args.max_batch, on_error=on_error)
+    server = IngestServer(int(port), batcher, host=args.host, token=args.token or config.get("ingest_token"),
+                          on_submit=None if args.quiet else on_submit).start()
+    print(f"📥 Cookie 接收端点: http://{args.host}:{server.port}/cookies（批处理窗口 {window} 秒，Ctrl+C 退出）",
+          file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    print("⏳ 正在发出队列中剩余的 Cookie...", file=sys.stderr)
+    server.stop()
+    stats = batcher.snapshot()
+    print(f"📥 共接收 {stats['received']} 次提交（合并 {stats['coalesced']} 次），{stats['batches']} 批同步 "
+          f"{stats['forwarded']} 个账号，失败 {stats['errors']} 批", file=sys.stderr)
+    return 0
+
+
+def cmd_cleanup(args):
+    from cleanup import cleanup
+
+    if args.remark_days is None and args.updated_days is None and not args.invalid:
+        print("❌ 请至少指定一个条件：--remark-days、--updated-days 或 --invalid", file=sys.stderr)
+        return 2
+    health = None
+    if args.invalid:
+        from cookie_health import HealthStore
+        health = HealthStore().all()
+        if not health:
+            print("⚠️ 没有 Cookie 检查结果，请先运行 health 命令", file=sys.stderr)
+    panels = _select_panels(args)
+    verb = "禁用" if args.action == "disable" else "删除"
+
+    def report(result):
+        if not result["ok"]:
+            print(f"❌ [{result['name']}] {result['error']}")
+            return
+        stale = result["stale"]
+        prefix = "将" if args.dry_run else "已"
+        print(f"🧹 [{result['name']}] {prefix}{verb} {len(stale)} 个过期的 JD_COOKIE ({result['elapsed'] * 1000:.0f} ms)")
+        for env, reasons in stale:
+            print(f"   {env['pin']:<24} ID: {str(env.get('id')):<8} {'，'.join(reasons)}")
+
+    results = cleanup(panels, action=args.action, dry_run=args.dry_run, on_result=report,
+                      remark_days=args.remark_days, updated_days=args.updated_days, health=health)
+    removed = [env["pin"] for r in results if r["ok"] for env, _ in r["stale"]]
+    if args.dry_run:
+        print(f"🧹 共 {len(removed)} 个（未做任何修改）")
+    else:
+        _get_log_sink().emit("INFO", "cli cleanup", operation=f"cleanup.{args.action}",
+                             ok=all(r["ok"] for r in results), count=len(removed))
+        if args.forget and args.action == "delete":
+            store = _get_account_store()
+            forgotten = sum(1 for pin in set(removed) if store.delete_account(pin))
+            print(f"🗑️ 已从账号存储中删除 {forgotten} 个账号")
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+def cmd_list(args):
+    panels = _select_panels(args)
+
+    results = run_on_panels(panels, lambda ql: {"envs": ql.cookie_envs(force=args.refresh)})
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        for result in results:
+            if not result["ok"]:
+                print(f"❌ [{result['name']}] {result['error']}")
+                continue
+            print(f"📋 [{result['name']}] 共 {len(result['envs'])} 个 JD_COOKIE")
+            for env in result["envs"]:
+                status = "启用" if env.get("status") == 0 else "禁用"
+                print(f"   {env['pin']:<24} ID: {str(env.get('id')):<8} {status}  {env.get('updatedAt') or ''}")
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+def cmd_accounts(args):
+    store = _get_account_store()
+    if args.delete:
+        for pin in args.delete:
+            print(f"🗑️ {pin}: {'已删除' if store.delete_account(pin) else '不存在'}")
+        return 0
+
+    panel_names = {TokenCache.make_key(p["url"], p["client_id"]): p["name"] for p in store.panels()}
+    accounts = store.accounts()
+    syncs = store.all_syncs()
+    for account in accounts:
+        account["syncs"] = syncs.get(account["pin"], {})
+    if args.json:
+        print(json.dumps(accounts, ensure_ascii=False, indent=2))
+        return 0
+    print(f"👥 共 {len(accounts)} 个账号（{store.path}）")
+    now = time.time()
+    for account in accounts:
+        age_hours = (now - account["harvested_at"]) / 3600
+        print(f"   {account['pin']:<24} 获取于 {age_hours:.1f} 小时前")
+        for panel_key, sync in account["syncs"].items():
+            stamp = time.strftime('%m-%d %H:%M', time.localtime(sync["synced_at"]))
+            result = f"{sync['operation']} (ID: {sync['env_id']})" if sync["ok"] else f"失败: {sync['error']}"
+            print(f"      [{panel_names.get(panel_key, panel_key)}] {stamp} {result}")
+    return 0
+
+
+def cmd_rebalance(args):
+    panels = _all_panels(args)
+    if len(panels) < 2:
+        print("❌ 至少需要配置两个面板才能分片", file=sys.stderr)
+        return 2
+    ring = HashRing(panels)
+
+    def report(target, source, moved, failed, elapsed):
+        print(f"   [{source}] → [{target}] 迁移 {moved} 个" + (f"，失败 {failed} 个" if failed else "")
+              + f" ({elapsed * 1000:.0f} ms)")
+
+    if not args.dry_run:
+        print("🧭 开始迁移...")
+    summary = rebalance(panels, batch_size=args.batch_size, dry_run=args.dry_run, on_batch=report)
+    for error in summary["errors"]:
+        print(f"❌ {error}")
+
+    counts = collections.Counter((m["source"], m["target"]) for m in summary["moves"])
+    if args.dry_run:
+        print(f"🧭 共有 {len(summary['moves'])} 个环境变量不在归属面板上（未做任何修改）")
+        for (source, target), count in sorted(counts.items()):
+            print(f"   [{ring.panels[source]['name']}] → [{ring.panels[target]['name']}] {count} 个")
+        weights = sum(float(p.get("weight") or 1) for p in panels)
+        for panel in panels:
+            print(f"   [{panel['name']}] 权重 {panel.get('weight') or 1}，目标占比 "
+                  f"{float(panel.get('weight') or 1) / weights * 100:.0f}%")
+        return 1 if summary["errors"] else 0
+    print(f"🧭 迁移完成: 成功 {summary['moved']} 个，失败 {summary['failed']} 个")
+    return 0 if not summary["errors"] and not summary["failed"] else 1
+
+
+def cmd_status(args):
+    panels = _select_panels(args)
+    token_cache = _get_token_cache()
+    env_index = _get_env_index()
+    print(f"📁 配置文件: {args.config or _get_config_path()}")
+    print(f"🐉 面板数量: {len(panels)}")
+
+    checks = {}
+    if args.check:
+        for result in run_on_panels(panels, lambda ql: {"found": len(ql.list_envs("___check___"))}):
+            checks[result["name"]] = result
+
+    for panel in panels:
+        print(f"\n[{panel['name']}] {panel['url']}")
+        entry = token_cache.get(panel["url"], panel["client_id"])
+        if entry:
+            print(f"   令牌: 已缓存，有效至 {time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['expires_at']))}")
+        else:
+            print("   令牌: 未缓存或已过期")
+        summary = env_index.summary(TokenCache.make_key(panel["url"], panel["client_id"]))
+        if summary["synced_at"]:
+            age = time.time() - summary["synced_at"]
+            print(f"   索引: {summary['count']} 个 JD_COOKIE，{age:.0f} 秒前同步")
+        else:
+            print(f"   索引: {summary['count']} 个 JD_COOKIE，尚未与面板同步")
+        if panel["name"] in checks:
+            check = checks[panel["name"]]
+            if check["ok"]:
+                print(f"   连接: ✅ 正常 ({check['elapsed'] * 1000:.0f} ms)")
+            else:
+                print(f"   连接: ❌ {check['error']}")
+
+    if args.check:
+        stats = HTTP_STATS.snapshot()
+        print(f"\n📈 HTTP 统计: 请求 {stats['requests']} 次，新建连接 {stats['connections']} 个，"
+              f"平均 {stats['avg_ms']} ms")
+        return 0 if all(c["ok"] for c in checks.values()) else 1
+    return 0
+
+
+def cmd_health(args):
+    from cookie_health import make_health_checker
+
+    config = load_config(args.config)
+    if args.url:
+        config["health_check_url"] = args.url
+    if args.rate:
+        config["health_check_rate"] = args.rate
+    if args.workers:
+        config["health_check_workers"] = args.workers
+    checker = make_health_checker(config)
+
+    if args.show:
+        for pin, entry in sorted(checker.store.all().items()):
+            last_valid = entry.get("last_valid_at")
+            last_valid = time.strftime('%Y-%m-%d %H:%M', time.localtime(last_valid)) if last_valid else "从未"
+            state = {True: "✅ 有效", False: "❌ 失效"}.get(entry.get("valid"), "❔ 未知")
+            print(f"{pin:<24} {state}  最近有效: {last_valid}  {entry.get('error') or ''}")
+        return 0
+
+    panels = _select_panels(args)
+    while True:
+        start = time.monotonic()
+        cookies = {}
+        for result in run_on_panels(panels, lambda ql: {"cookies": [env["value"] for env in ql.cookie_envs()]}):
+            if not result["ok"]:
+                print(f"❌ [{result['name']}] {result['error']}", file=sys.stderr)
+                continue
+            for cookie in result["cookies"]:
+                cookies[_extract_pin(cookie)] = cookie
+
+        results = checker.check_all(cookies.values())
+        invalid = sorted(pin for pin, r in results.items() if r["valid"] is False)
+        unknown = sorted(pin for pin, r in results.items() if r["valid"] is None)
+        elapsed = time.monotonic() - start
+        print(f"🩺 {time.strftime('%H:%M:%S')} 检查 {len(results)} 个账号，耗时 {elapsed:.1f} 秒："
+              f"有效 {len(results) - len(invalid) - len(unknown)}，失效 {len(invalid)}，未知 {len(unknown)}")
+        for pin in invalid:
+            print(f"   ❌ {pin}")
+        for pin in unknown:
+            print(f"   ❔ {pin}: {results[pin]['error']}")
+        _get_log_sink().emit("WARN" if invalid else "INFO", "cli health", operation="health",
+                             ok=not invalid, duration_ms=round(elapsed * 1000, 1),
+                             checked=len(results), invalid=len(invalid), unknown=len(unknown))
+        if not args.interval:
+            return 1 if invalid else 0
+        time.sleep(max(0.0, args.interval * 60 - elapsed))
+
+
+def cmd_logs(args):
+    since = time.time() - args.hours * 3600 if args.hours else None
+    # 阶段耗时记录在单独的 phases.jsonl 中
+    phases = args.phases or (args.operation or "").startswith(LOG_PREFIX)
+    records = read_logs(log_path(PHASE_LOG) if phases else None, level=args.level, pin=args.pin_filter,
+                        panel=args.panel_filter, operation=args.operation, since=since)
+    if args.summary:
+        summary = summarize_logs(records)
+        if args.json:
+            print(json.dumps(summary, ensure_ascii=False, indent=2))
+            return 0
+        for name, item in summary.items():
+            print(f"{name:<24} 次数 {item['count']:<6} 失败 {item['failures']:<5} ({item['failure_rate'] * 100:.1f}%)  "
+                  f"平均 {item['avg_ms']} ms  P50 {item['p50_ms']} ms  P95 {item['p95_ms']} ms")
+        return 0
+
+    # 只保留最后 limit 条
+    for record in collections.deque(records, maxlen=args.limit):
+        if args.json:
+            print(json.dumps(record, ensure_ascii=False))
+        else:
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record.get("ts", 0)))
+            extra = " ".join(f"{key}={value}" for key, value in record.items()
+                             if key not in ("ts", "level", "message"))
+            print(f"{stamp} {record.get('level', ''):<7} {record.get('message', '')}  {extra}")
+    return 0
+
+
+def cmd_metrics(args):
+    def render():
+        # 每次都从日志重建，包含图形界面和其他命令行进程记录的阶段耗时
+        since = time.time() - args.hours * 3600 if args.hours else None
+        records = (r for r in read_logs(log_path(PHASE_LOG), since=since)
+                   if (r.get("operation") or "").startswith(LOG_PREFIX))
+        return render_prometheus(metrics_from_logs(records))
+
+    if not args.serve:
+        sys.stdout.write(render())
+        return 0
+    server = MetricsServer(args.serve, render, host=args.host)
+    print(f"📈 指标端点: http://{args.host}:{server.port}/metrics（Ctrl+C 退出）", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="jd_cookie_cli.py", description="青龙京东助手命令行工具")
+    parser.add_argument("--config", help="配置文件路径（默认使用应用配置目录下的 config.json）")
+    parser.add_argument("--panel", action="append", help="只操作指定名称或地址的面板，可重复")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sync_parser = subparsers.add_parser("sync", help="把 Cookie 同步到青龙面板")
+    sync_parser.add_argument("--cookie", action="append", help="pt_key=...;pt_pin=...; 格式的 Cookie，可重复")
+    sync_parser.add_argument("--file", action="append", help="每行一个 Cookie 的文件，- 表示标准输入")
+    sync_parser.add_argument("--stored", action="store_true", help="同步账号存储中的全部账号")
+    sync_parser.add_argument("--force", action="store_true", help="即使 pt_key 未变化也照常更新并启用")
+    sync_parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    sync_parser.set_defaults(func=cmd_sync)
+
+    import_parser = subparsers.add_parser("import", help="从 CSV / JSONL / 纯文本文件流式批量导入 Cookie")
+    import_parser.add_argument("files", nargs="+", metavar="FILE", help="要导入的文件，- 表示标准输入")
+    import_parser.add_argument("--format", choices=FORMATS,
+                               help="文件格式（默认按扩展名判断：.csv、.jsonl/.json，其他按每行一个 Cookie）")
+    import_parser.add_argument("--batch-size", type=int, default=100, help="每批同步的账号数（默认 100）")
+    import_parser.add_argument("--max-pending", type=int, default=2, help="最多预读多少批（默认 2）")
+    import_parser.add_argument("--force", action="store_true", help="即使 pt_key 未变化也照常更新并启用")
+    import_parser.add_argument("--dry-run", action="store_true", help="只校验文件，不发送")
+    import_parser.add_argument("--quiet", action="store_true", help="不逐行显示跳过和失败的账号")
+    import_parser.set_defaults(func=cmd_import)
+
+    export_parser = subparsers.add_parser("export", help="把面板上的 JD_COOKIE 导出为 CSV / JSONL / 纯文本")
+    export_parser.add_argument("-o", "--output", help="输出文件（默认标准输出）")
+    export_parser.add_argument("--format", choices=FORMATS, help="输出格式（默认按扩展名判断，标准输出为 jsonl）")
+    export_parser.add_argument("--enabled-only", action="store_true", help="只导出已启用的变量")
+    export_parser.add_argument("--refresh", action="store_true", help="忽略本地索引，强制从面板刷新")
+    export_parser.set_defaults(func=cmd_export)
+
+    ingest_parser = subparsers.add_parser("ingest", help="在本地端口接收 HTTP 提交的 Cookie，合并后按批同步")
+    ingest_parser.add_argument("--port", type=int, help="监听端口（默认使用 config.json 的 ingest_port）")
+    ingest_parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认 127.0.0.1）")
+    ingest_parser.add_argument("--window", type=float, help="批处理窗口秒数（默认 ingest_window 或 2 秒）")
+    ingest_parser.add_argument("--max-batch", type=int, default=200, help="每批最多账号数，攒满立即发送（默认 200）")
+    ingest_parser.add_argument("--token", help="要求请求带 Authorization: Bearer <token>（默认 ingest_token）")
+    ingest_parser.add_argument("--quiet", action="store_true", help="不逐条显示收到的提交")
+    ingest_parser.set_defaults(func=cmd_ingest)
+
+    cleanup_parser = subparsers.add_parser("cleanup", help="批量禁用或删除过期的 JD_COOKIE")
+    cleanup_parser.add_argument("--remark-days", type=float, help="备注中的写入时间早于该天数")
+    cleanup_parser.add_argument("--updated-days", type=float, help="面板的 updatedAt 早于该天数")
+    cleanup_parser.add_argument("--invalid", action="store_true", help="上次 Cookie 检查（health）判定为失效")
+    cleanup_parser.add_argument("--action", choices=("disable", "delete"), default="disable",
+                                help="禁用（默认）或删除")
+    cleanup_parser.add_argument("--forget", action="store_true", help="删除时同时从账号存储中删除这些账号")
+    cleanup_parser.add_argument("--dry-run", action="store_true", help="只列出会被清理的条目，不做修改")
+    cleanup_parser.set_defaults(func=cmd_cleanup)
+
+    harvest_parser = subparsers.add_parser("harvest", help="用已保存的浏览器资料免登录重新获取 Cookie")
+    harvest_parser.add_argument("--pin", action="append", help="只获取指定账号，可重复（默认全部已保存账号）")
+    harvest_parser.add_argument("--max-sessions", type=int, help="同时打开的浏览器数量上限")
+    harvest_parser.add_argument("--headless", action="store_true", help="不显示浏览器窗口")
+    harvest_parser.add_argument("--sync", action="store_true", help="获取后同步到青龙面板")
+    harvest_parser.set_defaults(func=cmd_harvest)
+
+    list_parser = subparsers.add_parser("list", help="列出面板上的 JD_COOKIE")
+    list_parser.add_argument("--refresh", action="store_true", help="忽略本地索引，强制从面板刷新")
+    list_parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    list_parser.set_defaults(func=cmd_list)
+
+    health_parser = subparsers.add_parser("health", help="并发检查面板上的 Cookie 是否有效")
+    health_parser.add_argument("--interval", type=float, help="每隔多少分钟重复检查（默认只检查一次）")
+    health_parser.add_argument("--url", help="校验接口地址（默认使用 config.json 的 health_check_url 或京东用户信息接口）")
+    health_parser.add_argument("--rate", type=float, help="每秒最多请求数")
+    health_parser.add_argument("--workers", type=int, help="并发数")
+    health_parser.add_argument("--show", action="store_true", help="只显示上次的检查结果")
+    health_parser.set_defaults(func=cmd_health)
+
+    logs_parser = subparsers.add_parser("logs", help="查看或汇总结构化日志")
+    logs_parser.add_argument("--level", help="只看该级别（INFO/WARN/ERROR/SUCCESS/DEBUG）")
+    logs_parser.add_argument("--pin", dest="pin_filter", help="只看该账号")
+    logs_parser.add_argument("--panel", dest="panel_filter", help="只看该面板")
+    logs_parser.add_argument("--operation", help="只看该操作（如 sync、send、GET /open/envs）")
+    logs_parser.add_argument("--hours", type=float, help="只看最近若干小时")
+    logs_parser.add_argument("--limit", type=int, default=50, help="最多显示最后多少条（默认 50）")
+    logs_parser.add_argument("--summary", action="store_true", help="按操作汇总次数、失败率和耗时分位数")
+    logs_parser.add_argument("--phases", action="store_true", help="查看阶段耗时记录（phases.jsonl）而不是应用日志")
+    logs_parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    logs_parser.set_defaults(func=cmd_logs)
+
+    rebalance_parser = subparsers.add_parser("rebalance", help="按一致性哈希把账号迁移到归属面板")
+    rebalance_parser.add_argument("--dry-run", action="store_true", help="只显示迁移计划，不做修改")
+    rebalance_parser.add_argument("--batch-size", type=int, default=50, help="每批迁移的账号数（默认 50）")
+    rebalance_parser.set_defaults(func=cmd_rebalance)
+
+    accounts_parser = subparsers.add_parser("accounts", help="列出账号存储中的账号和各面板的上次同步结果")
+    accounts_parser.add_argument("--delete", action="append", metavar="PIN", help="从账号存储中删除该账号，可重复")
+    accounts_parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    accounts_parser.set_defaults(func=cmd_accounts)
+
+    metrics_parser = subparsers.add_parser("metrics", help="以 Prometheus 文本格式导出各阶段耗时")
+    metrics_parser.add_argument("--hours", type=float, help="只统计最近若干小时（默认统计保留的全部日志）")
+    metrics_parser.add_argument("--serve", type=int, metavar="PORT", help="在本地端口持续提供 /metrics 供 Prometheus 抓取")
+    metrics_parser.add_argument("--host", default="127.0.0.1", help="--serve 的监听地址（默认 127.0.0.1）")
+    metrics_parser.set_defaults(func=cmd_metrics)
+
+    status_parser = subparsers.add_parser("status", help="查看配置、令牌缓存和索引状态")
+    status_parser.add_argument("--check", action="store_true", help="同时测试各面板的连接")
+    status_parser.set_defaults(func=cmd_status)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
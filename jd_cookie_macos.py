@@ -1,127 +1,66 @@
+import sys
+
+from startup_profile import StartupProfiler
+
+# 以 --profile-startup 启动时，在导入其余模块之前开始计时
+PROFILER = StartupProfiler(enabled="--profile-startup" in sys.argv)
+PROFILER.install_import_hook()
+
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
+import base64
 import json
 import os
-import threading
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from webdriver_manager.chrome import ChromeDriverManager
-import requests
+import queue
 import time
 
-# --- 新增和修改的部分 ---
-
-def _get_config_path():
-    """获取跨平台的用户特定应用配置路径"""
-    # macOS: ~/Library/Application Support/AppName/config.json
-    # Windows: %APPDATA%/AppName/config.json
-    # Linux: ~/.config/AppName/config.json
-    
-    app_name = "QinglongJDCookieHelper" # 为应用创建一个文件夹
-    
-    if os.name == 'darwin': # macOS
-        path = os.path.join(os.path.expanduser('~'), 'Library', 'Application Support', app_name)
-    elif os.name == 'nt': # Windows
-        path = os.path.join(os.getenv('APPDATA'), app_name)
-    else: # Linux and other OS
-        path = os.path.join(os.path.expanduser('~'), '.config', app_name)
-        
-    # 确保目录存在
-    os.makedirs(path, exist_ok=True)
-    
-    return os.path.join(path, "config.json")
-
-# --------------------------
-
-
-class QLHelper:
-    """
-    与青龙面板 API 交互的类
-    复刻自原始 C# 代码中的 QLHelp.cs
-    """
-    def __init__(self, url, client_id, client_secret):
-        self.url = url.strip('/')
-        self.client_id = client_id
-        self.client_secret = client_secret
-        self.token = ""
-        self.id_name = "id"  # 默认 id 字段名
-
-    def login(self):
-        try:
-            full_url = f"{self.url}/open/auth/token?client_id={self.client_id}&client_secret={self.client_secret}"
-            response = requests.get(full_url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            if data.get("code") == 200:
-                self.token = f"{data['data']['token_type']} {data['data']['token']}"
-                # 检查环境变量接口以确定 id 字段是 'id' 还是 '_id'
-                self.check_id_field()
-                return "青龙登录成功"
-            else:
-                raise Exception(data.get("message", "未知错误"))
-        except Exception as e:
-            raise Exception(f"青龙登录失败: {e}")
-
-    def check_id_field(self):
-        """探测环境变量接口以确定主键字段名"""
-        try:
-            headers = {'Authorization': self.token}
-            # 使用一个几乎不可能存在的searchValue来获取一个空列表，只看结构
-            response = requests.get(f"{self.url}/open/envs?searchValue=___check___", headers=headers, timeout=10)
-            data = response.json()
-            if data.get('code') == 200 and data.get('data'):
-                if '_id' in data['data'][0]:
-                    self.id_name = '_id'
-                elif 'id' in data['data'][0]:
-                    self.id_name = 'id'
-        except Exception:
-            # 探测失败则使用默认值 'id'
-            pass
+from qinglong import (_get_config_path, load_config, HTTP_STATS, _get_panels, push_cookie_to_panels, run_on_panels,
+                      TokenCache)
+from account_store import _get_account_store
+from account_table import AccountTable
+from placement import make_ring
+from jobs import JobExecutor
+from log_sink import _get_log_sink
+from metrics import PHASES, PHASE_METRICS, MetricsServer, render_prometheus
+from jd_browser import _get_driver_resolver, BrowserPool, JD_LOGIN_URL, LoginWatcher, QRLogin, read_jd_cookie
 
-
-    def get_envs(self, search_value):
-        headers = {'Authorization': self.token}
-        response = requests.get(f"{self.url}/open/envs?searchValue={search_value}", headers=headers, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        if data.get("code") == 200 and data.get("data"):
-            return data["data"][0].get(self.id_name)
-        return None
-
-    def add_envs(self, name, value, remarks):
-        headers = {'Authorization': self.token, 'Content-Type': 'application/json'}
-        payload = [{'name': name, 'value': value, 'remarks': remarks}]
-        response = requests.post(f"{self.url}/open/envs", headers=headers, json=payload, timeout=10)
-        response.raise_for_status()
-        return response.json()
-
-    def update_envs(self, env_id, name, value, remarks):
-        headers = {'Authorization': self.token, 'Content-Type': 'application/json'}
-        payload = {'name': name, 'value': value, 'remarks': remarks, self.id_name: env_id}
-        response = requests.put(f"{self.url}/open/envs", headers=headers, json=payload, timeout=10)
-        response.raise_for_status()
-        return response.json()
-
-    def enable_envs(self, env_id):
-        headers = {'Authorization': self.token, 'Content-Type': 'application/json'}
-        payload = [env_id]
-        response = requests.put(f"{self.url}/open/envs/enable", headers=headers, json=payload, timeout=10)
-        response.raise_for_status()
-        return response.json()
+PROFILER.mark("导入模块")
 
 
 class App(tk.Tk):
+    # 日志区最多保留的行数，超出后删除最早的行
+    LOG_MAX_LINES = 1000
+    # 日志队列的刷新间隔（毫秒）
+    LOG_FLUSH_MS = 100
+    # 各状态指示器下方显示耗时的阶段
+    INDICATOR_PHASES = {
+        0: ("token_fetch", "env_lookup", "env_update", "env_enable", "env_add", "send"),
+        1: ("driver_resolve", "chrome_launch", "page_load"),
+        2: ("cookie_read",)
+    }
+
     def __init__(self):
         super().__init__()
+        PROFILER.mark("创建 Tk 根窗口")
         self.title("🚀 青龙京东助手 v2.0 - macOS")
         self.geometry("850x900")
         self.resizable(True, True)  # 允许调整窗口大小
         self.driver = None
+        # 浏览器会话池：每个账号一个持久化的 Chrome 资料目录
+        self.browser_pool = None
+        self.browser_session = None
+        # 自动获取模式：检测到登录后自动获取Cookie并发送
+        self.login_watcher = None
+        self.auto_capture_var = tk.BooleanVar(value=True)
+        # 扫码登录模式：在无头浏览器中打开登录页，二维码显示在本程序的窗口中
+        self.qr_login = None
+        self.qr_window = None
+        self.qr_login_var = tk.BooleanVar(value=False)
         
         # 设置窗口图标和样式
         try:
             # 设置窗口居中显示
-            self.center_window()
+            self.center_window(850, 900)
         except:
             pass
         
@@ -130,10 +69,35 @@ class App(tk.Tk):
         
         # --- 修改的部分 ---
         self.config_file_path = _get_config_path()
+        # 配置文件中除主面板外的其他面板（只能通过 config.json 的 panels 列表配置）
+        self.extra_panels = []
+        # Cookie 定期检查相关配置（health_check_* 配置项）
+        self.health_config = {}
+        # 账号分片相关配置（sharding、ql_weight）
+        self.shard_config = {}
         # 初始化状态变量
         self.connection_status = "未连接"
         self.login_status = "未登录"
         self.cookie_status = "未获取"
+        # 状态指示器和日志区在首帧之后才创建，之前的状态更新先暂存
+        self.log_area = None
+        self._indicator_states = {}
+        # 各线程的日志先进入队列，由主线程定时批量写入日志区
+        self._log_queue = queue.Queue()
+        self._log_lines = 0
+        # 后台线程对控件的更新和弹窗同样先进入队列，由主线程执行（Tk 不是线程安全的）
+        self._ui_queue = queue.Queue()
+        # 后台任务：有界线程池，同一账号/面板的发送和浏览器启动同时只运行一个
+        self.jobs = JobExecutor(max_workers=4, listener=self._on_job_changed)
+        self._jobs_dirty = False
+        # 阶段耗时统计的版本号，变化时刷新指示器下方的耗时
+        self._metrics_version = -1
+        # 本地 Prometheus 抓取端点（config.json 的 metrics_port）
+        self.metrics_server = None
+        # 本地 Cookie 接收端点（config.json 的 ingest_port）
+        self.ingest_server = None
+        # 账号列表（在系统监控区中，首帧之后创建）
+        self.account_table = None
         # -----------------
 
         # 创建主框架 - 暗色专业风格
@@ -159,8 +123,9 @@ class App(tk.Tk):
         status_frame = tk.Frame(main_frame, bg='#2d2d2d', relief='flat', bd=1, highlightbackground='#404040')
         status_frame.pack(fill=tk.X, pady=(0, 20))
         
-        # 创建状态指示器
-        self.create_status_indicators(status_frame)
+        # 状态指示器在首帧之后创建
+        self.status_frame = status_frame
+        PROFILER.mark("创建标题区域")
 
         # 青龙配置部分 - 暗色卡片样式
         config_card = tk.Frame(main_frame, bg='#2d2d2d', relief='flat', bd=1, highlightbackground='#404040')
@@ -215,6 +180,8 @@ class App(tk.Tk):
         self.ql_client_secret.insert(0, "Client Secret")
         self.ql_client_secret.bind('<FocusIn>', lambda e: self.clear_placeholder(e, "Client Secret"))
 
+        PROFILER.mark("创建配置表单")
+
         # 操作部分 - 暗色按钮卡片
         action_card = tk.Frame(main_frame, bg='#2d2d2d', relief='flat', bd=1, highlightbackground='#404040')
         action_card.pack(fill=tk.X, pady=(0, 15))
@@ -269,10 +236,76 @@ class App(tk.Tk):
                                           **button_style)
         self.send_to_ql_button.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(5, 0), ipady=10)
 
-        # 系统监控部分 - 暗色卡片
-        monitor_card = tk.Frame(main_frame, bg='#2d2d2d', relief='flat', bd=1, highlightbackground='#404040')
-        monitor_card.pack(fill=tk.BOTH, expand=True)
+        # 自动获取开关
+        self.auto_capture_check = tk.Checkbutton(action_content, text="登录后自动获取并发送",
+                                                 variable=self.auto_capture_var,
+                                                 command=self.toggle_auto_capture,
+                                                 font=('SF Pro Display', 10),
+                                                 fg='#aaa', bg='#2d2d2d',
+                                                 activebackground='#2d2d2d', activeforeground='#e0e0e0',
+                                                 selectcolor='#3a3a3a', bd=0, highlightthickness=0)
+        self.auto_capture_check.pack(anchor='w', padx=15, pady=(0, 2))
+
+        # 扫码登录开关
+        self.qr_login_check = tk.Checkbutton(action_content, text="扫码登录（不显示浏览器窗口）",
+                                             variable=self.qr_login_var,
+                                             command=self.toggle_qr_login,
+                                             font=('SF Pro Display', 10),
+                                             fg='#aaa', bg='#2d2d2d',
+                                             activebackground='#2d2d2d', activeforeground='#e0e0e0',
+                                             selectcolor='#3a3a3a', bd=0, highlightthickness=0)
+        self.qr_login_check.pack(anchor='w', padx=15, pady=(0, 12))
+
+        PROFILER.mark("创建操作按钮")
+
+        # 系统监控部分 - 暗色卡片（内容在首帧之后创建）
+        self.monitor_card = tk.Frame(main_frame, bg='#2d2d2d', relief='flat', bd=1, highlightbackground='#404040')
+        self.monitor_card.pack(fill=tk.BOTH, expand=True)
+        
+        # 当前账号；Cookie 保存在账号存储（accounts.db）中
+        self.current_pin = None
+
+        self.load_config()
+        if self.browser_pool is None:
+            self.browser_pool = BrowserPool()
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        PROFILER.mark("加载配置")
+        
+        # 窗口首次映射后再创建其余组件，让窗口尽快显示
+        self._first_map_id = self.bind('<Map>', self._on_first_map)
+
+    def _on_first_map(self, event):
+        """窗口首次显示后，在空闲时创建延迟组件"""
+        if event.widget is not self:
+            return
+        self.unbind('<Map>', self._first_map_id)
+        PROFILER.mark("首帧显示")
+        self.after_idle(self.create_deferred_widgets)
+        # 后台预先解析 ChromeDriver，点击登录时即可直接启动浏览器
+        _get_driver_resolver().prewarm()
+
+    def create_deferred_widgets(self):
+        """创建状态指示器和系统监控区，回放此前暂存的状态并开始刷新日志"""
+        self.create_status_indicators(self.status_frame)
+        for indicator_id, (status, color) in self._indicator_states.items():
+            self.update_status_indicator(indicator_id, status, color)
+        PROFILER.mark("创建状态指示器")
+        
+        self.create_monitor_panel(self.monitor_card)
+        self.load_account_table()
+        self.flush_logs()
+        PROFILER.mark("创建系统监控区")
         
+        self.schedule_health_check()
+        
+        if PROFILER.enabled:
+            for line in PROFILER.report():
+                print(line, file=sys.stderr)
+            self.log(f"⏱️ 启动耗时: 首帧 {dict(PROFILER.marks)['首帧显示'] * 1000:.0f} ms，"
+                     f"全部组件 {PROFILER.marks[-1][1] * 1000:.0f} ms（详见终端输出）", "INFO")
+
+    def create_monitor_panel(self, monitor_card):
+        """创建系统监控区：状态栏和日志窗口"""
         # 监控卡片左边框装饰
         monitor_left_border = tk.Frame(monitor_card, bg='#4facfe', width=4)
         monitor_left_border.pack(side=tk.LEFT, fill=tk.Y)
@@ -305,6 +338,12 @@ class App(tk.Tk):
                                     fg='#dc3545', bg='#2d2d2d')
         connect_indicator.pack(side=tk.LEFT, padx=(5, 20))
         
+        # 后台任务状态
+        self.job_label = tk.Label(status_info, text="任务: 空闲", 
+                                 font=('SF Pro Display', 10), 
+                                 fg='#666', bg='#2d2d2d')
+        self.job_label.pack(side=tk.LEFT, padx=(0, 20))
+        
         # 用户状态
         user_status_label = tk.Label(status_info, text="用户:", 
                                     font=('SF Pro Display', 10), 
@@ -316,6 +355,11 @@ class App(tk.Tk):
                                  fg='#ffc107', bg='#2d2d2d')
         self.pin_label.pack(side=tk.LEFT, padx=(5, 0))
         
+        # 账号列表：只渲染可见行，数据在后台加载并增量更新
+        self.account_table = AccountTable(monitor_content, rows=8, on_select=self.select_account,
+                                          on_activate=self.reopen_account)
+        self.account_table.pack(fill=tk.X, padx=15, pady=(0, 10))
+        
         # 日志内容区域
         log_content_frame = tk.Frame(monitor_content, bg='#2d2d2d')
         log_content_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=(0, 15))
@@ -328,19 +372,40 @@ class App(tk.Tk):
                                                  highlightthickness=0,
                                                  insertbackground='#00ff00')
         self.log_area.pack(fill=tk.BOTH, expand=True)
-        
-        # Cookie 文本框（隐藏但保留功能）
-        self.cookie_text = tk.Text(self, height=1, width=1)
-        self.cookie_text.pack_forget()  # 隐藏但保留引用
+        for level, color in self.LOG_COLORS.items():
+            self.log_area.tag_configure(level, foreground=color)
 
-        self.load_config()
-        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+    def panel_names(self):
+        """当前配置中的面板：面板键 → 名称"""
+        return {TokenCache.make_key(p["url"], p["client_id"]): p["name"] for p in _get_panels(self.current_config())}
+
+    def load_account_table(self):
+        """在后台读取账号存储和上次Cookie检查结果，填充账号列表"""
+        from cookie_health import HealthStore
+
+        self.account_table.set_panels(self.panel_names())
+
+        def run(job):
+            store = _get_account_store()
+            self.account_table.load(store.accounts(), store.all_syncs(), HealthStore().all())
 
-    def center_window(self):
-        """将窗口居中显示"""
-        self.update_idletasks()
-        width = self.winfo_width()
-        height = self.winfo_height()
+        self.submit_job("accounts", run, "加载账号列表", "⏳ 账号列表正在加载中")
+
+    def select_account(self, pin):
+        """在账号列表中选中账号：设为当前账号，之后点击发送即发送该账号的Cookie"""
+        if pin == self.current_pin:
+            return
+        if not _get_account_store().get_account(pin):
+            self.log(f"账号 {pin} 没有保存的Cookie（仅在面板上存在），无法直接发送", "WARN")
+            return
+        self.current_pin = pin
+        self.pin_label.config(text=pin, fg='#28a745')
+        self.update_status_indicator(2, "已获取", "#28a745")
+        self.cookie_status = "已获取"
+        self.log(f"👤 已切换到账号 {pin}", "INFO")
+
+    def center_window(self, width, height):
+        """将窗口居中显示（直接使用目标尺寸，避免首帧前强制布局）"""
         pos_x = (self.winfo_screenwidth() // 2) - (width // 2)
         pos_y = (self.winfo_screenheight() // 2) - (height // 2)
         self.geometry(f'{width}x{height}+{pos_x}+{pos_y}')
@@ -399,12 +464,20 @@ class App(tk.Tk):
                                fg='#aaa', bg='#2d2d2d')
         status_label.pack()
         
+        # 阶段耗时（最近一次 / 滚动平均）
+        timing_label = tk.Label(indicator_frame, text="",
+                               font=('Monaco', 9),
+                               fg='#777', bg='#2d2d2d', justify=tk.LEFT)
+        timing_label.pack(pady=(4, 0))
+        
         # 存储引用以便更新
         setattr(self, f'status_circle_{column}', status_circle)
         setattr(self, f'status_label_{column}', status_label)
+        setattr(self, f'status_timing_{column}', timing_label)
     
     def update_status_indicator(self, indicator_id, status, color):
         """更新状态指示器"""
+        self._indicator_states[indicator_id] = (status, color)
         try:
             circle = getattr(self, f'status_circle_{indicator_id}')
             label = getattr(self, f'status_label_{indicator_id}')
@@ -413,36 +486,120 @@ class App(tk.Tk):
         except AttributeError:
             pass
 
-    def log(self, message, level="INFO"):
-        """现代化的日志显示方法"""
+    def refresh_phase_timings(self):
+        """在各状态指示器下方显示相关阶段的最近耗时和滚动平均耗时"""
+        self._metrics_version = PHASE_METRICS.version
+        for indicator_id, phases in self.INDICATOR_PHASES.items():
+            lines = []
+            for phase in phases:
+                last = PHASE_METRICS.last(phase)
+                if last is not None:
+                    lines.append(f"{PHASES[phase]} {last * 1000:.0f}ms · 均 {PHASE_METRICS.average(phase) * 1000:.0f}ms")
+            getattr(self, f'status_timing_{indicator_id}').config(text="\n".join(lines))
+
+    def _on_job_changed(self, job):
+        """任务状态变化（可能在工作线程中），由主线程在下次刷新日志时更新任务状态"""
+        self._jobs_dirty = True
+        if job.state == job.CANCELLED:
+            self.log(f"⏹️ 任务已取消: {job.name}", "WARN")
+        elif job.state == job.FAILED:
+            self.log(f"任务出错: {job.name}: {job.error}", "ERROR")
+
+    def refresh_job_status(self):
+        """显示运行中和排队中的任务"""
+        self._jobs_dirty = False
+        jobs = self.jobs.active()
+        if not jobs:
+            self.job_label.config(text="任务: 空闲", fg='#666')
+            return
+        running = [job.name for job in jobs if job.state == job.RUNNING]
+        queued = len(jobs) - len(running)
+        text = f"任务: 运行 {len(running)}" + (f" · 排队 {queued}" if queued else "")
+        if running:
+            text += f" ({', '.join(running[:2])}{' …' if len(running) > 2 else ''})"
+        self.job_label.config(text=text, fg='#ffc107')
+
+    def submit_job(self, key, fn, name, busy_message):
+        """提交后台任务；同一键的任务已在进行时只记录提示，返回任务是否为新提交"""
+        try:
+            _, created = self.jobs.submit(key, fn, name=name)
+        except RuntimeError:
+            return False
+        if not created:
+            self.log(busy_message, "WARN")
+        return created
+
+    # 根据日志级别设置颜色
+    LOG_COLORS = {
+        "INFO": "#00ff00",    # 绿色
+        "WARN": "#ffff00",    # 黄色  
+        "ERROR": "#ff4444",   # 红色
+        "SUCCESS": "#00ffff"  # 青色
+    }
+    
+    # 添加图标
+    LOG_ICONS = {
+        "INFO": "ℹ️",
+        "WARN": "⚠️", 
+        "ERROR": "❌",
+        "SUCCESS": "✅"
+    }
+
+    def log(self, message, level="INFO", **fields):
+        """
+        现代化的日志显示方法，可在任意线程调用，日志由主线程批量写入
+        同时写入结构化日志文件，fields 为附加字段（如 pin、panel、operation、duration_ms）
+        """
         timestamp = time.strftime('%H:%M:%S')
+        self._log_queue.put((timestamp, level, message))
+        _get_log_sink().emit(level, message, **fields)
+
+    def run_on_main(self, fn, *args):
+        """在主线程中执行 fn(*args)，可在任意线程调用；后台线程更新状态指示器、弹出对话框都要经过这里"""
+        self._ui_queue.put((fn, args))
+
+    def flush_logs(self):
+        """在主线程中把队列里的日志一次性写入日志区，并裁剪到最多 LOG_MAX_LINES 行"""
+        entries = []
+        try:
+            while True:
+                entries.append(self._log_queue.get_nowait())
+        except queue.Empty:
+            pass
         
-        # 根据日志级别设置颜色
-        colors = {
-            "INFO": "#00ff00",    # 绿色
-            "WARN": "#ffff00",    # 黄色  
-            "ERROR": "#ff4444",   # 红色
-            "SUCCESS": "#00ffff"  # 青色
-        }
-        
-        color = colors.get(level, "#00ff00")
-        
-        # 添加图标
-        icons = {
-            "INFO": "ℹ️",
-            "WARN": "⚠️", 
-            "ERROR": "❌",
-            "SUCCESS": "✅"
-        }
-        
-        icon = icons.get(level, "ℹ️")
-        
-        # 插入格式化的日志
-        self.log_area.insert(tk.END, f"{icon} [{timestamp}] {level}: {message}\n")
-        self.log_area.see(tk.END)
+        # 单批超过上限时，更早的行写入后也会被裁掉，直接跳过
+        entries = entries[-self.LOG_MAX_LINES:]
+        if entries:
+            args = []
+            for timestamp, level, message in entries:
+                icon = self.LOG_ICONS.get(level, "ℹ️")
+                tag = level if level in self.LOG_COLORS else "INFO"
+                line = f"{icon} [{timestamp}] {level}: {message}\n"
+                args.extend((line, tag))
+                self._log_lines += line.count("\n")
+            self.log_area.insert(tk.END, *args)
+            
+            excess = self._log_lines - self.LOG_MAX_LINES
+            if excess > 0:
+                self.log_area.delete('1.0', f'{excess + 1}.0')
+                self._log_lines -= excess
+            self.log_area.see(tk.END)
         
-        # 确保GUI更新
-        self.update_idletasks()
+        # 对话框会阻塞到用户关闭，交给事件循环执行，不在本次刷新中等待
+        try:
+            while True:
+                fn, args = self._ui_queue.get_nowait()
+                self.after_idle(fn, *args)
+        except queue.Empty:
+            pass
+
+        if PHASE_METRICS.version != self._metrics_version:
+            self.refresh_phase_timings()
+        if self._jobs_dirty:
+            self.refresh_job_status()
+        if self.account_table:
+            self.account_table.flush()
+        self.after(self.LOG_FLUSH_MS, self.flush_logs)
 
     def save_config(self):
         """保存配置并更新状态"""
@@ -459,15 +616,23 @@ class App(tk.Tk):
         if client_secret == "Client Secret":
             client_secret = ""
             
-        config = {
+        # 保留配置文件中界面之外的配置项（如 panels、browser_max_sessions）
+        try:
+            config = load_config(self.config_file_path)
+        except Exception:
+            config = {}
+        config.update({
             "ql_url": url,
             "ql_client_id": client_id,
             "ql_client_secret": client_secret
-        }
+        })
         
         try:
             with open(self.config_file_path, "w") as f:
                 json.dump(config, f, indent=4)
+            _get_account_store().save_panels(_get_panels(config))
+            if self.account_table:
+                self.account_table.set_panels(self.panel_names())
             
             self.log(f"配置已保存", "SUCCESS")
             
@@ -484,6 +649,33 @@ class App(tk.Tk):
             self.log(f"保存配置失败: {e}", "ERROR")
             messagebox.showerror("❌ 保存失败", f"配置保存失败:\n{e}")
     
+    def save_setting(self, key, value):
+        """把单个开关写入配置文件，返回是否成功"""
+        try:
+            config = load_config(self.config_file_path)
+            config[key] = value
+            with open(self.config_file_path, "w") as f:
+                json.dump(config, f, indent=4)
+            return True
+        except Exception as e:
+            self.log(f"保存设置 {key} 失败: {e}", "WARN")
+            return False
+
+    def toggle_auto_capture(self):
+        """切换自动获取模式并写入配置文件"""
+        enabled = self.auto_capture_var.get()
+        self.save_setting("auto_capture", enabled)
+        if not enabled and self.login_watcher:
+            self.login_watcher.stop()
+            self.login_watcher = None
+        self.log(f"自动获取模式已{'开启' if enabled else '关闭'}", "INFO")
+
+    def toggle_qr_login(self):
+        """切换扫码登录模式并写入配置文件，下次打开登录时生效"""
+        enabled = self.qr_login_var.get()
+        self.save_setting("qr_login", enabled)
+        self.log(f"扫码登录模式已{'开启' if enabled else '关闭'}", "INFO")
+    
     def load_config(self):
         """加载配置并更新状态"""
         try:
@@ -504,7 +696,20 @@ class App(tk.Tk):
                     self.ql_client_secret.delete(0, tk.END)
                     self.ql_client_secret.insert(0, config["ql_client_secret"])
                 
+                self.extra_panels = config.get("panels") or []
+                self.browser_pool = BrowserPool(max_sessions=config.get("browser_max_sessions", 3))
+                self.auto_capture_var.set(config.get("auto_capture", True))
+                self.qr_login_var.set(config.get("qr_login", False))
+                self.health_config = {key: value for key, value in config.items() if key.startswith("health_check_")}
+                self.shard_config = {key: config[key] for key in ("sharding", "ql_weight") if key in config}
+                if config.get("metrics_port") and self.metrics_server is None:
+                    self.start_metrics_server(config["metrics_port"])
+                if config.get("ingest_port") and self.ingest_server is None:
+                    self.start_ingest_server(config)
+                
                 self.log(f"已从本地加载配置文件", "SUCCESS")
+                if self.extra_panels:
+                    self.log(f"已加载 {len(self.extra_panels)} 个额外青龙面板", "INFO")
                 
                 # 检查配置完整性并更新状态
                 if all([config.get("ql_url"), config.get("ql_client_id"), config.get("ql_client_secret")]):
@@ -519,49 +724,262 @@ class App(tk.Tk):
         except Exception as e:
             self.log(f"加载配置失败: {e}", "ERROR")
 
-    def open_jd_login(self):
-        """打开浏览器进行京东登录"""
-        self.log("正在初始化Chrome浏览器...", "INFO")
-        self.update_status_indicator(1, "初始化中", "#ffc107")
-        
-        def run():
+    def start_metrics_server(self, port):
+        """在本地端口提供 /metrics（Prometheus 文本格式）"""
+        try:
+            self.metrics_server = MetricsServer(
+                int(port), lambda: render_prometheus(PHASE_METRICS, HTTP_STATS.snapshot())).start()
+            self.log(f"📈 指标端点已启动: http://127.0.0.1:{self.metrics_server.port}/metrics", "INFO")
+        except Exception as e:
+            self.log(f"指标端点启动失败: {e}", "WARN")
+
+    def start_ingest_server(self, config):
+        """在本地端口接收其他设备提交的Cookie，批处理窗口内按 pin 合并后同步到青龙"""
+        from ingest import CookieBatcher, IngestServer, make_forwarder
+
+        def on_batch(batch, results, elapsed):
+            for result in results:
+                for account in result["accounts"]:
+                    if self.account_table:
+                        self.account_table.set_sync(account["pin"], result["key"], {
+                            "ok": account["ok"], "operation": account["operation"], "error": account["error"],
+                            "duration_ms": round(elapsed * 1000, 1), "synced_at": time.time()})
+                    if not account["ok"]:
+                        self.log(f"📥 [{result['name']}] {account['pin']} 同步失败: {account['error']}", "ERROR",
+                                 pin=account["pin"], panel=result["name"], operation="ingest", ok=False)
+            if self.account_table:
+                for pin, _ in batch:
+                    self.account_table.set_account(pin, time.time())
+            self.log(f"📥 已把 {len(batch)} 个接收到的账号同步到青龙 ({elapsed * 1000:.0f} ms)", "SUCCESS",
+                     operation="ingest", ok=True, duration_ms=round(elapsed * 1000, 1))
+
+        def on_error(batch, e):
+            self.log(f"📥 {len(batch)} 个接收到的账号同步失败: {e}", "ERROR")
+
+        def on_submit(pins, client):
+            self.log(f"📥 收到 {client} 提交的 {len(pins)} 个Cookie: {', '.join(pins[:3])}"
+                     f"{' …' if len(pins) > 3 else ''}", "INFO")
+
+        try:
+            batcher = CookieBatcher(make_forwarder(lambda: load_config(self.config_file_path),
+                                                   store=_get_account_store(), on_batch=on_batch),
+                                    window=config.get("ingest_window", 2.0), on_error=on_error)
+            self.ingest_server = IngestServer(int(config["ingest_port"]), batcher, token=config.get("ingest_token"),
+                                              on_submit=on_submit).start()
+            self.log(f"📥 Cookie接收端点已启动: http://127.0.0.1:{self.ingest_server.port}/cookies", "INFO")
+        except Exception as e:
+            self.log(f"Cookie接收端点启动失败: {e}", "WARN")
+
+    def reopen_account(self, pin):
+        """在账号列表中双击账号：用该账号保存的浏览器资料重新打开京东，仍处于登录状态即可免登录重新获取Cookie"""
+        if not self.browser_pool.profile_dir_for(pin):
+            self.log(f"账号 {pin} 没有保存的浏览器资料，请点击 '🌐 打开京东登录' 重新登录", "WARN")
+            return
+        self.open_jd_login(pin)
+
+    def open_jd_login(self, pin=None):
+        """
+        打开浏览器进行京东登录
+        pin 为空时使用新的资料目录（登录新账号）；指定 pin 时复用该账号保存的浏览器资料（只由 reopen_account 传入）
+        """
+        # 界面变量只能在主线程读取；扫码登录总是使用新的资料目录
+        qr_mode = self.qr_login_var.get() and not pin
+        auto_capture = self.auto_capture_var.get()
+
+        def run(job):
             try:
-                # 使用 webdriver-manager 自动管理 ChromeDriver
-                self.log("正在下载/更新ChromeDriver...", "INFO")
-                service = ChromeService(executable_path=ChromeDriverManager().install())
+                # 使用 webdriver-manager 自动管理 ChromeDriver，Chrome 版本不变时直接使用缓存路径
+                self.log("正在解析ChromeDriver...", "INFO")
+                with PHASE_METRICS.timer("driver_resolve"):
+                    _, from_cache = _get_driver_resolver().resolve()
+                self.log("已使用缓存的ChromeDriver" if from_cache else "ChromeDriver已下载/更新", "INFO")
+                if job.cancelled:
+                    return
                 
                 self.log("正在启动Chrome浏览器...", "INFO")
                 
-                # 配置Chrome浏览器选项
-                chrome_options = webdriver.ChromeOptions()
-                # 设置窗口大小和位置
-                # chrome_options.add_argument("--window-size=500,1000")  # 宽度500px，高度1000px
-                chrome_options.add_argument("--window-position=200,100")  # 距离屏幕左边200px，顶部100px
-                
-                # 可选的其他设置（你可以根据需要启用）
-                # chrome_options.add_argument("--start-maximized")  # 最大化启动
-                # chrome_options.add_argument("--force-device-scale-factor=1.1")  # 缩放110%
-                
-                self.driver = webdriver.Chrome(service=service, options=chrome_options)
-                self.driver.get("https://home.m.jd.com/myJd/home.action")
+                # 新账号使用会话池中的一个新资料目录，获取Cookie后绑定到该账号。
+                # 上一个浏览器窗口不再使用时直接关闭，不占用会话池的名额；同一账号则复用已打开的窗口
+                previous, self.browser_session = self.browser_session, None
+                if self.login_watcher:
+                    self.login_watcher.stop()
+                    self.login_watcher = None
+                if previous is not None:
+                    self.browser_pool.release(previous)
+                    if previous.key != pin:
+                        self.browser_pool.close(previous.key)
+                with PHASE_METRICS.timer("chrome_launch"):
+                    self.browser_session = self.browser_pool.acquire(pin, timeout=30,
+                                                                     headless=True if qr_mode else None)
+                self.driver = self.browser_session.driver
+                if qr_mode:
+                    self.start_qr_login()
+                    return
+                with PHASE_METRICS.timer("page_load"):
+                    self.driver.get(JD_LOGIN_URL)
                 
                 self.log("🌐 浏览器已成功打开", "SUCCESS")
-                self.log("📱 请在浏览器中手动登录京东账号", "INFO")
-                self.log("✅ 登录完成后点击 '🍪 获取Cookie' 按钮", "INFO")
+                if pin:
+                    self.log(f"👤 已使用账号 {pin} 保存的浏览器资料，仍处于登录状态时将直接获取Cookie", "INFO")
+                else:
+                    self.log("📱 请在浏览器中手动登录京东账号", "INFO")
+                if auto_capture:
+                    self.log("🤖 已开启自动获取，登录完成后将自动获取Cookie并发送", "INFO")
+                    self.start_login_watcher()
+                else:
+                    self.log("✅ 登录完成后点击 '🍪 获取Cookie' 按钮", "INFO")
                 
                 # 更新登录状态
-                self.update_status_indicator(1, "待登录", "#ffc107")
+                self.run_on_main(self.update_status_indicator, 1, "待登录", "#ffc107")
                 
             except Exception as e:
                 self.log(f"浏览器启动失败: {e}", "ERROR")
-                self.update_status_indicator(1, "启动失败", "#dc3545")
-                messagebox.showerror("🌐 浏览器启动失败", 
-                                   f"无法启动Chrome浏览器，请确保：\n"
-                                   f"1. 已安装Chrome浏览器\n"
-                                   f"2. 网络连接正常\n\n"
-                                   f"错误详情: {e}")
+                self.run_on_main(self.update_status_indicator, 1, "启动失败", "#dc3545")
+                self.run_on_main(messagebox.showerror, "🌐 浏览器启动失败",
+                                 f"无法启动Chrome浏览器，请确保：\n"
+                                 f"1. 已安装Chrome浏览器\n"
+                                 f"2. 网络连接正常\n\n"
+                                 f"错误详情: {e}")
+        
+        # 同一时间只启动一个浏览器，连续点击不会打开多个窗口
+        if self.submit_job("browser", run, "启动浏览器", "⏳ 浏览器正在启动中，请稍候..."):
+            self.log("正在初始化Chrome浏览器...", "INFO")
+            self.update_status_indicator(1, "初始化中", "#ffc107")
+
+    def start_qr_login(self):
+        """
+        在无头浏览器中打开扫码登录页（屏蔽图片、字体和统计脚本），在弹出窗口中显示二维码并等待扫码
+        在浏览器启动任务的工作线程中调用，界面更新都经过 run_on_main
+        """
+        if self.qr_login:
+            self.qr_login.stop()
+        self.qr_login = QRLogin(self.driver)
+        with PHASE_METRICS.timer("page_load"):
+            png = self.qr_login.open()
+        self.run_on_main(self.show_qr, png)
+        self.log("📱 请使用京东 App 扫描弹出窗口中的二维码", "INFO")
+        self.run_on_main(self.update_status_indicator, 1, "待扫码", "#ffc107")
+
+        def on_login(pt_key, pt_pin):
+            self.run_on_main(self.on_qr_login, pt_key, pt_pin)
+
+        def on_qr(png):
+            self.log("🔄 二维码已失效，已自动刷新", "INFO")
+            self.run_on_main(self.show_qr, png)
+
+        def on_timeout():
+            self.log("⏰ 等待扫码超时，请重新打开登录", "WARN")
+            self.run_on_main(self.cancel_qr_login)
+
+        def on_error(e):
+            self.log(f"扫码登录已停止: {e}", "WARN")
+            self.run_on_main(self.cancel_qr_login)
+
+        self.qr_login.watch(on_login, on_qr, on_timeout, on_error)
+
+    def show_qr(self, png):
+        """在弹出窗口中显示登录二维码，窗口已打开时只替换图片"""
+        if not self.qr_login:
+            return
+        image = tk.PhotoImage(data=base64.b64encode(png).decode("ascii"))
+        if self.qr_window is None or not self.qr_window.winfo_exists():
+            self.qr_window = tk.Toplevel(self, bg='#2d2d2d')
+            self.qr_window.title("📱 京东扫码登录")
+            self.qr_window.resizable(False, False)
+            self.qr_window.protocol("WM_DELETE_WINDOW", self.cancel_qr_login)
+            self.qr_image_label = tk.Label(self.qr_window, bg='#2d2d2d')
+            self.qr_image_label.pack(padx=20, pady=(20, 10))
+            tk.Label(self.qr_window, text="请使用京东 App 扫码并确认登录", font=('SF Pro Display', 11),
+                     fg='#e0e0e0', bg='#2d2d2d').pack(padx=20)
+            tk.Button(self.qr_window, text="取消", command=self.cancel_qr_login, font=('SF Pro Display', 11),
+                      bg='#3a3a3a', fg='#e0e0e0', activebackground='#4a4a4a', activeforeground='white',
+                      relief='flat', bd=0, cursor='hand2').pack(pady=(10, 20), ipadx=20, ipady=4)
+        self.qr_image_label.config(image=image)
+        # 保留引用，否则图片会被回收
+        self.qr_image_label.image = image
+
+    def close_qr_session(self):
+        """关闭扫码用的窗口和无头浏览器会话，释放内存；Chrome 退出需要数秒，在后台任务中进行，不阻塞界面"""
+        if self.qr_login:
+            self.qr_login.stop()
+            self.qr_login = None
+        if self.qr_window is not None:
+            self.qr_window.destroy()
+            self.qr_window = None
+        if self.browser_session is not None:
+            session, self.browser_session = self.browser_session, None
+            self.driver = None
+
+            def run(job):
+                self.browser_pool.release(session)
+                self.browser_pool.close(session.key)
+
+            self.submit_job(f"browser-close:{session.key}", run, "关闭浏览器", "⏳ 浏览器正在关闭中")
+
+    def cancel_qr_login(self):
+        """取消扫码登录"""
+        if self.qr_login is None and self.qr_window is None:
+            return
+        self.close_qr_session()
+        self.log("扫码登录已取消", "INFO")
+        self.update_status_indicator(1, "未登录", "#ffc107")
+
+    def on_qr_login(self, pt_key, pt_pin):
+        """扫码完成：应用Cookie后关闭无头浏览器（资料目录已绑定账号，之后可免登录重新获取）"""
+        if self.qr_login is None:
+            return
+        self.log(f"📱 用户 {pt_pin} 扫码登录成功", "SUCCESS")
+        self.apply_cookie(pt_key, pt_pin)
+        self.close_qr_session()
+        if self.auto_capture_var.get():
+            self.send_to_ql()
+
+    def start_login_watcher(self):
+        """监视当前浏览器会话的登录状态，检测到 pt_key 后自动获取并发送"""
+        if self.login_watcher:
+            self.login_watcher.stop()
+
+        def on_login(pt_key, pt_pin):
+            self.run_on_main(self.on_login_detected, pt_key, pt_pin)
+
+        def on_timeout():
+            self.log("⏰ 等待登录超时，登录完成后请手动点击 '🍪 获取'", "WARN")
+
+        def on_error(e):
+            self.log(f"登录监视已停止: {e}", "WARN")
+
+        self.login_watcher = LoginWatcher(self.driver, on_login, on_timeout, on_error).start()
+
+    def on_login_detected(self, pt_key, pt_pin):
+        """自动获取模式下检测到登录：应用Cookie后直接发送到青龙"""
+        self.login_watcher = None
+        self.log(f"🤖 检测到用户 {pt_pin} 已登录，自动获取Cookie", "SUCCESS")
+        self.apply_cookie(pt_key, pt_pin)
+        self.send_to_ql()
+
+    def apply_cookie(self, pt_key, pt_pin):
+        """保存获取到的Cookie并更新界面状态"""
+        # 把当前浏览器资料绑定到该账号，之后可免登录重新获取
+        self.browser_pool.assign(self.browser_session, pt_pin)
+        
+        # 保存到账号存储
+        cookie_value = f"pt_key={pt_key};pt_pin={pt_pin};"
+        _get_account_store().save_account(pt_pin, cookie_value)
+        self.current_pin = pt_pin
+        if self.account_table:
+            self.account_table.set_account(pt_pin, time.time())
+        
+        # 更新用户名显示
+        self.pin_label.config(text=pt_pin, fg='#28a745')
         
-        threading.Thread(target=run, daemon=True).start()
+        # 更新状态
+        self.update_status_indicator(1, "已登录", "#28a745")
+        self.update_status_indicator(2, "已获取", "#28a745")
+        self.login_status = "已登录"
+        self.cookie_status = "已获取"
+        
+        self.log(f"✅ Cookie获取成功！用户: {pt_pin}", "SUCCESS")
+        self.log(f"🔑 pt_key长度: {len(pt_key)} 字符", "INFO")
 
     def get_cookies(self):
         """从浏览器获取京东Cookie"""
@@ -573,33 +991,14 @@ class App(tk.Tk):
         self.update_status_indicator(2, "获取中", "#ffc107")
         
         try:
-            cookies = self.driver.get_cookies()
-            pt_key = ""
-            pt_pin = ""
-            
-            for cookie in cookies:
-                if cookie['name'] == 'pt_key':
-                    pt_key = cookie['value']
-                elif cookie['name'] == 'pt_pin':
-                    pt_pin = cookie['value']
+            with PHASE_METRICS.timer("cookie_read"):
+                pt_key, pt_pin = read_jd_cookie(self.driver)
 
             if pt_key and pt_pin:
-                # 更新Cookie显示
-                cookie_value = f"pt_key={pt_key};pt_pin={pt_pin};"
-                self.cookie_text.delete('1.0', tk.END)
-                self.cookie_text.insert('1.0', cookie_value)
-                
-                # 更新用户名显示
-                self.pin_label.config(text=pt_pin, fg='#28a745')
-                
-                # 更新状态
-                self.update_status_indicator(1, "已登录", "#28a745")
-                self.update_status_indicator(2, "已获取", "#28a745")
-                self.login_status = "已登录"
-                self.cookie_status = "已获取"
-                
-                self.log(f"✅ Cookie获取成功！用户: {pt_pin}", "SUCCESS")
-                self.log(f"🔑 pt_key长度: {len(pt_key)} 字符", "INFO")
+                if self.login_watcher:
+                    self.login_watcher.stop()
+                    self.login_watcher = None
+                self.apply_cookie(pt_key, pt_pin)
                 
                 messagebox.showinfo("🍪 Cookie获取成功", 
                                   f"已成功获取用户 {pt_pin} 的Cookie信息！\n"
@@ -621,9 +1020,8 @@ class App(tk.Tk):
             self.update_status_indicator(2, "获取异常", "#dc3545")
             messagebox.showerror("🍪 获取失败", f"Cookie获取失败:\n{e}")
 
-    def send_to_ql(self):
-        """将Cookie发送到青龙面板"""
-        # 获取配置并过滤占位符
+    def current_config(self):
+        """返回界面上填写的主面板配置（已过滤占位符），以及配置文件中的额外面板"""
         url = self.ql_url.get()
         client_id = self.ql_client_id.get() 
         client_secret = self.ql_client_secret.get()
@@ -636,8 +1034,63 @@ class App(tk.Tk):
         if client_secret == "Client Secret":
             client_secret = ""
         
-        cookie_value = self.cookie_text.get('1.0', tk.END).strip()
-        pin = self.pin_label.cget("text")
+        return dict(self.shard_config, **{
+            "ql_url": url,
+            "ql_client_id": client_id,
+            "ql_client_secret": client_secret,
+            "panels": self.extra_panels
+        })
+
+    def schedule_health_check(self):
+        """按 config.json 的 health_check_interval（分钟）定期检查面板上的 Cookie"""
+        interval = self.health_config.get("health_check_interval")
+        if interval:
+            self.after(int(interval * 60 * 1000), self.run_health_check)
+
+    def run_health_check(self):
+        """在后台并发检查全部面板上的 Cookie，并把失效账号写入日志"""
+        from cookie_health import make_health_checker
+        
+        self.schedule_health_check()
+        panels = _get_panels(self.current_config())
+        if not panels:
+            return
+        checker = make_health_checker(self.health_config)
+        
+        def run(job):
+            start = time.monotonic()
+            cookies = []
+            for result in run_on_panels(panels, lambda ql: {"cookies": [env["value"] for env in ql.cookie_envs()]}):
+                if result["ok"]:
+                    cookies.extend(result["cookies"])
+                else:
+                    self.log(f"🩺 [{result['name']}] 读取Cookie失败: {result['error']}", "WARN")
+            results = checker.check_all(
+                cookies, on_result=lambda pin, r: self.account_table and self.account_table.set_health(
+                    pin, r["valid"], r["error"]))
+            invalid = sorted(pin for pin, r in results.items() if r["valid"] is False)
+            unknown = [pin for pin, r in results.items() if r["valid"] is None]
+            elapsed_ms = (time.monotonic() - start) * 1000
+            self.log(f"🩺 Cookie检查完成: 共 {len(results)} 个，失效 {len(invalid)} 个，"
+                     f"无法判断 {len(unknown)} 个，耗时 {elapsed_ms:.0f} ms",
+                     "WARN" if invalid else "SUCCESS",
+                     operation="health", ok=not invalid, duration_ms=round(elapsed_ms, 1))
+            if invalid:
+                self.log(f"🩺 失效账号: {', '.join(invalid)}", "WARN")
+        
+        self.submit_job("health", run, "Cookie检查", "🩺 上一次Cookie检查尚未结束，本次跳过")
+
+    def send_to_ql(self):
+        """将Cookie发送到青龙面板"""
+        # 获取配置并过滤占位符
+        config = self.current_config()
+        url = config["ql_url"]
+        client_id = config["ql_client_id"]
+        client_secret = config["ql_client_secret"]
+        
+        pin = self.current_pin
+        account = _get_account_store().get_account(pin) if pin else None
+        cookie_value = account["cookie"] if account else ""
 
         # 验证配置完整性
         if not all([url, client_id, client_secret]):
@@ -650,7 +1103,7 @@ class App(tk.Tk):
             return
         
         # 验证Cookie是否存在
-        if "N/A" in pin or not cookie_value:
+        if not pin or not cookie_value:
             messagebox.showerror("🍪 Cookie未获取", 
                                "请先获取Cookie！\n\n"
                                "步骤：\n"
@@ -659,67 +1112,112 @@ class App(tk.Tk):
                                "3. 点击 '🍪 获取'")
             return
             
-        self.log("🚀 开始向青龙面板发送Cookie...", "INFO")
-        self.update_status_indicator(0, "连接中", "#ffc107")
+        panels = _get_panels(config)
+        # 开启分片时只推送到该账号所属的面板
+        ring = make_ring(config, panels)
+        if ring:
+            panels = [ring.owner(pin)]
+            self.log(f"🧭 分片模式: 用户 {pin} 归属面板 [{panels[0]['name']}]", "INFO")
         
-        def run():
+        panel_keys = {panel["name"]: TokenCache.make_key(panel["url"], panel["client_id"]) for panel in panels}
+        
+        def report(result):
+            elapsed_ms = result["elapsed"] * 1000
+            _get_account_store().record_sync(pin, panel_keys[result["name"]], env_id=result.get("id"),
+                                             operation=result.get("operation"), ok=result["ok"],
+                                             error=result["error"], duration_ms=round(elapsed_ms, 1))
+            if self.account_table:
+                self.account_table.set_sync(pin, panel_keys[result["name"]], {
+                    "ok": result["ok"], "operation": result.get("operation"), "error": result["error"],
+                    "duration_ms": round(elapsed_ms, 1), "synced_at": time.time()})
+            fields = {"pin": pin, "panel": result["name"], "operation": "sync", "ok": result["ok"],
+                      "duration_ms": round(elapsed_ms, 1)}
+            if result["ok"] and result["operation"] == "未变化":
+                self.log(f"✅ [{result['name']}] 用户 {pin} 的Cookie与面板一致，无需写入 "
+                         f"(ID: {result['id']}, {elapsed_ms:.0f} ms)", "SUCCESS", **fields)
+            elif result["ok"]:
+                self.log(f"✅ [{result['name']}] 用户 {pin} 的Cookie已{result['operation']} "
+                         f"(ID: {result['id']}, {elapsed_ms:.0f} ms)", "SUCCESS", **fields)
+            else:
+                self.log(f"❌ [{result['name']}] 发送失败: {result['error']} ({elapsed_ms:.0f} ms)", "ERROR",
+                         error=result["error"], **fields)
+        
+        def run(job):
+            stats_before = HTTP_STATS.snapshot()
+            start = time.monotonic()
             try:
-                # 连接青龙面板
-                self.log("🔐 正在连接青龙面板...", "INFO")
-                ql = QLHelper(url, client_id, client_secret)
-                
-                # 登录青龙面板
-                login_result = ql.login()
-                self.log(f"✅ {login_result}", "SUCCESS")
-                self.update_status_indicator(0, "已连接", "#28a745")
-                
-                # 查找现有环境变量
-                search_value = f"pt_pin={pin}"
-                self.log(f"🔍 正在查找用户 {pin} 的环境变量...", "INFO")
-                env_id = ql.get_envs(search_value)
-                
-                remarks = f"macOS助手v2.0_{pin}_{time.strftime('%Y%m%d_%H%M')}"
-                
-                if env_id:
-                    # 更新现有环境变量
-                    self.log(f"📝 找到现有环境变量 ID: {env_id}，准备更新...", "INFO")
-                    ql.update_envs(env_id, "JD_COOKIE", cookie_value, remarks)
-                    ql.enable_envs(env_id)  # 确保启用状态
-                    self.log(f"🔄 用户 {pin} 的Cookie已更新", "SUCCESS")
-                    operation = "更新"
-                else:
-                    # 新增环境变量
-                    self.log(f"➕ 未找到现有变量，准备为用户 {pin} 新增...", "INFO")
-                    ql.add_envs("JD_COOKIE", cookie_value, remarks)
-                    self.log(f"✨ 用户 {pin} 的Cookie已新增", "SUCCESS")
-                    operation = "添加"
+                # 并发推送到全部面板
+                self.log(f"🔐 正在连接青龙面板并同步用户 {pin}...", "INFO")
+                with PHASE_METRICS.timer("send", pin=pin):
+                    results = push_cookie_to_panels(panels, pin, cookie_value, on_result=report)
+                succeeded = [r for r in results if r["ok"]]
                 
                 # 操作完成
-                self.log(f"🎉 Cookie {operation}操作完成！", "SUCCESS")
+                total_ms = (time.monotonic() - start) * 1000
+                self.log(f"🎉 同步完成: {len(succeeded)}/{len(results)} 个面板成功，"
+                         f"总耗时 {total_ms:.0f} ms", "SUCCESS" if succeeded else "ERROR",
+                         pin=pin, operation="send", ok=len(succeeded) == len(results),
+                         duration_ms=round(total_ms, 1))
+                stats = HTTP_STATS.snapshot()
+                self.log(f"📈 HTTP 统计: 请求 {stats['requests'] - stats_before['requests']} 次，"
+                         f"新建连接 {stats['connections'] - stats_before['connections']} 个，"
+                         f"重试 {stats['retries'] - stats_before['retries']} 次，"
+                         f"耗时 {stats['total_ms'] - stats_before['total_ms']:.0f} ms", "INFO")
                 
-                messagebox.showinfo("🎉 操作成功", 
-                                  f"用户 {pin} 的Cookie已成功{operation}到青龙面板！\n\n"
-                                  f"📊 操作详情：\n"
-                                  f"• 用户: {pin}\n"
-                                  f"• 操作: {operation}\n"
-                                  f"• 时间: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+                details = "\n".join(
+                    f"• {r['name']}: {r['operation'] if r['ok'] else '失败'} ({r['elapsed'] * 1000:.0f} ms)"
+                    for r in results)
+                if len(succeeded) == len(results):
+                    self.run_on_main(self.update_status_indicator, 0, "已连接", "#28a745")
+                    self.run_on_main(messagebox.showinfo, "🎉 操作成功",
+                                     f"用户 {pin} 的Cookie已成功同步到青龙面板！\n\n"
+                                     f"📊 操作详情：\n"
+                                     f"{details}\n"
+                                     f"• 时间: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+                elif succeeded:
+                    self.run_on_main(self.update_status_indicator, 0, f"部分成功 {len(succeeded)}/{len(results)}",
+                                     "#ffc107")
+                    self.run_on_main(messagebox.showwarning, "⚠️ 部分成功",
+                                     f"用户 {pin} 的Cookie仅同步到部分青龙面板。\n\n"
+                                     f"📊 操作详情：\n"
+                                     f"{details}")
+                else:
+                    raise Exception("; ".join(f"{r['name']}: {r['error']}" for r in results))
 
             except Exception as e:
                 self.log(f"❌ 发送失败: {e}", "ERROR")
-                self.update_status_indicator(0, "连接失败", "#dc3545")
-                messagebox.showerror("🚀 发送失败", 
-                                   f"Cookie发送失败！\n\n"
-                                   f"可能的原因：\n"
-                                   f"• 网络连接问题\n"
-                                   f"• 青龙面板配置错误\n"
-                                   f"• 服务器响应异常\n\n"
-                                   f"错误详情: {e}")
+                self.run_on_main(self.update_status_indicator, 0, "连接失败", "#dc3545")
+                self.run_on_main(messagebox.showerror, "🚀 发送失败",
+                                 f"Cookie发送失败！\n\n"
+                                 f"可能的原因：\n"
+                                 f"• 网络连接问题\n"
+                                 f"• 青龙面板配置错误\n"
+                                 f"• 服务器响应异常\n\n"
+                                 f"错误详情: {e}")
         
-        threading.Thread(target=run, daemon=True).start()
+        # 同一账号的发送同时只有一个在进行（不论发往哪些面板），重复点击或面板配置改变后再次点击都不会并发写入同一面板
+        key = f"sync:{pin}"
+        if self.submit_job(key, run, f"发送 {pin}", f"⏳ 用户 {pin} 的Cookie正在发送中，请勿重复点击"):
+            self.log(f"🚀 开始向 {len(panels)} 个青龙面板发送Cookie...", "INFO")
+            self.update_status_indicator(0, "连接中", "#ffc107")
 
     def on_closing(self):
-        if self.driver:
-            self.driver.quit()
+        # 取消排队中的任务，最多等待运行中的任务 3 秒
+        remaining = self.jobs.shutdown(timeout=3)
+        if remaining:
+            print(f"⚠️ 退出时仍有 {len(remaining)} 个任务未结束: {', '.join(job.name for job in remaining)}",
+                  file=sys.stderr)
+        if self.login_watcher:
+            self.login_watcher.stop()
+        if self.qr_login:
+            self.qr_login.stop()
+        if self.browser_pool:
+            self.browser_pool.close_all()
+        if self.metrics_server:
+            self.metrics_server.stop()
+        if self.ingest_server:
+            # 把批处理窗口中尚未发出的Cookie发出去
+            self.ingest_server.stop(timeout=5)
         self.destroy()
 
 if __name__ == "__main__":
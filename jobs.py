@@ -0,0 +1,178 @@
+"""
+后台任务执行器：有界线程池 + 按键去重（single-flight）+ 协作式取消
+同一个键同时只会有一个任务在排队或运行，重复提交直接返回已有任务
+"""
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    """
+    一个后台任务
+    state 依次为 queued → running → done / failed / cancelled；
+    任务函数以 fn(job) 调用，可在耗时步骤之间检查 job.cancelled 并提前返回
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, job_id, key, name):
+        self.id = job_id
+        self.key = key
+        self.name = name
+        self.state = self.QUEUED
+        self.error = None
+        self.result = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def finished(self):
+        return self.state in (self.DONE, self.FAILED, self.CANCELLED)
+
+    def cancel(self):
+        """请求取消：排队中的任务不再执行，运行中的任务在下次检查 cancelled 时退出"""
+        self._cancel.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def wait(self, timeout=None):
+        """等待任务结束，返回是否已结束"""
+        if self.future is None:
+            return self.finished
+        try:
+            self.future.result(timeout)
+        except Exception:
+            pass
+        return self.finished
+
+
+class JobExecutor:
+    """
+    有界后台任务执行器
+    最多 max_workers 个任务同时运行，其余排队；listener(job) 在每次状态变化时（于工作线程或提交线程中）被调用
+    """
+    def __init__(self, max_workers=4, listener=None):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._active = {}  # 键 → 未结束的任务
+        self._ids = itertools.count(1)
+        self._listeners = [listener] if listener else []
+        self._closed = False
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def submit(self, key, fn, name=None):
+        """
+        提交任务；同一键已有未结束的任务时不再提交，返回 (已有任务, False)，否则返回 (新任务, True)
+        执行器已关闭时抛出 RuntimeError
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("任务执行器已关闭")
+            existing = self._active.get(key)
+            if existing is not None:
+                return existing, False
+            job = Job(next(self._ids), key, name or key)
+            self._active[key] = job
+        self._notify(job)
+        try:
+            job.future = self._pool.submit(self._run, job, fn)
+        except RuntimeError:
+            # 提交途中执行器被关闭
+            self._finish(job, Job.CANCELLED)
+            return job, True
+        # 回调可能在当前线程立即执行，因此不能在持锁时注册
+        job.future.add_done_callback(lambda future: self._on_future_done(job, future))
+        return job, True
+
+    def _run(self, job, fn):
+        if job.cancelled:
+            return
+        job.started_at = time.time()
+        self._set_state(job, Job.RUNNING)
+        try:
+            job.result = fn(job)
+        except Exception as e:
+            job.error = str(e)
+            self._finish(job, Job.FAILED)
+        else:
+            self._finish(job, Job.CANCELLED if job.cancelled else Job.DONE)
+
+    def _on_future_done(self, job, future):
+        # 排队中被取消的任务不会进入 _run
+        if not job.finished:
+            self._finish(job, Job.CANCELLED)
+
+    def _finish(self, job, state):
+        with self._lock:
+            if job.finished:
+                return
+            job.finished_at = time.time()
+            job.state = state
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+        self._notify(job)
+
+    def _set_state(self, job, state):
+        job.state = state
+        self._notify(job)
+
+    def _notify(self, job):
+        for listener in self._listeners:
+            try:
+                listener(job)
+            except Exception:
+                pass
+
+    def get(self, key):
+        """返回该键未结束的任务，没有时返回 None"""
+        with self._lock:
+            return self._active.get(key)
+
+    def active(self):
+        """返回全部未结束的任务"""
+        with self._lock:
+            return list(self._active.values())
+
+    def counts(self):
+        """返回 {'queued': 排队数, 'running': 运行数}"""
+        jobs = self.active()
+        return {
+            "queued": sum(1 for job in jobs if job.state == Job.QUEUED),
+            "running": sum(1 for job in jobs if job.state == Job.RUNNING)
+        }
+
+    def cancel(self, key):
+        job = self.get(key)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def shutdown(self, timeout=5.0):
+        """
+        停止接收新任务，取消全部排队任务并通知运行中的任务取消，最多等待 timeout 秒
+        返回超时后仍在运行的任务列表
+        """
+        with self._lock:
+            self._closed = True
+            jobs = list(self._active.values())
+        for job in jobs:
+            job.cancel()
+        deadline = time.monotonic() + timeout
+        for job in jobs:
+            job.wait(max(0.0, deadline - time.monotonic()))
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        return [job for job in jobs if not job.finished]
@@ -0,0 +1,230 @@
+"""
+结构化日志：以 JSON Lines 格式写入应用配置目录下的 logs/app.jsonl，阶段耗时单独写入 logs/phases.jsonl
+写盘在后台线程中完成并按大小轮转，另提供按条件读取和汇总日志的函数
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+from qinglong import _get_app_dir, _file_lock
+
+# 界面和命令行的日志
+APP_LOG = "app.jsonl"
+# 阶段耗时记录（metrics.PhaseMetrics.timer 写入），与 app.jsonl 分开，metrics 命令从这里重建统计
+PHASE_LOG = "phases.jsonl"
+
+
+def log_path(name=APP_LOG):
+    """返回应用配置目录下 logs/ 中的日志文件路径"""
+    return os.path.join(_get_app_dir(), "logs", name)
+
+
+class JsonlLogSink:
+    """
+    异步、按大小轮转的 JSONL 日志写入器
+    emit() 只把记录放入有界队列，不会阻塞界面和同步线程；队列满时丢弃并计数。
+    文件超过 max_bytes 时轮转为 app.jsonl.1 … app.jsonl.<backup_count>；
+    写入和轮转都在 <文件名>.lock 的跨进程锁内进行，其他进程轮转后会重新打开新文件
+    """
+    def __init__(self, path=None, max_bytes=5 * 1024 * 1024, backup_count=3, max_queue=10000):
+        self.path = path or log_path()
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+    def emit(self, level, message, **fields):
+        """记录一条日志，附加字段（如 pin、panel、operation、duration_ms）原样写入"""
+        record = {"ts": round(time.time(), 3), "level": level, "message": message}
+        record.update({key: value for key, value in fields.items() if value is not None})
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        stream = None
+        try:
+            while True:
+                record = self._queue.get()
+                batch = [record]
+                # 一次取完队列中已有的记录，合并写入
+                while len(batch) < 1000:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = None in batch
+                lines = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in batch if r is not None)
+                try:
+                    with _file_lock(self.path + ".lock"):
+                        stream = self._reopen_if_rotated(stream)
+                        stream.write(lines)
+                        stream.flush()
+                        if os.fstat(stream.fileno()).st_size >= self.max_bytes:
+                            stream.close()
+                            stream = None
+                            self._rotate()
+                except Exception:
+                    # 写日志失败不能影响主流程
+                    if stream is not None:
+                        stream.close()
+                    stream = None
+                for _ in batch:
+                    self._queue.task_done()
+                if stop:
+                    return
+        finally:
+            if stream is not None:
+                stream.close()
+
+    def _reopen_if_rotated(self, stream):
+        """其他进程轮转后，已打开的文件已被改名为 .1，需要重新打开（调用方需持有文件锁）"""
+        if stream is not None:
+            try:
+                current = os.stat(self.path)
+                opened = os.fstat(stream.fileno())
+                if (current.st_dev, current.st_ino) == (opened.st_dev, opened.st_ino):
+                    return stream
+            except OSError:
+                pass
+            stream.close()
+        return open(self.path, "a", encoding="utf-8")
+
+    def _rotate(self):
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def flush(self):
+        """等待队列中的记录全部写入（供测试和退出时使用）"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+
+def log_files(path):
+    """返回日志文件及其轮转文件，按时间从旧到新排列"""
+    files = []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        files.append(f"{path}.{index}")
+        index += 1
+    files.reverse()
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_logs(path=None, level=None, pin=None, panel=None, operation=None, since=None):
+    """
+    逐条读取日志记录（含轮转文件），按条件过滤
+    since 为 Unix 时间戳，只返回此后的记录；无法解析的行会被跳过
+    """
+    path = path or log_path()
+    for file_path in log_files(path):
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if level and record.get("level") != level:
+                    continue
+                if pin and record.get("pin") != pin:
+                    continue
+                if panel and record.get("panel") != panel:
+                    continue
+                if operation and record.get("operation") != operation:
+                    continue
+                if since and record.get("ts", 0) < since:
+                    continue
+                yield record
+
+
+def summarize_logs(records):
+    """
+    按 operation 汇总日志：次数、失败次数、失败率和耗时分位数（毫秒）
+    只统计带 operation 字段的记录；带 ok 字段时以其判断成败，否则以 ERROR 级别判断
+    """
+    groups = {}
+    for record in records:
+        name = record.get("operation")
+        if not name:
+            continue
+        group = groups.setdefault(name, {"count": 0, "failures": 0, "durations": []})
+        group["count"] += 1
+        failed = not record["ok"] if "ok" in record else record.get("level") == "ERROR"
+        if failed:
+            group["failures"] += 1
+        if isinstance(record.get("duration_ms"), (int, float)):
+            group["durations"].append(record["duration_ms"])
+
+    summary = {}
+    for name, group in sorted(groups.items()):
+        durations = sorted(group["durations"])
+        summary[name] = {
+            "count": group["count"],
+            "failures": group["failures"],
+            "failure_rate": round(group["failures"] / group["count"], 4),
+            "avg_ms": round(sum(durations) / len(durations), 1) if durations else None,
+            "p50_ms": _percentile(durations, 0.5),
+            "p95_ms": _percentile(durations, 0.95),
+            "max_ms": durations[-1] if durations else None
+        }
+    return summary
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+_log_sink = None
+_phase_sink = None
+_log_sink_lock = threading.Lock()
+
+
+def _get_log_sink():
+    """获取进程内共享的日志写入器，进程退出时自动写完剩余日志"""
+    global _log_sink
+    with _log_sink_lock:
+        if _log_sink is None:
+            _log_sink = JsonlLogSink()
+            atexit.register(_log_sink.close)
+        return _log_sink
+
+
+def _get_phase_sink():
+    """获取进程内共享的阶段耗时写入器（logs/phases.jsonl），不受日志级别筛选影响"""
+    global _phase_sink
+    with _log_sink_lock:
+        if _phase_sink is None:
+            _phase_sink = JsonlLogSink(log_path(PHASE_LOG))
+            atexit.register(_phase_sink.close)
+        return _phase_sink
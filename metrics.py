@@ -0,0 +1,220 @@
+"""
+分阶段耗时统计：浏览器驱动解析、Chrome 启动、页面加载、Cookie 读取、令牌获取、环境变量查找/新增/更新/启用/禁用/删除
+记录每个阶段的最近耗时和滚动平均耗时供界面显示，并以 Prometheus 文本格式导出计数器和直方图
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# 阶段名 → 界面显示名（按流程顺序）
+PHASES = {
+    "driver_resolve": "驱动解析",
+    "chrome_launch": "浏览器启动",
+    "page_load": "页面加载",
+    "cookie_read": "读取Cookie",
+    "token_fetch": "获取令牌",
+    "env_lookup": "查找变量",
+    "env_add": "新增变量",
+    "env_update": "更新变量",
+    "env_enable": "启用变量",
+    "env_disable": "禁用变量",
+    "env_delete": "删除变量",
+    "send": "发送总计"
+}
+
+# 直方图桶上限（秒）
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 写入结构化日志时 operation 字段的前缀，命令行据此从日志重建统计
+LOG_PREFIX = "phase."
+
+
+class PhaseMetrics:
+    """
+    各阶段的耗时统计
+    每个阶段保存次数、失败次数、耗时总和、直方图桶计数、最近一次耗时和最近 WINDOW 次的耗时；
+    version 在每次记录后递增，界面据此判断是否需要刷新
+    """
+    # 滚动平均的窗口大小
+    WINDOW = 20
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.version = 0
+        self._lock = threading.Lock()
+        self._phases = {}
+
+    def record(self, phase, seconds, ok=True):
+        with self._lock:
+            stats = self._phases.get(phase)
+            if stats is None:
+                stats = self._phases[phase] = {
+                    "count": 0,
+                    "errors": 0,
+                    "sum": 0.0,
+                    "buckets": [0] * len(self.buckets),
+                    "last": None,
+                    "recent": deque(maxlen=self.WINDOW)
+                }
+            stats["count"] += 1
+            stats["sum"] += seconds
+            if not ok:
+                stats["errors"] += 1
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    stats["buckets"][index] += 1
+                    break
+            stats["last"] = seconds
+            stats["recent"].append(seconds)
+            self.version += 1
+
+    @contextmanager
+    def timer(self, phase, **fields):
+        """
+        统计 with 块的耗时，块内抛出异常时记为失败（异常照常抛出）
+        同时向阶段耗时日志（logs/phases.jsonl，与 app.jsonl 分开）写入一条记录，fields 为附加字段（如 panel、pin）
+        """
+        start = time.monotonic()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            elapsed = time.monotonic() - start
+            self.record(phase, elapsed, ok=ok)
+            # log_sink 间接依赖 qinglong，而 qinglong 依赖本模块，因此在调用时才导入
+            from log_sink import _get_phase_sink
+            _get_phase_sink().emit("DEBUG", "phase", operation=LOG_PREFIX + phase, ok=ok,
+                                 duration_ms=round(elapsed * 1000, 1), **fields)
+
+    def last(self, phase):
+        """最近一次耗时（秒），没有记录时返回 None"""
+        with self._lock:
+            stats = self._phases.get(phase)
+            return stats["last"] if stats else None
+
+    def average(self, phase):
+        """最近 WINDOW 次的平均耗时（秒），没有记录时返回 None"""
+        with self._lock:
+            stats = self._phases.get(phase)
+            if not stats or not stats["recent"]:
+                return None
+            return sum(stats["recent"]) / len(stats["recent"])
+
+    def snapshot(self):
+        """返回各阶段统计的字典副本（bucket 计数为非累计值）"""
+        with self._lock:
+            return {
+                phase: {
+                    "count": stats["count"],
+                    "errors": stats["errors"],
+                    "sum": stats["sum"],
+                    "buckets": list(stats["buckets"]),
+                    "last": stats["last"],
+                    "avg": sum(stats["recent"]) / len(stats["recent"]) if stats["recent"] else None
+                }
+                for phase, stats in self._phases.items()
+            }
+
+
+def metrics_from_logs(records):
+    """用阶段耗时日志（logs/phases.jsonl）中的记录重建统计（供命令行导出其他进程记录的耗时）"""
+    metrics = PhaseMetrics()
+    for record in records:
+        operation = record.get("operation") or ""
+        if operation.startswith(LOG_PREFIX) and isinstance(record.get("duration_ms"), (int, float)):
+            metrics.record(operation[len(LOG_PREFIX):], record["duration_ms"] / 1000, ok=record.get("ok", True))
+    return metrics
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(metrics, http_stats=None):
+    """
+    以 Prometheus 文本格式导出阶段统计
+    metrics 为 PhaseMetrics，http_stats 为 HTTP_STATS.snapshot() 的结果（可选）
+    """
+    snapshot = metrics.snapshot()
+    phases = sorted(snapshot, key=lambda name: (list(PHASES).index(name) if name in PHASES else len(PHASES), name))
+    lines = [
+        "# HELP qljd_phase_duration_seconds 各阶段耗时",
+        "# TYPE qljd_phase_duration_seconds histogram"
+    ]
+    for phase in phases:
+        stats = snapshot[phase]
+        cumulative = 0
+        for bound, count in zip(metrics.buckets, stats["buckets"]):
+            cumulative += count
+            lines.append(f'qljd_phase_duration_seconds_bucket{{phase="{phase}",le="{bound}"}} {cumulative}')
+        lines.append(f'qljd_phase_duration_seconds_bucket{{phase="{phase}",le="+Inf"}} {stats["count"]}')
+        lines.append(f'qljd_phase_duration_seconds_sum{{phase="{phase}"}} {_format_value(round(stats["sum"], 6))}')
+        lines.append(f'qljd_phase_duration_seconds_count{{phase="{phase}"}} {stats["count"]}')
+
+    lines.append("# HELP qljd_phase_errors_total 各阶段失败次数")
+    lines.append("# TYPE qljd_phase_errors_total counter")
+    for phase in phases:
+        lines.append(f'qljd_phase_errors_total{{phase="{phase}"}} {snapshot[phase]["errors"]}')
+
+    lines.append("# HELP qljd_phase_last_seconds 各阶段最近一次耗时")
+    lines.append("# TYPE qljd_phase_last_seconds gauge")
+    for phase in phases:
+        lines.append(f'qljd_phase_last_seconds{{phase="{phase}"}} {_format_value(round(snapshot[phase]["last"], 6))}')
+
+    if http_stats:
+        for key, help_text in (("requests", "HTTP 请求次数"), ("retries", "HTTP 重试次数"),
+                               ("errors", "HTTP 失败次数"), ("connections", "新建的 TCP/TLS 连接数")):
+            lines.append(f"# HELP qljd_http_{key}_total {help_text}")
+            lines.append(f"# TYPE qljd_http_{key}_total counter")
+            lines.append(f"qljd_http_{key}_total {http_stats[key]}")
+        lines.append("# HELP qljd_http_request_seconds_total HTTP 请求累计耗时")
+        lines.append("# TYPE qljd_http_request_seconds_total counter")
+        lines.append(f"qljd_http_request_seconds_total {_format_value(http_stats['total_ms'] / 1000)}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    本地 Prometheus 抓取端点，默认只监听 127.0.0.1
+    每次请求 /metrics 时调用 render() 生成最新内容
+    """
+    def __init__(self, port, render, host="127.0.0.1"):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# 进程内共享的阶段统计
+PHASE_METRICS = PhaseMetrics()
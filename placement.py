@@ -0,0 +1,197 @@
+"""
+账号分片：按一致性哈希把每个 pin 分配到一个青龙面板，面板权重决定承载比例
+增删面板时只有落在变化区间上的账号需要迁移；rebalance() 按批把放错面板的环境变量迁到目标面板
+"""
+import bisect
+import hashlib
+import time
+
+from qinglong import QLHelper, TokenCache, _extract_pin, run_on_panels
+
+
+def _hash(text):
+    """跨进程稳定的 64 位哈希（不能用内置 hash()，它每次启动都会加盐）"""
+    return int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    带权重的一致性哈希环
+    每个面板按 权重 × REPLICAS 个虚拟节点放到环上，虚拟节点以 面板地址|client_id 为种子，
+    面板改名不影响分配；pin 顺时针落到的第一个虚拟节点所属的面板即为其归属
+    """
+    # 权重为 1 时每个面板的虚拟节点数
+    REPLICAS = 160
+
+    def __init__(self, panels, replicas=None):
+        self.replicas = replicas or self.REPLICAS
+        self.panels = {}
+        points = []
+        for panel in panels:
+            key = TokenCache.make_key(panel["url"], panel["client_id"])
+            self.panels[key] = panel
+            count = max(1, int(round(float(panel.get("weight") or 1) * self.replicas)))
+            points.extend((_hash(f"{key}#{index}"), key) for index in range(count))
+        points.sort()
+        self._hashes = [point for point, _ in points]
+        self._keys = [key for _, key in points]
+
+    def owner_key(self, pin):
+        """返回 pin 所属面板的键（面板地址|client_id）"""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(pin)) % len(self._hashes)
+        return self._keys[index]
+
+    def owner(self, pin):
+        """返回 pin 所属的面板配置"""
+        return self.panels.get(self.owner_key(pin))
+
+    def assign(self, pins):
+        """把 pin 按归属面板分组：面板键 → pin 列表"""
+        groups = {key: [] for key in self.panels}
+        for pin in pins:
+            groups[self.owner_key(pin)].append(pin)
+        return groups
+
+
+def make_ring(config, panels):
+    """config.json 中 sharding 为 true 时返回面板的哈希环，否则返回 None（推送到全部面板）"""
+    if not config.get("sharding") or not panels:
+        return None
+    return HashRing(panels)
+
+
+def plan_rebalance(ring, placements):
+    """
+    根据各面板上现有的环境变量生成迁移计划
+    placements 为 面板键 → {pin: 索引条目}；返回迁移列表，每项为
+    {'pin', 'value', 'status', 'remarks', 'source', 'source_id', 'target', 'copy'}，copy 为 False 表示目标面板上已有该账号，只需删除源条目
+    """
+    moves = []
+    for source, envs in placements.items():
+        for pin, entry in envs.items():
+            target = ring.owner_key(pin)
+            if target == source:
+                continue
+            target_entry = placements.get(target, {}).get(pin)
+            moves.append({
+                "pin": pin,
+                "value": entry.get("value"),
+                "status": entry.get("status"),
+                "remarks": entry.get("remarks"),
+                "source": source,
+                "source_id": entry.get("id"),
+                "target": target,
+                # 多个面板上都有该账号时，目标面板已有的条目优先，不覆盖
+                "copy": target_entry is None
+            })
+    # 同一 pin 在多个非目标面板上都有时只复制一次（取最近更新的那份）
+    latest = {}
+    for move in moves:
+        if not move["copy"]:
+            continue
+        updated = placements[move["source"]][move["pin"]].get("updatedAt") or ""
+        if move["pin"] not in latest or updated > latest[move["pin"]][0]:
+            latest[move["pin"]] = (updated, move)
+    for move in moves:
+        if move["copy"] and latest[move["pin"]][1] is not move:
+            move["copy"] = False
+    return moves
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _copy_envs(ql, batch):
+    """
+    在目标面板上原样新增一批迁移条目（值、备注不变，源条目已禁用的在目标面板上也禁用），返回写入成功的 pin 集合
+    不经过 sync_cookies，否则已禁用的账号会被重新启用、备注会被改写
+    """
+    data = ql.add_envs_bulk({'name': QLHelper.ENV_NAME, 'value': m["value"], 'remarks': m.get("remarks") or ""}
+                            for m in batch)
+    if data.get("code") != 200:
+        raise Exception(data.get("message", "新增环境变量失败"))
+    created = {_extract_pin(env.get("value")): env.get(ql.id_name) for env in data.get("data") or []}
+    disabled = [created[m["pin"]] for m in batch if m.get("status") == 1 and created.get(m["pin"]) is not None]
+    if disabled:
+        try:
+            data = ql.disable_envs(disabled)
+            if data.get("code") != 200:
+                raise Exception(data.get("message", "禁用环境变量失败"))
+        except Exception:
+            # 撤回这一批新条目，避免已禁用的账号在目标面板上以启用状态存在；源条目保留，下次再迁移
+            ql.delete_envs([env_id for env_id in created.values() if env_id is not None])
+            raise
+    return {m["pin"] for m in batch if created.get(m["pin"]) is not None}
+
+
+def rebalance(panels, batch_size=50, dry_run=False, on_batch=None):
+    """
+    把不在归属面板上的 JD_COOKIE 迁移到归属面板
+    先读取全部面板的环境变量（强制刷新索引），按批在目标面板上用一次 POST 新增（沿用源条目的备注，
+    源条目已禁用的再用一次 PUT /open/envs/disable 禁用），写入成功后再用一次 DELETE 删除源面板上的这一批条目；
+    写入失败的账号保留在源面板上，源面板删除失败的账号计入失败（两个面板上暂时都有，下次 rebalance 会再清理）。
+    on_batch(目标面板名, 源面板名, 迁移数, 失败数, 耗时秒) 在每批完成后调用。
+    返回 {'moves': 迁移计划, 'moved', 'failed', 'errors'}
+    """
+    ring = HashRing(panels)
+    placements = {}
+    errors = []
+    for result in run_on_panels(panels, lambda ql: {"envs": ql.cookie_envs(force=True), "key": ql.panel_key}):
+        if not result["ok"]:
+            errors.append(f"[{result['name']}] {result['error']}")
+            continue
+        placements[result["key"]] = {env["pin"]: env for env in result["envs"]}
+    if errors:
+        # 有面板读取失败时无法判断账号是否已在目标面板上，不做迁移
+        return {"moves": [], "moved": 0, "failed": 0, "errors": errors}
+
+    moves = plan_rebalance(ring, placements)
+    summary = {"moves": moves, "moved": 0, "failed": 0, "errors": errors}
+    if dry_run or not moves:
+        return summary
+
+    helpers = {}
+    for key, panel in ring.panels.items():
+        helpers[key] = QLHelper(panel["url"], panel["client_id"], panel["client_secret"])
+        helpers[key].login()
+
+    # 先处理需要复制的迁移，再处理只需删除重复条目的迁移，复制失败的账号不删除任何源条目
+    copy_failed = set()
+    for copying in (True, False):
+        groups = {}
+        for move in moves:
+            if move["copy"] == copying:
+                groups.setdefault((move["target"], move["source"]), []).append(move)
+        for (target, source), group in groups.items():
+            for batch in _chunks(group, batch_size):
+                start = time.monotonic()
+                if copying:
+                    copied = set()
+                    try:
+                        copied = _copy_envs(helpers[target], batch)
+                    except Exception as e:
+                        errors.append(f"[{ring.panels[target]['name']}] {e}")
+                    done = [m for m in batch if m["pin"] in copied]
+                    copy_failed.update(m["pin"] for m in batch if m["pin"] not in copied)
+                else:
+                    done = [m for m in batch if m["pin"] not in copy_failed]
+                moved = 0
+                if done:
+                    try:
+                        data = helpers[source].delete_envs([m["source_id"] for m in done])
+                        if data.get("code") != 200:
+                            raise Exception(data.get("message", "删除环境变量失败"))
+                        moved = len(done)
+                    except Exception as e:
+                        # 目标面板已写入，源面板删除失败会留下重复条目，计入失败，下次 rebalance 会再次清理
+                        errors.append(f"[{ring.panels[source]['name']}] {e}")
+                summary["moved"] += moved
+                summary["failed"] += len(batch) - moved
+                if on_batch:
+                    on_batch(ring.panels[target]["name"], ring.panels[source]["name"], moved,
+                             len(batch) - moved, time.monotonic() - start)
+    return summary
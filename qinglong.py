@@ -0,0 +1,997 @@
+"""
+青龙面板核心逻辑：配置路径、令牌缓存、环境变量索引与 QLHelper
+不依赖 tkinter / selenium，可同时供图形界面和命令行使用
+"""
+import codecs
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing, contextmanager
+import random
+import re
+import time
+
+from metrics import PHASE_METRICS
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 没有 fcntl，改用 msvcrt 加锁
+    fcntl = None
+    import msvcrt
+
+# --- 新增和修改的部分 ---
+
+def _get_config_path():
+    """获取跨平台的用户特定应用配置路径"""
+    # macOS: ~/Library/Application Support/AppName/config.json
+    # Windows: %APPDATA%/AppName/config.json
+    # Linux: ~/.config/AppName/config.json
+    
+    app_name = "QinglongJDCookieHelper" # 为应用创建一个文件夹
+    
+    if os.name == 'darwin': # macOS
+        path = os.path.join(os.path.expanduser('~'), 'Library', 'Application Support', app_name)
+    elif os.name == 'nt': # Windows
+        path = os.path.join(os.getenv('APPDATA'), app_name)
+    else: # Linux and other OS
+        path = os.path.join(os.path.expanduser('~'), '.config', app_name)
+        
+    # 确保目录存在
+    os.makedirs(path, exist_ok=True)
+    
+    return os.path.join(path, "config.json")
+
+# --------------------------
+
+
+def _get_app_dir():
+    """获取应用数据目录（与 config.json 位于同一目录）"""
+    return os.path.dirname(_get_config_path())
+
+
+@contextmanager
+def _file_lock(path):
+    """跨进程的排他锁：图形界面、命令行和接收端点可能同时写同一个文件"""
+    with open(path, "a") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _update_json_file(path, update, **dump_kwargs):
+    """
+    在 <文件名>.lock 的跨进程锁内重新读取 JSON 文件，交给 update(data) 修改后原子写回，返回写回的数据
+    锁内重新读取保证不会覆盖其他进程在本进程读取之后写入的条目
+    """
+    with _file_lock(path + ".lock"):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except Exception:
+            # 文件不存在或已损坏，按空数据处理
+            data = {}
+        update(data)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, **dump_kwargs)
+        os.replace(tmp_path, path)
+    return data
+
+
+def _extract_pin(cookie):
+    """从 'pt_key=...;pt_pin=...;' 格式的 Cookie 中提取 pt_pin，找不到时返回 None"""
+    match = re.search(r'(?:^|;)\s*pt_pin=([^;]+)', cookie or "")
+    return match.group(1).strip() if match else None
+
+
+def _extract_pt_key(cookie):
+    """从 Cookie 中提取 pt_key，找不到时返回 None"""
+    match = re.search(r'(?:^|;)\s*pt_key=([^;]+)', cookie or "")
+    return match.group(1).strip() if match else None
+
+
+def _make_remarks(pin):
+    """生成写入青龙环境变量的备注"""
+    return f"macOS助手v2.0_{pin}_{time.strftime('%Y%m%d_%H%M')}"
+
+
+def _iter_json_items(chunks, key="data", fields=None):
+    """
+    增量解析 {"code": 200, "data": [...]} 形式的 JSON 字节流，逐个产出 key 数组中的元素
+    其他顶层字段（code、message 等）写入 fields 字典；缓冲区只保留尚未解析的部分，
+    峰值内存约为一个元素加一个块的大小，第一个元素在整个响应接收完之前就能产出
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    fields = fields if fields is not None else {}
+    buf = ""
+    pos = 0
+
+    def more():
+        nonlocal buf, pos
+        for chunk in chunks:
+            if chunk:
+                buf = buf[pos:] + text.decode(chunk)
+                pos = 0
+                return True
+        return False
+
+    def peek():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not more():
+                raise ValueError("JSON 响应不完整")
+
+    def expect(chars):
+        nonlocal pos
+        char = peek()
+        if char not in chars:
+            raise ValueError(f"JSON 响应格式错误: 位置 {pos} 处为 {char!r}")
+        pos += 1
+        return char
+
+    def value():
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+                # 值后面必然还有 , ] } 之一；值恰好在缓冲区末尾时可能是被块边界截断的数字，需要再读
+                if end < len(buf):
+                    pos = end
+                    return item
+            except json.JSONDecodeError:
+                pass
+            if not more():
+                raise ValueError("JSON 响应不完整或格式错误")
+
+    expect("{")
+    if peek() == "}":
+        return
+    while True:
+        name = value()
+        expect(":")
+        if name == key and peek() == "[":
+            pos += 1
+            if peek() == "]":
+                pos += 1
+            else:
+                while True:
+                    yield value()
+                    if expect(",]") == "]":
+                        break
+        else:
+            fields[name] = value()
+        if expect(",}") == "}":
+            return
+
+
+def _log_event(level, message, **fields):
+    """写入一条结构化日志（log_sink 依赖本模块，因此在调用时才导入）"""
+    from log_sink import _get_log_sink
+    _get_log_sink().emit(level, message, **fields)
+
+
+class TokenCache:
+    """
+    青龙面板令牌缓存
+    以 面板地址 + client_id 为键，持久化保存 token、过期时间和 id 字段名，
+    缓存有效期内无需再请求 /open/auth/token 和探测 /open/envs
+    """
+    # 距离过期不足该秒数时视为已过期，避免请求途中令牌失效
+    EXPIRY_MARGIN = 60
+    # 面板未返回 expiration 时的保守有效期
+    DEFAULT_TTL = 24 * 3600
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(_get_app_dir(), "token_cache.json")
+        self._lock = threading.Lock()
+        self._entries = None
+
+    @staticmethod
+    def make_key(url, client_id):
+        return f"{url.strip('/')}|{client_id}"
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, "r") as f:
+                    self._entries = json.load(f)
+            except Exception:
+                # 缓存文件不存在或已损坏，按空缓存处理
+                self._entries = {}
+        return self._entries
+
+    def _update(self, update):
+        """在跨进程锁内把修改合并进磁盘上的最新内容并写回，内存中的缓存同步为合并后的结果"""
+        try:
+            self._entries = _update_json_file(self.path, update, indent=4)
+        except Exception:
+            # 写盘失败不影响本次使用，仅丢失持久化
+            update(self._load())
+
+    def get(self, url, client_id):
+        """返回未过期的缓存条目，不存在或已过期时返回 None"""
+        key = self.make_key(url, client_id)
+        with self._lock:
+            entry = self._load().get(key)
+            if not self._is_fresh(entry):
+                # 其他进程可能已获取了新令牌，重新读取一次缓存文件
+                self._entries = None
+                entry = self._load().get(key)
+        return entry if self._is_fresh(entry) else None
+
+    def _is_fresh(self, entry):
+        return bool(entry) and entry.get("expires_at", 0) - self.EXPIRY_MARGIN > time.time()
+
+    def put(self, url, client_id, token, expires_at, id_name):
+        key = self.make_key(url, client_id)
+        entry = {
+            "token": token,
+            "expires_at": expires_at,
+            "id_name": id_name
+        }
+        with self._lock:
+            self._update(lambda entries: entries.__setitem__(key, entry))
+
+    def invalidate(self, url, client_id):
+        key = self.make_key(url, client_id)
+        with self._lock:
+            self._update(lambda entries: entries.pop(key, None))
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def _get_token_cache():
+    """获取进程内共享的令牌缓存"""
+    global _token_cache
+    with _token_cache_lock:
+        if _token_cache is None:
+            _token_cache = TokenCache()
+        return _token_cache
+
+
+class EnvIndex:
+    """
+    面板 JD_COOKIE 环境变量的本地索引
+    按面板（面板地址 + client_id）保存 pin → {id, value, status, updatedAt, remarks}，
+    持久化到 env_index.json，查找为本地 O(1) 精确匹配；
+    刷新时按 updatedAt/value/status 增量合并，自身写入后直接回写对应条目
+    """
+    # 索引超过该秒数未与面板同步时视为过期
+    MAX_AGE = 300
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(_get_app_dir(), "env_index.json")
+        self._lock = threading.RLock()
+        self._panels = None
+        self._dirty = False
+        self._deferred = 0
+
+    def _load(self):
+        if self._panels is None:
+            try:
+                with open(self.path, "r") as f:
+                    self._panels = json.load(f)
+            except Exception:
+                self._panels = {}
+        return self._panels
+
+    def _panel(self, panel_key):
+        return self._load().setdefault(panel_key, {"synced_at": 0, "envs": {}})
+
+    def _changed(self):
+        self._dirty = True
+        if not self._deferred:
+            self.flush()
+
+    def flush(self):
+        """把未保存的改动写入磁盘"""
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_path = self.path + ".tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(self._panels, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except Exception:
+                # 写盘失败时保留内存中的索引，下次再尝试
+                pass
+
+    def deferred(self):
+        """在 with 块内合并多次改动，退出时统一写盘一次"""
+        index = self
+
+        class _Deferred:
+            def __enter__(self):
+                with index._lock:
+                    index._deferred += 1
+                return index
+
+            def __exit__(self, *exc):
+                with index._lock:
+                    index._deferred -= 1
+                    if not index._deferred:
+                        index.flush()
+                return False
+
+        return _Deferred()
+
+    def is_fresh(self, panel_key):
+        with self._lock:
+            synced_at = self._load().get(panel_key, {}).get("synced_at", 0)
+        return time.time() - synced_at < self.MAX_AGE
+
+    def get(self, panel_key, pin):
+        with self._lock:
+            entry = self._load().get(panel_key, {}).get("envs", {}).get(pin)
+            return dict(entry) if entry else None
+
+    def pins(self, panel_key):
+        with self._lock:
+            return list(self._load().get(panel_key, {}).get("envs", {}))
+
+    def refresh(self, panel_key, envs, id_name):
+        """
+        用面板返回的完整列表增量更新索引
+        只改写新增、变化或已删除的条目，返回 (新增, 变化, 删除) 数量
+        """
+        with self._lock:
+            panel = self._panel(panel_key)
+            current = panel["envs"]
+            seen = set()
+            added = changed = 0
+            for env in envs:
+                pin = _extract_pin(env.get("value"))
+                if not pin or pin in seen:
+                    continue
+                seen.add(pin)
+                entry = self._make_entry(env, id_name)
+                old = current.get(pin)
+                if old is None:
+                    added += 1
+                elif old != entry:
+                    changed += 1
+                else:
+                    continue
+                current[pin] = entry
+            removed = [pin for pin in current if pin not in seen]
+            for pin in removed:
+                del current[pin]
+            panel["synced_at"] = time.time()
+            self._changed()
+            return added, changed, len(removed)
+
+    def upsert(self, panel_key, env, id_name):
+        """用自身写入后的记录回写索引"""
+        pin = _extract_pin(env.get("value"))
+        if not pin:
+            return
+        with self._lock:
+            envs = self._panel(panel_key)["envs"]
+            entry = self._make_entry(env, id_name)
+            old = envs.get(pin) or {}
+            # 面板响应中缺失的字段沿用旧值
+            for key, value in old.items():
+                if entry.get(key) is None:
+                    entry[key] = value
+            envs[pin] = entry
+            self._changed()
+
+    def set_status(self, panel_key, env_ids, status):
+        with self._lock:
+            env_ids = set(env_ids)
+            for entry in self._panel(panel_key)["envs"].values():
+                if entry.get("id") in env_ids:
+                    entry["status"] = status
+            self._changed()
+
+    def remove(self, panel_key, env_ids):
+        """从索引中删除指定 id 的条目"""
+        with self._lock:
+            env_ids = set(env_ids)
+            envs = self._panel(panel_key)["envs"]
+            for pin in [pin for pin, entry in envs.items() if entry.get("id") in env_ids]:
+                del envs[pin]
+            self._changed()
+
+    def summary(self, panel_key):
+        """返回该面板索引的条目数和上次同步时间"""
+        with self._lock:
+            panel = self._load().get(panel_key, {})
+            return {"count": len(panel.get("envs", {})), "synced_at": panel.get("synced_at", 0)}
+
+    def invalidate(self, panel_key):
+        """标记该面板的索引已过期，下次查找前强制刷新"""
+        with self._lock:
+            if panel_key in self._load():
+                self._load()[panel_key]["synced_at"] = 0
+                self._changed()
+
+    @staticmethod
+    def _make_entry(env, id_name):
+        return {
+            "id": env.get(id_name),
+            "value": env.get("value"),
+            "status": env.get("status"),
+            "updatedAt": env.get("updatedAt"),
+            "remarks": env.get("remarks")
+        }
+
+
+_env_index = None
+_env_index_lock = threading.Lock()
+
+
+def _get_env_index():
+    """获取进程内共享的环境变量索引"""
+    global _env_index
+    with _env_index_lock:
+        if _env_index is None:
+            _env_index = EnvIndex()
+        return _env_index
+
+
+class HTTPStats:
+    """
+    HTTP 请求计时统计
+    记录请求次数、重试、失败与耗时，并从连接池读取实际新建的连接数，
+    用于观察 keep-alive 连接复用的效果
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.retries = 0
+            self.errors = 0
+            self.total_time = 0.0
+            self.max_time = 0.0
+
+    def record(self, elapsed, ok=True, retry=False):
+        with self._lock:
+            self.requests += 1
+            self.total_time += elapsed
+            self.max_time = max(self.max_time, elapsed)
+            if not ok:
+                self.errors += 1
+            if retry:
+                self.retries += 1
+
+    def snapshot(self):
+        """返回当前统计的字典副本"""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "errors": self.errors,
+                "connections": _count_pool_connections(),
+                "total_ms": round(self.total_time * 1000, 1),
+                "avg_ms": round(self.total_time * 1000 / self.requests, 1) if self.requests else 0.0,
+                "max_ms": round(self.max_time * 1000, 1)
+            }
+
+
+HTTP_STATS = HTTPStats()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _get_session():
+    """获取进程内共享的 HTTP 会话（连接池 + keep-alive），重试由 QLHelper 自行控制"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # requests 导入约需 100ms，推迟到第一次真正发请求时，让命令行 --help 和界面首帧更快
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def _count_pool_connections():
+    """统计共享会话连接池累计新建的 TCP/TLS 连接数"""
+    if _session is None:
+        return 0
+    total = 0
+    for adapter in set(_session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                total += pool.num_connections
+    return total
+
+
+class QLHelper:
+    """
+    与青龙面板 API 交互的类
+    复刻自原始 C# 代码中的 QLHelp.cs
+    """
+    # 单次 HTTP 请求的超时上限（秒）
+    TIMEOUT = 10
+    # 单个操作（含重试与令牌刷新）的总时间预算（秒）
+    DEADLINE = 30
+    # 幂等请求的最大重试次数及退避基数（秒）
+    MAX_RETRIES = 3
+    BACKOFF_BASE = 0.5
+    # 视为暂时性故障、可重试的状态码
+    RETRY_STATUS = (429, 502, 503, 504)
+
+    # 本地索引所跟踪的环境变量名
+    ENV_NAME = "JD_COOKIE"
+    # 流式读取响应时每次读取的字节数
+    STREAM_CHUNK = 16 * 1024
+
+    def __init__(self, url, client_id, client_secret, token_cache=None, deadline=None, env_index=None):
+        self.url = url.strip('/')
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token = ""
+        self.id_name = "id"  # 默认 id 字段名
+        self.token_cache = token_cache if token_cache is not None else _get_token_cache()
+        self.env_index = env_index if env_index is not None else _get_env_index()
+        self.panel_key = TokenCache.make_key(self.url, self.client_id)
+        self.deadline = deadline or self.DEADLINE
+        self.session = _get_session()
+
+    def login(self, force=False):
+        """登录青龙面板；缓存中有未过期的令牌时直接复用，force=True 时强制重新获取"""
+        if not force:
+            entry = self.token_cache.get(self.url, self.client_id)
+            if entry:
+                self.token = entry["token"]
+                self.id_name = entry.get("id_name", "id")
+                return "青龙登录成功（使用缓存令牌）"
+        try:
+            with PHASE_METRICS.timer("token_fetch", panel=self.url):
+                full_url = f"{self.url}/open/auth/token?client_id={self.client_id}&client_secret={self.client_secret}"
+                response = self._http('GET', full_url, time.monotonic() + self.deadline)
+                response.raise_for_status()
+                data = response.json()
+                if data.get("code") != 200:
+                    raise Exception(data.get("message", "未知错误"))
+                self.token = f"{data['data']['token_type']} {data['data']['token']}"
+                # 检查环境变量接口以确定 id 字段是 'id' 还是 '_id'
+                self.check_id_field()
+            expires_at = data['data'].get('expiration') or time.time() + TokenCache.DEFAULT_TTL
+            self.token_cache.put(self.url, self.client_id, self.token, expires_at, self.id_name)
+            return "青龙登录成功"
+        except Exception as e:
+            raise Exception(f"青龙登录失败: {e}")
+
+    def check_id_field(self):
+        """探测环境变量接口以确定主键字段名"""
+        try:
+            headers = {'Authorization': self.token}
+            # 使用一个几乎不可能存在的searchValue来获取一个空列表，只看结构；只解析第一条记录
+            response = self._http('GET', f"{self.url}/open/envs?searchValue=___check___",
+                                  time.monotonic() + self.deadline, headers=headers, stream=True)
+            with closing(response):
+                env = next(_iter_json_items(response.iter_content(self.STREAM_CHUNK)), None)
+            if isinstance(env, dict):
+                if '_id' in env:
+                    self.id_name = '_id'
+                elif 'id' in env:
+                    self.id_name = 'id'
+        except Exception:
+            # 探测失败则使用默认值 'id'
+            pass
+
+    def _http(self, method, url, deadline_at, **kwargs):
+        """
+        通过共享会话发送请求
+        幂等请求（GET/PUT/DELETE）遇到连接错误或暂时性状态码时按指数退避加随机抖动重试；
+        每次请求的超时取 TIMEOUT 与剩余预算中的较小值，预算耗尽即放弃
+        """
+        import requests
+        idempotent = method in ('GET', 'PUT', 'DELETE')
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise Exception(f"请求超时: 超出 {self.deadline} 秒操作时限")
+            start = time.monotonic()
+            try:
+                response = self.session.request(method, url, timeout=min(self.TIMEOUT, remaining), **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                HTTP_STATS.record(time.monotonic() - start, ok=False, retry=attempt > 0)
+                if not idempotent or attempt >= self.MAX_RETRIES:
+                    raise
+            else:
+                ok = response.status_code not in self.RETRY_STATUS
+                HTTP_STATS.record(time.monotonic() - start, ok=ok, retry=attempt > 0)
+                if ok or not idempotent or attempt >= self.MAX_RETRIES:
+                    return response
+                # 流式请求的响应未被读取，关闭后连接才能放回连接池
+                response.close()
+            # 全抖动退避，且不超过剩余预算
+            delay = random.uniform(0, self.BACKOFF_BASE * (2 ** attempt))
+            time.sleep(max(0.0, min(delay, deadline_at - time.monotonic())))
+            attempt += 1
+
+    def _send(self, method, path, deadline_at, **kwargs):
+        """发送带鉴权的请求并返回响应；面板返回 401（令牌失效）时刷新令牌并重试一次"""
+        def send():
+            headers = {'Authorization': self.token}
+            if 'json' in kwargs:
+                headers['Content-Type'] = 'application/json'
+            return self._http(method, f"{self.url}{path}", deadline_at, headers=headers, **kwargs)
+
+        response = send()
+        if response.status_code == 401:
+            response.close()
+            self.token_cache.invalidate(self.url, self.client_id)
+            self.login(force=True)
+            response = send()
+        return response
+
+    def _request(self, method, path, stream=False, **kwargs):
+        """
+        发送带鉴权的请求，返回响应 JSON
+        stream=True 时不读取正文，返回未关闭的响应（调用方负责关闭），日志中的耗时为收到响应头的时间
+        """
+        deadline_at = time.monotonic() + self.deadline
+        start = time.monotonic()
+        status = None
+        try:
+            response = self._send(method, path, deadline_at, stream=stream, **kwargs)
+            status = response.status_code
+            if stream and status >= 400:
+                response.close()
+            response.raise_for_status()
+            return response if stream else response.json()
+        finally:
+            _log_event("DEBUG", "http", panel=self.url, operation=f"{method} {path}", status=status,
+                       ok=status is not None and status < 400,
+                       duration_ms=round((time.monotonic() - start) * 1000, 1))
+
+    def iter_envs(self, search_value=None, name=None):
+        """
+        流式列出环境变量（可按 searchValue 过滤），逐条产出面板原始记录；name 不为空时只产出该变量名的记录
+        响应边接收边增量解析，不会整体读入内存；提前结束迭代（或调用 close()）会关闭连接
+        """
+        params = {'searchValue': search_value} if search_value else None
+        fields = {}
+        with closing(self._request('GET', '/open/envs', stream=True, params=params)) as response:
+            for env in _iter_json_items(response.iter_content(self.STREAM_CHUNK), "data", fields):
+                if not name or (isinstance(env, dict) and env.get('name') == name):
+                    yield env
+        if fields.get("code") != 200:
+            raise Exception(fields.get("message", "获取环境变量失败"))
+
+    def list_envs(self, search_value=None):
+        """列出环境变量（可按 searchValue 过滤），返回面板原始记录列表"""
+        return list(self.iter_envs(search_value))
+
+    def refresh_env_index(self, force=False):
+        """索引过期（或 force=True）时从面板拉取 JD_COOKIE 列表并增量合并，返回 (新增, 变化, 删除) 数量"""
+        if not force and self.env_index.is_fresh(self.panel_key):
+            return 0, 0, 0
+        with PHASE_METRICS.timer("env_lookup", panel=self.url):
+            # 流式过滤，只保留 JD_COOKIE 记录（searchValue 也会匹配到值或备注中含该字符串的其他变量）
+            envs = list(self.iter_envs(self.ENV_NAME, name=self.ENV_NAME))
+        return self.env_index.refresh(self.panel_key, envs, self.id_name)
+
+    def find_env(self, pin):
+        """按 pin 精确查找 JD_COOKIE 环境变量，返回索引条目或 None"""
+        self.refresh_env_index()
+        return self.env_index.get(self.panel_key, pin)
+
+    def cookie_envs(self, force=False):
+        """返回面板上全部 JD_COOKIE 的索引条目（按 pin 排序，每项含 pin 字段），索引过期时先刷新"""
+        self.refresh_env_index(force=force)
+        envs = []
+        for pin in sorted(self.env_index.pins(self.panel_key)):
+            entry = self.env_index.get(self.panel_key, pin)
+            if entry:
+                entry["pin"] = pin
+                envs.append(entry)
+        return envs
+
+    def get_envs(self, search_value):
+        # pt_pin=xxx 形式的查找走本地索引，避免前缀相同的 pin 误匹配
+        pin = _extract_pin(search_value)
+        if pin:
+            entry = self.find_env(pin)
+            return entry["id"] if entry else None
+        # 只需要第一条记录，读到后立即关闭连接，不下载其余部分
+        with PHASE_METRICS.timer("env_lookup", panel=self.url):
+            with closing(self.iter_envs(search_value)) as envs:
+                env = next(envs, None)
+        return env.get(self.id_name) if isinstance(env, dict) else None
+
+    def _index_written(self, envs):
+        """把自身写入的 JD_COOKIE 记录回写到本地索引"""
+        for env in envs:
+            if isinstance(env, dict) and env.get('name') == self.ENV_NAME:
+                self.env_index.upsert(self.panel_key, env, self.id_name)
+
+    def add_envs(self, name, value, remarks):
+        return self.add_envs_bulk([{'name': name, 'value': value, 'remarks': remarks}])
+
+    def add_envs_bulk(self, entries):
+        """一次 POST 新增多个环境变量，entries 为 {'name', 'value', 'remarks'} 字典列表"""
+        with PHASE_METRICS.timer("env_add", panel=self.url):
+            data = self._request('POST', '/open/envs', json=list(entries))
+        if data.get("code") == 200:
+            self._index_written(data.get("data") or [])
+        return data
+
+    def update_envs(self, env_id, name, value, remarks):
+        payload = {'name': name, 'value': value, 'remarks': remarks, self.id_name: env_id}
+        try:
+            with PHASE_METRICS.timer("env_update", panel=self.url):
+                data = self._request('PUT', '/open/envs', json=payload)
+        except Exception:
+            # 写入失败说明索引中的 id 可能已失效
+            self.env_index.invalidate(self.panel_key)
+            raise
+        if data.get("code") == 200:
+            written = data.get("data") if isinstance(data.get("data"), dict) else payload
+            self._index_written([dict(payload, **written)])
+        else:
+            self.env_index.invalidate(self.panel_key)
+        return data
+
+    def enable_envs(self, env_id):
+        """启用环境变量，env_id 可以是单个 id 或 id 列表"""
+        payload = list(env_id) if isinstance(env_id, (list, tuple, set)) else [env_id]
+        with PHASE_METRICS.timer("env_enable", panel=self.url):
+            data = self._request('PUT', '/open/envs/enable', json=payload)
+        if data.get("code") == 200:
+            self.env_index.set_status(self.panel_key, payload, 0)
+        return data
+
+    def disable_envs(self, env_ids):
+        """一次 PUT /open/envs/disable 禁用多个环境变量"""
+        env_ids = list(env_ids)
+        with PHASE_METRICS.timer("env_disable", panel=self.url):
+            data = self._request('PUT', '/open/envs/disable', json=env_ids)
+        if data.get("code") == 200:
+            self.env_index.set_status(self.panel_key, env_ids, 1)
+        return data
+
+    def delete_envs(self, env_ids):
+        """一次 DELETE 删除多个环境变量"""
+        env_ids = list(env_ids)
+        with PHASE_METRICS.timer("env_delete", panel=self.url):
+            data = self._request('DELETE', '/open/envs', json=env_ids)
+        if data.get("code") == 200:
+            self.env_index.remove(self.panel_key, env_ids)
+        else:
+            self.env_index.invalidate(self.panel_key)
+        return data
+
+    def sync_cookies(self, accounts, name="JD_COOKIE", force=False):
+        """
+        批量同步多个账号的 Cookie
+        accounts 为 (pin, cookie) 序列，同一 pin 以最后一次出现为准。
+        通过本地索引（过期时只列出一次环境变量）建立 pin→环境变量映射；新账号合并为一次数组 POST，
+        pt_key 有变化的账号逐个更新，需要启用的账号统一用一次 PUT /open/envs/enable 启用；
+        pt_key 相同且已启用的账号不发任何写请求（force=True 时照常更新并启用）。
+        索引来自缓存时，判定为"未变化"或只需启用之前会强制刷新一次索引；按缓存 id 更新失败且面板上已没有该账号时改为新增。
+        返回按输入顺序排列的结果列表，每项包含 pin、operation（添加/更新/启用/未变化）、id、ok、error
+        """
+        with self.env_index.deferred():
+            return self._sync_cookies(accounts, name, force)
+
+    def _sync_cookies(self, accounts, name, force=False):
+        cookies = {}
+        for pin, cookie in accounts:
+            cookies[pin] = cookie
+
+        env_map = {}
+        cached = False
+        if name == self.ENV_NAME:
+            # 索引未过期时直接使用（最长 MAX_AGE 秒），期间面板上的删除、禁用还没有反映到索引中
+            cached = self.env_index.is_fresh(self.panel_key)
+            self.refresh_env_index()
+            if cached and not force and any(
+                    self._same_key(self.env_index.get(self.panel_key, pin), cookie) for pin, cookie in cookies.items()):
+                # 只启用或不发写请求之前，先确认条目在面板上仍然存在
+                self.refresh_env_index(force=True)
+                cached = False
+            for pin in self.env_index.pins(self.panel_key):
+                env_map[pin] = self.env_index.get(self.panel_key, pin)
+        else:
+            with PHASE_METRICS.timer("env_lookup", panel=self.url):
+                for env in self.iter_envs(name, name=name):
+                    pin = _extract_pin(env.get('value'))
+                    if pin and pin not in env_map:
+                        env_map[pin] = {"id": env.get(self.id_name), "value": env.get('value'),
+                                        "status": env.get('status')}
+
+        results = {}
+        to_add = []
+        to_enable = []
+        missing = []
+        for pin, cookie in cookies.items():
+            env = env_map.get(pin)
+            if env is None or env.get("id") is None:
+                to_add.append(pin)
+                results[pin] = {"pin": pin, "operation": "添加", "id": None, "ok": False, "error": None}
+                continue
+            changed = force or not self._same_key(env, cookie)
+            enabled = not force and env.get("status") == 0
+            operation = "更新" if changed else ("未变化" if enabled else "启用")
+            result = {"pin": pin, "operation": operation, "id": env["id"], "ok": enabled, "error": None}
+            results[pin] = result
+            if changed:
+                try:
+                    data = self.update_envs(env["id"], name, cookie, _make_remarks(pin))
+                    if data.get("code") != 200:
+                        raise Exception(data.get("message", "更新环境变量失败"))
+                except Exception as e:
+                    result["ok"] = False
+                    result["error"] = str(e)
+                    if cached:
+                        missing.append(pin)
+                    continue
+            if not enabled:
+                to_enable.append(pin)
+
+        if missing:
+            # 按缓存索引更新失败：条目可能已在面板上被删除，刷新后仍找不到的账号改为新增
+            try:
+                self.refresh_env_index(force=True)
+            except Exception:
+                pass
+            else:
+                for pin in missing:
+                    if self.env_index.get(self.panel_key, pin) is None:
+                        to_add.append(pin)
+                        results[pin].update(operation="添加", id=None, error=None)
+
+        if to_enable:
+            try:
+                self.enable_envs([results[pin]["id"] for pin in to_enable])
+                for pin in to_enable:
+                    results[pin]["ok"] = True
+            except Exception as e:
+                for pin in to_enable:
+                    results[pin]["error"] = f"启用失败: {e}"
+
+        if to_add:
+            try:
+                data = self.add_envs_bulk(
+                    {'name': name, 'value': cookies[pin], 'remarks': _make_remarks(pin)} for pin in to_add)
+                if data.get("code") != 200:
+                    raise Exception(data.get("message", "新增环境变量失败"))
+                created = {}
+                for env in data.get("data") or []:
+                    created[_extract_pin(env.get('value'))] = env.get(self.id_name)
+                for pin in to_add:
+                    results[pin]["id"] = created.get(pin)
+                    results[pin]["ok"] = True
+            except Exception as e:
+                for pin in to_add:
+                    results[pin]["error"] = str(e)
+
+        return list(results.values())
+
+    @staticmethod
+    def _same_key(env, cookie):
+        """面板条目存在且 pt_key 与 cookie 相同"""
+        return env is not None and env.get("id") is not None and _extract_pt_key(env.get("value")) == _extract_pt_key(cookie)
+
+
+def _get_panels(config):
+    """
+    返回配置中的全部青龙面板目标
+    主面板来自 ql_url/ql_client_id/ql_client_secret（权重 ql_weight），额外面板来自 panels 列表，
+    每项统一为 {'name', 'url', 'client_id', 'client_secret', 'weight'}，配置不完整的面板会被忽略
+    """
+    raw_panels = [{
+        "name": "主面板",
+        "ql_url": config.get("ql_url"),
+        "ql_client_id": config.get("ql_client_id"),
+        "ql_client_secret": config.get("ql_client_secret"),
+        "weight": config.get("ql_weight")
+    }]
+    raw_panels.extend(config.get("panels") or [])
+
+    panels = []
+    seen = set()
+    for raw in raw_panels:
+        url = (raw.get("ql_url") or "").strip('/')
+        client_id = raw.get("ql_client_id") or ""
+        client_secret = raw.get("ql_client_secret") or ""
+        if not all([url, client_id, client_secret]) or (url, client_id) in seen:
+            continue
+        seen.add((url, client_id))
+        panels.append({
+            "name": raw.get("name") or url,
+            "url": url,
+            "client_id": client_id,
+            "client_secret": client_secret,
+            "weight": raw.get("weight") or 1
+        })
+    return panels
+
+
+def load_config(path=None):
+    """读取 config.json，文件不存在时返回空字典"""
+    path = path or _get_config_path()
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def run_on_panels(panels, task, max_workers=8, on_result=None):
+    """
+    在有界线程池中对每个面板并发执行 task，总耗时接近最慢的那个面板
+    每个面板使用独立并已登录的 QLHelper，task(ql) 返回的字典会合并进该面板的结果；
+    on_result 在每个面板完成时（于工作线程中）被调用。
+    返回与 panels 顺序一致的结果列表，每项至少包含 name、ok、error、elapsed
+    """
+    def run(panel):
+        start = time.monotonic()
+        result = {"name": panel["name"], "ok": False, "error": None}
+        try:
+            ql = QLHelper(panel["url"], panel["client_id"], panel["client_secret"])
+            ql.login()
+            result["ok"] = True
+            result.update(task(ql) or {})
+        except Exception as e:
+            result["ok"] = False
+            result["error"] = str(e)
+        result["elapsed"] = time.monotonic() - start
+        return result
+
+    if not panels:
+        return []
+    results = [None] * len(panels)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(panels)))) as pool:
+        futures = {pool.submit(run, panel): index for index, panel in enumerate(panels)}
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            if on_result:
+                on_result(result)
+    return results
+
+
+def push_cookie_to_panels(panels, pin, cookie, max_workers=8, on_result=None, force=False):
+    """
+    并发地把同一个账号的 Cookie 推送到多个面板
+    返回与 panels 顺序一致的结果列表，每项包含 name、ok、operation、id、error、elapsed
+    """
+    def push(ql):
+        synced = ql.sync_cookies([(pin, cookie)], force=force)[0]
+        return {"ok": synced["ok"], "operation": synced["operation"], "id": synced["id"], "error": synced["error"]}
+
+    results = run_on_panels(panels, push, max_workers=max_workers, on_result=on_result)
+    for result in results:
+        result.setdefault("operation", None)
+        result.setdefault("id", None)
+    return results
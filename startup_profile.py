@@ -0,0 +1,61 @@
+"""
+启动耗时分析（--profile-startup）
+记录各模块首次导入的耗时和窗口构建各阶段的耗时，便于定位启动慢的环节
+"""
+import builtins
+import sys
+import threading
+import time
+
+
+class StartupProfiler:
+    """
+    启动耗时记录器
+    未启用时所有方法都是空操作，不影响正常启动
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.imports = []  # (模块名, 耗时秒)，只记录顶层的首次导入
+        self.marks = []    # (阶段名, 距启动秒数)
+        self._local = threading.local()
+        self._original_import = None
+
+    def install_import_hook(self):
+        """包装 builtins.__import__，统计之后每个模块首次导入的耗时（含其依赖）"""
+        if not self.enabled or self._original_import is not None:
+            return
+        original = self._original_import = builtins.__import__
+        profiler = self
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if level or name in sys.modules:
+                return original(name, globals, locals, fromlist, level)
+            depth = getattr(profiler._local, "depth", 0)
+            profiler._local.depth = depth + 1
+            started = time.perf_counter()
+            try:
+                return original(name, globals, locals, fromlist, level)
+            finally:
+                profiler._local.depth = depth
+                if depth == 0:
+                    profiler.imports.append((name, time.perf_counter() - started))
+
+        builtins.__import__ = timed_import
+
+    def mark(self, phase):
+        """标记一个阶段结束；阶段耗时为与上一个标记的间隔"""
+        if self.enabled:
+            self.marks.append((phase, time.perf_counter() - self.start))
+
+    def report(self):
+        """生成文本报告行"""
+        lines = ["⏱️ 启动耗时分析（自模块加载起计时）", "  模块导入:"]
+        for name, elapsed in sorted(self.imports, key=lambda item: item[1], reverse=True):
+            lines.append(f"    {name:<40} {elapsed * 1000:8.1f} ms")
+        lines.append("  构建阶段:")
+        previous = 0.0
+        for phase, offset in self.marks:
+            lines.append(f"    {phase:<36} {(offset - previous) * 1000:8.1f} ms  (累计 {offset * 1000:.1f} ms)")
+            previous = offset
+        return lines